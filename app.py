@@ -5,15 +5,24 @@ A macOS menu bar app for voice-to-text typing by Kini AI
 
 import rumps
 import threading
+import multiprocessing
 import time
 from pynput import keyboard
 
 from audio_recorder import AudioRecorder
 from transcription_engine import TranscriptionEngine
+from transcription_worker import TranscriptionWorker
 from text_injector import TextInjector
 from stats_manager import StatsManager
 from config_manager import ConfigManager, MODIFIER_KEYS
 from history_manager import HistoryManager
+from hotkey_state import HotkeyState
+from latency_tracker import LatencyTracker, span
+from profiler import DictationProfiler, env_enabled
+from dictation_pipeline import DictationJob, DictationPipeline
+from model_residency import ModelResidency
+from model_scheduler import ModelScheduler
+from voice_activity import VoiceActivityDetector
 
 
 class VoiceTypingApp(rumps.App):
@@ -25,9 +34,10 @@ class VoiceTypingApp(rumps.App):
             quit_button=None
         )
         
-        # State
-        self.state = "idle"  # idle, recording, processing
-        self.hotkey_pressed = False
+        # State: recording is always available; finished recordings queue in the pipeline
+        self.hotkey = None  # HotkeyState, set up by start_hotkey_listener
+        self.stream_session = None
+        self.stream_incremental = None  # IncrementalInjector typing the stream live
         self.listener = None
         self.recording_hotkey = False
         self.recorded_modifiers = set()
@@ -35,12 +45,87 @@ class VoiceTypingApp(rumps.App):
         # Managers
         self.config = ConfigManager()
         self.stats = StatsManager()
-        self.history = HistoryManager()
+        self.history = HistoryManager(retention_days=self.config.get("history_retention_days", 0))
+        self.latency = LatencyTracker()
+        self.profiler = DictationProfiler(
+            enabled=self.config.get("profiling", False),
+            on_growth=lambda message: rumps.notification("Oropo", "Memory Growth", message)
+        )
         
         # Components
-        self.recorder = AudioRecorder()
-        self.transcriber = TranscriptionEngine()
-        self.injector = TextInjector()
+        self.recorder = AudioRecorder(
+            archive_dir=self.config.get_recordings_dir(),
+            dtype=self.config.get("capture_dtype", "float32"),
+            max_seconds=self.config.get("max_recording_seconds", 300),
+            warm_capture=self.config.get("warm_capture", False),
+            preroll_seconds=self.config.get("preroll_ms", 300) / 1000,
+            warm_idle_seconds=self.config.get("warm_idle_seconds", 120),
+            capture_rate=self.config.get("capture_rate", 16000)
+        )
+        self.recorder.warm_up()
+        self.recorder.set_auto_stop_callback(self._on_recording_limit)
+        self.vad = None
+        if self.config.get("vad_enabled"):
+            self.vad = VoiceActivityDetector(
+                self.recorder.sample_rate,
+                use_model=self.config.get("vad_use_model", False)
+            )
+        # The model runs in-process, or in a restartable worker process
+        engine_class = TranscriptionWorker if self.config.get("worker_process") else TranscriptionEngine
+        two_pass = self.config.get("two_pass")
+        self.transcriber = engine_class(
+            self.config.get("draft_model") if two_pass else self.config.get("model"),
+            decode_workers=self.config.get("decode_workers", 2),
+            backend=self.config.get_backend_name(),
+            decode_profile=self.config.get("decode_profile", "balanced"),
+            quantization=self.config.get("quantization")
+        )
+        
+        # Adaptive mode: pick the model per dictation from its measured speed
+        self.scheduler = None
+        if self.config.get("adaptive_models") and two_pass:
+            print("two_pass is on: adaptive_models is ignored (the draft and refine models are fixed)")
+        elif self.config.get("adaptive_models"):
+            self.scheduler = ModelScheduler(
+                self.config.get("adaptive_models"),
+                latency_budget=self.config.get("latency_budget_seconds", 1.5)
+            )
+        
+        # Unload idle models and reload on hotkey press; the worker process counts as one model
+        adaptive = self.scheduler and engine_class is TranscriptionEngine
+        self.residency = ModelResidency(
+            self.transcriber,
+            models=self.scheduler.models if adaptive else None,
+            idle_unload_seconds=self.config.get("model_idle_unload_seconds", 900),
+            memory_budget_mb=self.config.get("model_memory_budget_mb", 0)
+        )
+        
+        # Two-pass mode: a larger model re-transcribes each dictation in the background
+        # (in its own worker process too when worker_process is set, and unloaded when idle)
+        self.refiner = None
+        if two_pass:
+            self.refiner = engine_class(
+                self.config.get("refine_model"),
+                decode_workers=self.config.get("decode_workers", 2),
+                backend=self.config.get_backend_name(),
+                decode_profile=self.config.get("decode_profile", "balanced"),
+                quantization=self.config.get("quantization")
+            )
+            self.refiner_residency = ModelResidency(
+                self.refiner,
+                idle_unload_seconds=self.config.get("model_idle_unload_seconds", 900)
+            )
+        self.injector = TextInjector(backend=self.config.get("injection_backend", "auto"))
+        self.pipeline = DictationPipeline(
+            self._profile_job,
+            on_change=self._refresh_status,
+            deadline_seconds=None  # Started per job once its model is loaded (_start_deadline)
+        )
+        self._status_hold_until = 0.0
+        self._release_lock = threading.Lock()
+        # Set while no dictation is being recorded: pastes and corrections wait for it
+        self._output_released = threading.Event()
+        self._output_released.set()
         
         # Build menu
         self._build_menu()
@@ -51,6 +136,10 @@ class VoiceTypingApp(rumps.App):
         # Pre-load model
         self._show_loading = True
         threading.Thread(target=self._preload_model, daemon=True).start()
+        
+        # Keeps the queue wait time in the status item current
+        self.status_timer = rumps.Timer(self._refresh_status, 0.5)
+        self.status_timer.start()
     
     def _build_menu(self):
         """Build the menu structure like Whryte"""
@@ -60,6 +149,10 @@ class VoiceTypingApp(rumps.App):
         # Status item at top
         self.status_item = rumps.MenuItem("Status: Idle")
         self.status_item.set_callback(noop)
+        self.models_item = rumps.MenuItem("Models: none")
+        self.models_item.set_callback(noop)
+        self.cold_start_item = rumps.MenuItem("Cold start: none yet")
+        self.cold_start_item.set_callback(noop)
         
         # Hotkeys submenu with record option
         self.hotkeys_menu = rumps.MenuItem("⌨ Hotkeys")
@@ -79,10 +172,24 @@ class VoiceTypingApp(rumps.App):
         self.stats_total.set_callback(noop)
         self.stats_time = rumps.MenuItem(f"  Time Saved                         {self.stats.get_time_saved_minutes()} min")
         self.stats_time.set_callback(noop)
+        self.stats_vad = rumps.MenuItem(f"  Silence Skipped                 {self.stats.get_vad_seconds_trimmed()}s")
+        self.stats_vad.set_callback(noop)
+        self.stats_models = rumps.MenuItem("")
+        self.stats_models.set_callback(noop)
+        self._update_models_display()
+        self.stats_latency = rumps.MenuItem("")
+        self.stats_latency.set_callback(noop)
+        self.stats_rtf = rumps.MenuItem("")
+        self.stats_rtf.set_callback(noop)
+        self.stats_two_pass = rumps.MenuItem("")
+        self.stats_two_pass.set_callback(noop)
+        self._update_latency_display()
         
         # Build full menu
         self.menu = [
             self.status_item,
+            self.models_item,
+            self.cold_start_item,
             None,
             self.hotkeys_menu,
             self.history_menu,
@@ -91,12 +198,23 @@ class VoiceTypingApp(rumps.App):
             self.stats_today,
             self.stats_total,
             self.stats_time,
+            self.stats_vad,
+            self.stats_models,
+            self.stats_latency,
+            self.stats_rtf,
+            self.stats_two_pass,
             None,
             rumps.MenuItem("? How to Use", callback=self.show_help),
             None,
             rumps.MenuItem("↺ Restart", callback=self.restart_app),
             rumps.MenuItem("⏻ Quit", callback=self.quit_app),
         ]
+        
+        # Hidden unless debug_menu is set in the config (or OROPO_PROFILE is set)
+        if self.config.get("debug_menu") or env_enabled():
+            self.profile_item = rumps.MenuItem("⚙ Profile Dictations", callback=self.toggle_profiling)
+            self.profile_item.state = int(self.profiler.enabled)
+            self.menu.insert_before("? How to Use", self.profile_item)
     
     def _build_hotkeys_menu(self):
         """Build hotkeys submenu with presets and custom option"""
@@ -193,21 +311,49 @@ class VoiceTypingApp(rumps.App):
         self.stats_today.title = f"  Today's Words                    {self.stats.get_today_words()}"
         self.stats_total.title = f"  Total Words                        {self.stats.get_total_words()}"
         self.stats_time.title = f"  Time Saved                         {self.stats.get_time_saved_minutes()} min"
+        self.stats_vad.title = f"  Silence Skipped                 {self.stats.get_vad_seconds_trimmed()}s"
+        self._update_models_display()
+    
+    def _update_models_display(self):
+        """Show how often adaptive_models picked each model, most used first, and the latest pick"""
+        counts, last = self.stats.get_model_decisions()
+        used = ", ".join(f"{model} {count}" for model, count in sorted(counts.items(), key=lambda c: -c[1]))
+        if last:
+            used += f" (last {last['model']})"
+        self.stats_models.title = f"  Models Used                     {used or '–'}"
     
-    def _update_history_menu(self):
-        """Update history submenu"""
+    def _update_latency_display(self):
+        """Update release-to-paste percentiles and average RTF in menu"""
+        p50 = self.latency.percentile("release_to_paste", 50)
+        p95 = self.latency.percentile("release_to_paste", 95)
+        rtf = self.latency.mean("rtf")
+        latency = f"{p50:.2f}s / {p95:.2f}s" if p50 is not None else "–"
+        rtf = f"{rtf:.2f}" if rtf is not None else "–"
+        self.stats_latency.title = f"  Latency p50 / p95             {latency}"
+        self.stats_rtf.title = f"  Avg RTF                              {rtf}"
+        two_pass = self.stats.get_two_pass_latency()
+        two_pass = f"{two_pass[0]:.2f}s / {two_pass[1]:.2f}s" if two_pass else "–"
+        self.stats_two_pass.title = f"  Draft / Refined                 {two_pass}"
+    
+    def _update_history_menu(self, query=None):
+        """Update history submenu (search results instead of the newest entries for a query)"""
         if hasattr(self, '_history_initialized') and self._history_initialized:
             for key in list(self.history_menu.keys()):
                 del self.history_menu[key]
         self._history_initialized = True
         
-        history = self.history.get_formatted_history()
+        self.history_menu.add(rumps.MenuItem("⌕ Search History...", callback=self._search_history))
+        if query:
+            self.history_menu.add(rumps.MenuItem("← Recent History", callback=lambda _: self._update_history_menu()))
+        self.history_menu.add(None)
+        
+        history = self.history.search(query) if query else self.history.get_formatted_history()
         if not history:
-            empty_item = rumps.MenuItem("No history yet")
+            empty_item = rumps.MenuItem(f"No matches for “{query}”" if query else "No history yet")
             empty_item.set_callback(None)
             self.history_menu.add(empty_item)
         else:
-            for i, entry in enumerate(history):
+            for entry in history:
                 item_menu = rumps.MenuItem(entry["display"])
                 
                 paste_item = rumps.MenuItem(
@@ -224,7 +370,7 @@ class VoiceTypingApp(rumps.App):
                 
                 delete_item = rumps.MenuItem(
                     "✕ Delete",
-                    callback=lambda _, idx=i: self._delete_history_item(idx)
+                    callback=lambda _, entry_id=entry["id"]: self._delete_history_item(entry_id)
                 )
                 item_menu.add(delete_item)
                 
@@ -245,9 +391,21 @@ class VoiceTypingApp(rumps.App):
         pyperclip.copy(text)
         rumps.notification("Oropo", "Copied!", text[:50] + "..." if len(text) > 50 else text)
     
-    def _delete_history_item(self, index):
+    def _search_history(self, _):
+        """Ask for words and list the matching dictations in the history submenu"""
+        response = rumps.Window(
+            "Words to find in past dictations:",
+            title="Search History",
+            ok="Search",
+            cancel="Cancel",
+            dimensions=(320, 24)
+        ).run()
+        if response.clicked and response.text.strip():
+            self._update_history_menu(response.text.strip())
+    
+    def _delete_history_item(self, entry_id):
         """Delete a history item"""
-        self.history.delete_entry(index)
+        self.history.delete_id(entry_id)
         self._update_history_menu()
     
     def _clear_history(self, _):
@@ -262,12 +420,26 @@ class VoiceTypingApp(rumps.App):
             self.update_status("Loading model...")
         
         try:
-            self.transcriber._ensure_model()
-        except Exception:
-            pass
+            self.residency.load()
+        except Exception as e:
+            print(f"Model preload failed: {e}")
         
-        self.update_status("Ready")
         self._show_loading = False
+        self._refresh_status()
+        
+        # Adaptive candidates load in the background so the first choice isn't a cold start
+        if self.scheduler and isinstance(self.transcriber, TranscriptionEngine):
+            for model in self.scheduler.models:
+                try:
+                    self.residency.load(model)
+                except Exception as e:
+                    print(f"Model preload failed ({model}): {e}")
+        
+        if self.refiner:
+            try:
+                self.refiner_residency.load()
+            except Exception as e:
+                print(f"Refinement model preload failed: {e}")
     
     def update_status(self, status):
         """Update the status display"""
@@ -280,6 +452,43 @@ class VoiceTypingApp(rumps.App):
         else:
             self.title = "🎤"
     
+    def _show_status(self, status, seconds=1.0):
+        """Show a short message, then go back to the live status"""
+        self._status_hold_until = time.perf_counter() + seconds
+        self.update_status(status)
+    
+    def _live_status(self):
+        """Status text for the current recording and queue state"""
+        if self._show_loading:
+            return "Loading model..."
+        
+        depth = self.pipeline.depth()
+        queue_info = ""
+        if depth:
+            queue_info = f"{depth} queued, {self.pipeline.oldest_wait():.1f}s"
+        
+        if self.recorder.is_recording:
+            return f"Recording... ({queue_info})" if queue_info else "Recording..."
+        if depth:
+            return f"Processing... ({queue_info})"
+        if self.transcriber.orphaned_decodes():
+            return "Finishing cancelled decode..."
+        return "Ready"
+    
+    def _refresh_status(self, _=None):
+        """Update the status item unless a short message is showing"""
+        models, cold_start = self.residency.status()
+        if self.models_item.title != models:
+            self.models_item.title = models
+        if self.cold_start_item.title != cold_start:
+            self.cold_start_item.title = cold_start
+        
+        if time.perf_counter() < self._status_hold_until:
+            return
+        status = self._live_status()
+        if self.status_item.title != f"Status: {status}":
+            self.update_status(status)
+    
     def start_hotkey_listener(self):
         """Start listening for the configured hotkey"""
         if self.listener:
@@ -290,109 +499,343 @@ class VoiceTypingApp(rumps.App):
         
         hotkey_info = self.config.get_hotkey()
         target_keys = hotkey_info.get("keys", [hotkey_info["key"]])
-        self.pressed_keys = set()
+        cancel_key = self.config.get_cancel_key()
+        self.hotkey = HotkeyState(
+            target_keys,
+            on_press=self.on_hotkey_press,
+            on_release=self.on_hotkey_release,
+            modifier_keys=MODIFIER_KEYS,
+            on_modifiers=self.injector.set_modifiers_down,
+            is_injecting=self.injector.is_injecting,
+        )
         
-        def on_press(key):
+        # pynput 1.8+ passes injected=True for synthetic events; older versions leave the default
+        def on_press(key, injected=False):
             if self.recording_hotkey:
                 return
             
-            self.pressed_keys.add(key)
-            
-            # Check if all target keys are pressed
-            all_pressed = all(
-                any(pk == tk or (hasattr(pk, 'name') and hasattr(tk, 'name') and 
-                    pk.name.replace('_l', '').replace('_r', '') == tk.name.replace('_l', '').replace('_r', ''))
-                    for pk in self.pressed_keys)
-                for tk in target_keys
-            )
+            if cancel_key is not None and key == cancel_key and not injected:
+                self.cancel_dictation()
+                return
             
-            if all_pressed and not self.hotkey_pressed:
-                self.hotkey_pressed = True
-                self.on_hotkey_press()
+            self.hotkey.press(key, injected)
         
-        def on_release(key):
+        def on_release(key, injected=False):
             if self.recording_hotkey:
                 return
             
-            self.pressed_keys.discard(key)
-            
-            # If any target key is released, stop recording
-            if self.hotkey_pressed:
-                self.hotkey_pressed = False
-                self.on_hotkey_release()
+            self.hotkey.release(key, injected)
         
         self.listener = keyboard.Listener(on_press=on_press, on_release=on_release)
         self.listener.start()
     
     def on_hotkey_press(self):
-        """Called when hotkey is pressed - start recording"""
-        if self.state != "idle":
+        """Called when hotkey is pressed - start recording (even while earlier dictations process)"""
+        if self.recorder.is_recording:
             return
         
-        self.state = "recording"
-        self.update_status("Recording...")
+        # Reload an unloaded model while the user speaks
+        self.residency.prefetch()
         
+        self._status_hold_until = 0.0
+        self._output_released.clear()
         try:
             self.recorder.start_recording()
+            self._refresh_status()
+            
+            if self.config.get("streaming_transcription"):
+                options = {}
+                # Typing live only when nothing is queued, so dictations still land in order
+                if self.config.get("type_as_you_speak") and self.pipeline.depth() == 0:
+                    self.stream_incremental = self.injector.start_incremental(
+                        self.config.get("typing_chars_per_second", 120)
+                    )
+                    options = {
+                        "on_update": self.stream_incremental.update,
+                        "partial_interval": self.config.get("partial_interval_seconds", 1.0),
+                    }
+                self.stream_session = self.transcriber.start_streaming(
+                    self.recorder.buffer.view,
+                    self.recorder.sample_rate,
+                    scheduler=self.scheduler,
+                    **options
+                )
         except Exception as e:
-            self.update_status(f"Error: {e}")
-            self.state = "idle"
+            if not self.recorder.is_recording:
+                self._output_released.set()
+            self._show_status(f"Error: {e}", 2.0)
     
     def on_hotkey_release(self):
-        """Called when hotkey is released - process recording"""
-        if self.state != "recording":
+        """Called when hotkey is released - queue the recording for transcription"""
+        release_time = time.perf_counter()
+        # The hotkey listener and the auto-stop thread may both release
+        with self._release_lock:
+            if not self.recorder.is_recording:
+                return
+            session, self.stream_session = self.stream_session, None
+            incremental, self.stream_incremental = self.stream_incremental, None
+            audio = self.recorder.stop_recording()
+            # The next recording gets a fresh buffer, so this view stays valid
+            full_audio = self.recorder.buffer.view()
+            self._output_released.set()
+        
+        if audio is None:
+            if session:
+                session.cancel()
+            if incremental:
+                incremental.cancel()
+            self._show_status("No audio")
             return
         
-        self.state = "processing"
-        self.update_status("Processing...")
-        
-        threading.Thread(target=self._process_recording, daemon=True).start()
+        if session:
+            session.freeze(full_audio)
+        self.pipeline.submit(DictationJob(
+            audio,
+            release_time,
+            session=session,
+            full_audio=full_audio,
+            timings=self.recorder.last_timings,
+            incremental=incremental,
+        ))
+    
+    def cancel_dictation(self):
+        """Cancel key: drop the recording in progress and abandon queued transcriptions"""
+        discarded = False
+        with self._release_lock:
+            if self.recorder.is_recording:
+                session, self.stream_session = self.stream_session, None
+                incremental, self.stream_incremental = self.stream_incremental, None
+                self.recorder.stop_recording()
+                self._output_released.set()
+                if session:
+                    session.cancel()
+                if incremental:
+                    incremental.cancel()
+                discarded = True
+        
+        cancelled = self.pipeline.cancel_all("user")
+        if discarded or cancelled:
+            self._show_status("Cancelled")
+    
+    def _on_recording_limit(self):
+        """Called when a recording hits the maximum duration - treat as release"""
+        if self.hotkey:
+            self.hotkey.force_release()
+    
+    def toggle_profiling(self, sender):
+        """Debug menu: profile each dictation to ~/.oropo/profiles"""
+        enabled = not self.profiler.enabled
+        self.profiler.set_enabled(enabled)
+        self.config.set("profiling", enabled)
+        sender.state = int(enabled)
     
-    def _process_recording(self):
-        """Process the recording"""
+    def _profile_job(self, job):
+        """Pipeline entry point: process a job, profiled when profiling is on"""
+        with self.profiler.dictation(f"dictation-{job.id}"):
+            self._process_job(job)
+    
+    def _process_job(self, job):
+        """Transcribe and paste one queued recording (pipeline worker thread)"""
+        audio = job.audio
+        session = job.session
+        release_time = job.release_time
+        cancel = job.cancel
+        timings = job.timings
+        outcome = "failed"
         try:
-            audio_file = self.recorder.stop_recording()
+            timings["queue_wait"] = job.wait_seconds()
             
-            if not audio_file:
-                self.update_status("No audio")
-                time.sleep(1)
-                self.update_status("Ready")
-                self.state = "idle"
+            if cancel.cancelled:
+                # Cancelled while queued
+                if session:
+                    session.cancel()
+                outcome = "cancelled"
                 return
             
-            text = self.transcriber.transcribe(audio_file)
+            # Trim silent edges and skip silent recordings before the model
+            if self.vad and not isinstance(audio, str):
+                with span(timings, "vad"):
+                    audio, vad_info = self.vad.trim(audio)
+                timings["vad_trimmed_seconds"] = vad_info["trimmed_seconds"]
+                self.stats.record_vad(vad_info["trimmed_seconds"], skipped=not vad_info["speech"])
+                
+                if not vad_info["speech"]:
+                    if session:
+                        session.cancel()
+                    self._update_stats_display()
+                    audio = None
+            
+            text = ""
+            if audio is not None:
+                with span(timings, "transcribe"):
+                    if session:
+                        # With adaptive_models the session picks a model per segment
+                        timings["cold_start"] = self.residency.acquire(session.last_model)
+                        self._start_deadline(cancel, self._audio_seconds(job))
+                        # Only the tail after the last committed segment is decoded here
+                        text = session.finish(job.full_audio, cancel=cancel)
+                        timings.update(session.last_timings)
+                        if session.last_decision:
+                            self.residency.touch(session.last_decision["model"])
+                            self.stats.record_model_decision(session.last_decision)
+                            print(f"Model decision: {session.last_decision}")
+                    elif self.scheduler and not isinstance(audio, str):
+                        duration = len(audio) / self.recorder.sample_rate
+                        decision = self.scheduler.decide(duration)
+                        model = decision["model"]
+                        timings["cold_start"] = self.residency.acquire(model)
+                        self._start_deadline(cancel, duration)
+                        # Per-call timings: a streaming session for the next dictation may be decoding too
+                        text = self.transcriber.transcribe(audio, self.recorder.sample_rate, model_name=model,
+                                                           cancel=cancel, timings=timings)
+                        if "decode" in timings and not cancel.cancelled:
+                            self.scheduler.record(model, duration, timings["decode"], decision)
+                        self.stats.record_model_decision(decision)
+                        print(f"Model decision: {decision}")
+                    else:
+                        timings["cold_start"] = self.residency.acquire()
+                        self._start_deadline(cancel, None if isinstance(audio, str)
+                                             else len(audio) / self.recorder.sample_rate)
+                        text = self.transcriber.transcribe(audio, self.recorder.sample_rate, cancel=cancel,
+                                                           timings=timings)
+            
+            if cancel.cancelled:
+                # The decode stopped early; keep what finished only for a deadline
+                keep = (cancel.reason == "deadline" and text
+                        and self.config.get("paste_partial_on_deadline", True))
+                print(f"Transcription cancelled ({cancel.reason}), partial text {'kept' if keep else 'dropped'}")
+                if not keep:
+                    self._show_status("Timed out" if cancel.reason == "deadline" else "Cancelled")
+                    outcome = "cancelled"
+                    return
             
             if not text:
-                self.update_status("No speech")
-                time.sleep(1)
-                self.update_status("Ready")
-                self.state = "idle"
+                self._show_status("No speech")
+                outcome = "no_speech"
                 return
             
             # Record stats and history
-            self.stats.record_transcription(text)
-            self.history.add_entry(text)
-            self._update_stats_display()
-            self._update_history_menu()
+            with span(timings, "stats"):
+                self.stats.record_transcription(text)
+            with span(timings, "history"):
+                self.history.add_entry(text)
+            with span(timings, "menu_rebuild"):
+                self._update_stats_display()
+                self._update_history_menu()
             
-            # Paste text
-            success = self.injector.paste_text(text)
+            # Output waits while the next dictation is recorded (the hotkey is held)
+            timings["output_hold"] = self._hold_output()
+            if cancel.cancelled and cancel.reason == "user":
+                self._show_status("Cancelled")
+                outcome = "cancelled"
+                return
             
-            if success:
-                self.update_status("Done!")
+            # Paste text (or let type-as-you-speak catch up with the final transcript)
+            if job.incremental:
+                with span(timings, "paste"):
+                    success = job.incremental.finish(text)
+                timings["typed_keystrokes"] = job.incremental.keystrokes
             else:
-                self.update_status("Paste failed")
+                with span(timings, "paste"):
+                    success = self.injector.paste_text(text)
+                if not success and self.injector.last_error == "modifiers_held":
+                    # The next dictation started just now: paste once its hotkey is released
+                    timings["output_hold"] += self._hold_output()
+                    with span(timings, "paste"):
+                        success = self.injector.paste_text(text)
+                for name, seconds in self.injector.last_timings.items():
+                    timings[f"paste.{name}"] = seconds
             
-            time.sleep(0.5)
-            self.update_status("Ready")
+            if success:
+                outcome = "pasted"
+                self._show_status("Done!", 0.5)
+                
+                if self.refiner and not isinstance(audio, str) and not cancel.cancelled:
+                    threading.Thread(
+                        target=self._refine_transcription,
+                        args=(audio, text, self.injector.focus_snapshot(),
+                              release_time, time.perf_counter() - release_time),
+                        daemon=True
+                    ).start()
+            else:
+                self._show_status("Paste failed")
             
         except Exception as e:
-            self.update_status(f"Error: {str(e)[:20]}")
-            time.sleep(2)
-            self.update_status("Ready")
-        
+            self._show_status(f"Error: {str(e)[:20]}", 2.0)
         finally:
-            self.state = "idle"
+            if job.incremental and outcome != "pasted":
+                job.incremental.cancel()  # Take back the provisional text
+            record = self.latency.record(timings, release_time, self._audio_seconds(job), outcome)
+            print(f"Timings: {record['stages']}")
+            if outcome == "pasted":
+                self._update_latency_display()
+    
+    def _hold_output(self):
+        """
+        Wait until no dictation is being recorded
+        
+        Keystrokes sent while the hotkey is held would carry its modifiers
+        (and reach the hotkey listener), so pastes and two-pass corrections
+        of earlier dictations are released when the hotkey is.
+        
+        Returns:
+            Seconds waited
+        """
+        started = time.perf_counter()
+        self._output_released.wait()
+        return time.perf_counter() - started
+    
+    def _start_deadline(self, cancel, audio_seconds):
+        """
+        Start a job's decode deadline (call once its model is loaded: a cold load can't be cancelled)
+        
+        The deadline is a fixed allowance plus time per second of audio, so long
+        memos aren't cut short; an archived WAV of unknown length gets the longest
+        recording's deadline.
+        """
+        base = self.config.get("transcription_deadline_seconds", 30)
+        if not base:
+            return
+        if audio_seconds is None:
+            audio_seconds = self.config.get("max_recording_seconds", 300)
+        per_second = self.config.get("transcription_deadline_per_audio_second", 1.0)
+        cancel.start_deadline(base + per_second * audio_seconds)
+    
+    def _audio_seconds(self, job):
+        """Length of a job's recording (archived WAVs report it from the engine)"""
+        audio = job.full_audio if job.full_audio is not None else job.audio
+        if isinstance(audio, str):
+            return job.timings.get("audio_seconds")
+        return len(audio) / self.recorder.sample_rate
+    
+    def _refine_transcription(self, audio, draft, snapshot, release_time, draft_seconds):
+        """Second pass: re-transcribe with the larger model and correct the draft"""
+        try:
+            self.refiner_residency.acquire()
+            refined = self.refiner.transcribe(audio, self.recorder.sample_rate)
+        except Exception as e:
+            print(f"Refinement error: {e}")
+            return
+        refine_seconds = time.perf_counter() - release_time
+        
+        replaced = False
+        if refined and refined.strip() != draft.strip():
+            # Only touch the target if it is untouched since the draft paste
+            self._hold_output()
+            if self.injector.can_replace(snapshot):
+                replaced = self.injector.replace_text(draft, refined)
+            
+            if replaced:
+                self.history.replace_text(draft, refined)
+            else:
+                self.history.add_entry(refined)
+                rumps.notification("Oropo", "Refined text in History", refined[:50])
+            self._update_history_menu()
+        
+        self.stats.record_two_pass(draft_seconds, refine_seconds, replaced)
+        self._update_latency_display()
+        print(f"Two-pass: draft {draft_seconds:.2f}s, refined {refine_seconds:.2f}s, "
+              f"replaced={replaced}")
     
     def show_help(self, _):
         """Show usage instructions"""
@@ -404,6 +847,7 @@ class VoiceTypingApp(rumps.App):
                 f"2. Press and hold: {hotkey_label}\n\n"
                 f"3. Speak naturally\n\n"
                 f"4. Release - your text appears!\n\n"
+                f"Tap Esc to cancel a dictation that is still processing.\n\n"
                 f"Icons:\n"
                 f"🎤 = Ready\n"
                 f"🔴 = Recording\n"
@@ -423,10 +867,18 @@ class VoiceTypingApp(rumps.App):
         if self.listener:
             self.listener.stop()
         self.recorder.cleanup()
+        if isinstance(self.transcriber, TranscriptionWorker):
+            self.transcriber.close()
+        if isinstance(self.refiner, TranscriptionWorker):
+            self.refiner.close()
         rumps.quit_application()
 
 
 if __name__ == "__main__":
+    # In a frozen bundle (PyInstaller, py2app) a spawned transcription worker
+    # re-runs this executable; this hands it to the worker instead of the app
+    multiprocessing.freeze_support()
+    
     print("Starting Oropo Voice Typing...")
     print("Look for the 🎤 icon in your menu bar")
     
@@ -1,137 +1,331 @@
 """
 Audio Recorder Module
-Captures microphone input and saves to temporary WAV file
+Captures microphone input into a preallocated buffer and hands it over in memory
 Uses sounddevice (no Homebrew dependencies required)
-Includes audio level calculation for waveform display
+Publishes audio levels for the waveform display through a LevelMeter
+Optionally archives each recording as a WAV file (debug mode)
+Optional warm-capture mode keeps the stream open with a short pre-roll
 """
 
-import sounddevice as sd
 import soundfile as sf
-import numpy as np
 import tempfile
 import threading
+import time
 import os
+from datetime import datetime
+
+from capture_buffer import CaptureBuffer, RingBuffer
+from level_meter import LevelMeter
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # No PortAudio (e.g. headless Linux): only injected streams work
+    sd = None
 
 
 class AudioRecorder:
     """Records audio from the microphone using sounddevice"""
     
-    def __init__(self):
-        self.sample_rate = 16000  # Whisper requires 16kHz
+    def __init__(self, archive_dir=None, dtype="float32", max_seconds=300.0,
+                 warm_capture=False, preroll_seconds=0.3, warm_idle_seconds=120.0,
+                 capture_rate=16000, stream_class=None):
+        """
+        Initialize the recorder
+        
+        Args:
+            archive_dir: If set, recordings are also written to WAV files in
+                this directory and stop_recording returns the file path
+                (debug/archive mode). Default is a pure in-memory handoff.
+            dtype: Capture sample format, "float32" or "int16" (half the memory)
+            max_seconds: Recordings auto-stop when they reach this length
+            warm_capture: Keep the input stream open between recordings so
+                capture starts instantly, including the last preroll_seconds
+            preroll_seconds: Audio from before the key press kept in warm mode
+            warm_idle_seconds: Close the warm stream after this long unused
+            capture_rate: Sample rate to capture at, or "native" to use the
+                input device's own rate (e.g. 48kHz) and leave conversion to
+                the engine's resampler instead of PortAudio
+            stream_class: sounddevice.InputStream-compatible class to capture
+                with (benchmarks inject a replay stream); defaults to PortAudio
+        """
+        self.stream_class = stream_class
+        if capture_rate == "native":
+            capture_rate = self._native_sample_rate()
+        self.sample_rate = int(capture_rate)  # Whisper itself requires 16kHz
         self.channels = 1  # Mono
+        self.archive_dir = archive_dir
+        self.dtype = dtype
         
-        self.recording = []
+        self.buffer = CaptureBuffer(
+            sample_rate=self.sample_rate,
+            dtype=dtype,
+            max_seconds=max_seconds
+        )
         self.is_recording = False
         self.stream = None
+        self._status_at_start = {}
+        
+        # Warm capture: the callback fills the pre-roll while not recording
+        self.warm_capture = warm_capture
+        self.warm_idle_seconds = warm_idle_seconds
+        self.preroll = RingBuffer(preroll_seconds * self.sample_rate, dtype=dtype)
+        self._idle_timer = None
+        self._lock = threading.Lock()  # Switches callback between pre-roll and buffer
         
-        # Audio level callback for waveform
+        # Called (from a helper thread) when max_seconds is reached
+        self.auto_stop_callback = None
+        
+        # Per-stage timings (seconds) of the last stop_recording call
+        self.last_timings = {}
+        
+        # Audio levels are computed off the audio thread by the meter
+        self.meter = LevelMeter()
+        self.meter.subscribe(self._on_meter_levels)
         self.level_callback = None
         self.current_level = 0.0
         
+        # Overflow/underflow flags reported by PortAudio (cumulative)
+        self.status_counts = {"input_overflow": 0, "input_underflow": 0}
+        
+    @staticmethod
+    def _native_sample_rate():
+        """Default sample rate of the default input device (16kHz if unknown)"""
+        try:
+            return int(sd.query_devices(kind='input')['default_samplerate'])
+        except Exception as e:
+            print(f"Could not query input device rate: {e}")
+            return 16000
+    
     def set_level_callback(self, callback):
-        """Set callback for audio level updates"""
+        """Set callback for audio level updates (0-1, called at the meter frame rate)"""
         self.level_callback = callback
+    
+    def _on_meter_levels(self, peak, rms):
+        """Convert meter levels to the 0-1 display level"""
+        # Normalize to 0-1 range (amplify for visibility)
+        level = min(1.0, rms * 10)
+        self.current_level = level
+        
+        if self.level_callback:
+            self.level_callback(level)
+    
+    def set_auto_stop_callback(self, callback):
+        """Set callback fired when a recording hits the maximum duration"""
+        self.auto_stop_callback = callback
         
     def _audio_callback(self, indata, frames, time, status):
-        """Callback for audio stream"""
-        if self.is_recording:
-            self.recording.append(indata.copy())
+        """Callback for audio stream (real-time thread: no allocation-heavy work)"""
+        if status:
+            if status.input_overflow:
+                self.status_counts["input_overflow"] += 1
+            if status.input_underflow:
+                self.status_counts["input_underflow"] += 1
+        
+        with self._lock:
+            if not self.is_recording:
+                if self.warm_capture:
+                    self.preroll.write(indata)
+                return
             
-            # Calculate audio level (RMS)
-            rms = np.sqrt(np.mean(indata**2))
-            # Normalize to 0-1 range (amplify for visibility)
-            level = min(1.0, rms * 10)
-            self.current_level = level
+            if self.buffer.full:
+                return
             
-            # Call the level callback if set
-            if self.level_callback:
-                try:
-                    self.level_callback(level)
-                except Exception:
-                    pass
+            self.buffer.write(indata)
+            if self.buffer.full:
+                # Hard memory cap reached (e.g. stuck hotkey) - stop from outside
+                # the audio thread
+                self._fire_auto_stop()
+                return
+        
+        # Cheap block stats only; levels are published by the meter thread
+        self.meter.push(indata)
+    
+    def _fire_auto_stop(self):
+        """Notify the auto-stop callback without blocking the audio thread"""
+        print(f"Recording reached the {self.buffer.duration:.0f}s limit, stopping")
+        if self.auto_stop_callback:
+            threading.Thread(target=self.auto_stop_callback, daemon=True).start()
+    
+    def _open_stream(self):
+        """Open and start the input stream if it isn't running"""
+        if self.stream:
+            return
+        
+        stream_class = self.stream_class
+        if stream_class is None:
+            if sd is None:
+                raise RuntimeError("sounddevice (PortAudio) is not available")
+            stream_class = sd.InputStream
+        
+        self.stream = stream_class(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype=self.dtype,
+            callback=self._audio_callback
+        )
+        self.stream.start()
+    
+    def _close_stream(self, only_if_idle=False):
+        """Stop and close the input stream (only_if_idle: unless a recording has started)"""
+        # Detach under the lock, stop outside it: stop() waits for the callback, which takes the lock
+        with self._lock:
+            if only_if_idle and self.is_recording:
+                return
+            stream, self.stream = self.stream, None
+            self.preroll.clear()
+        if stream:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                pass
+    
+    def _cancel_idle_timer(self):
+        """Cancel a pending idle close of the warm stream"""
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+    
+    def _schedule_idle_close(self):
+        """Close the warm stream after warm_idle_seconds without a recording"""
+        self._cancel_idle_timer()
+        self._idle_timer = threading.Timer(self.warm_idle_seconds, self._close_idle_stream)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+    
+    def _close_idle_stream(self):
+        """Release the microphone once warm capture has been idle"""
+        # Checked under the lock: start_recording may be reusing the stream right now
+        self._close_stream(only_if_idle=True)
+    
+    def warm_up(self):
+        """Open the stream ahead of the first recording (warm-capture mode only)"""
+        if not self.warm_capture or self.is_recording:
+            return
+        try:
+            self._open_stream()
+            self._schedule_idle_close()
+        except Exception as e:
+            print(f"Could not open warm input stream: {e}")
     
     def start_recording(self):
         """Start recording audio from microphone"""
         if self.is_recording:
             return
         
-        self.recording = []
-        self.is_recording = True
+        self._cancel_idle_timer()
+        self.buffer.reset()
         self.current_level = 0.0
+        self._status_at_start = dict(self.status_counts)
+        self.meter.start()
         
         try:
-            self.stream = sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=self.channels,
-                callback=self._audio_callback
-            )
-            self.stream.start()
+            with self._lock:
+                if self.stream and self.warm_capture:
+                    # Stream is already running - start from the pre-roll instantly
+                    self.buffer.write(self.preroll.read())
+                    self.preroll.clear()
+                # From here an idle close leaves the stream alone
+                self.is_recording = True
+            
+            self._open_stream()
             
         except Exception as e:
             self.is_recording = False
             raise Exception(f"Could not start recording: {e}")
     
     def stop_recording(self):
-        """Stop recording and save to temporary WAV file"""
+        """
+        Stop recording and return the captured audio
+        
+        Returns:
+            Contiguous mono numpy view over the capture buffer at
+            self.sample_rate (float32, or int16 in int16 mode), or the path to
+            a WAV file when archive_dir is set. None if nothing (or less than
+            0.5s) was recorded.
+        """
         if not self.is_recording:
             return None
         
-        self.is_recording = False
-        self.current_level = 0.0
-        
-        # Stop stream
-        if self.stream:
-            try:
-                self.stream.stop()
-                self.stream.close()
-            except Exception:
-                pass
-            self.stream = None
+        with self._lock:
+            self.is_recording = False
+        self.meter.stop()
+        self.last_timings = {}
         
-        # Check if we have any audio
-        if not self.recording:
-            return None
+        for flag, count in self.status_counts.items():
+            dropped = count - self._status_at_start.get(flag, 0)
+            if dropped:
+                print(f"Audio {flag.replace('_', ' ')}: {dropped} block(s) this recording")
         
-        # Combine all recorded chunks
-        audio_data = np.concatenate(self.recording, axis=0)
+        # Stop stream (warm capture keeps it running until idle)
+        started = time.perf_counter()
+        if self.warm_capture:
+            self._schedule_idle_close()
+        else:
+            self._close_stream()
+        self.last_timings["stop_stream"] = time.perf_counter() - started
         
         # Check minimum duration (0.5 seconds)
-        duration = len(audio_data) / self.sample_rate
-        if duration < 0.5:
+        if self.buffer.duration < 0.5:
             return None
         
-        # Save to temporary file
+        # Recorded samples are already contiguous - no concatenation or copy
+        audio_data = self.buffer.view()
+        
+        if self.archive_dir:
+            # Debug/archive mode: hand over the WAV path instead of the buffer
+            path = self.save_recording(audio_data, self.archive_dir)
+            if path:
+                return path
+        
+        return audio_data
+    
+    def save_recording(self, audio_data, directory=None):
+        """
+        Write audio to a WAV file
+        
+        Args:
+            audio_data: Mono float32 or int16 samples at self.sample_rate
+            directory: Target directory (a temporary file is used if None)
+            
+        Returns:
+            Path to the WAV file, or None on failure
+        """
+        started = time.perf_counter()
         try:
-            temp_file = tempfile.NamedTemporaryFile(
-                suffix='.wav',
-                delete=False
-            )
-            temp_path = temp_file.name
-            temp_file.close()
+            if directory:
+                if not os.path.exists(directory):
+                    os.makedirs(directory)
+                name = datetime.now().strftime("recording-%Y%m%d-%H%M%S-%f.wav")
+                path = os.path.join(directory, name)
+            else:
+                temp_file = tempfile.NamedTemporaryFile(
+                    suffix='.wav',
+                    delete=False
+                )
+                path = temp_file.name
+                temp_file.close()
             
-            sf.write(temp_path, audio_data, self.sample_rate)
+            sf.write(path, audio_data, self.sample_rate)
             
-            return temp_path
+            return path
             
         except Exception as e:
             print(f"Error saving audio: {e}")
             return None
+        
+        finally:
+            self.last_timings["write_wav"] = time.perf_counter() - started
     
     def cleanup(self):
         """Cleanup audio resources"""
-        if self.stream:
-            try:
-                self.stream.stop()
-                self.stream.close()
-            except Exception:
-                pass
-            self.stream = None
+        self._cancel_idle_timer()
+        self._close_stream()
 
 
 # Test the recorder
 if __name__ == "__main__":
-    import time
-    
     print("Testing Audio Recorder with level display...")
     recorder = AudioRecorder()
     
@@ -145,12 +339,12 @@ if __name__ == "__main__":
     print("Recording for 5 seconds - speak to see the levels!")
     recorder.start_recording()
     time.sleep(5)
-    audio_file = recorder.stop_recording()
+    audio = recorder.stop_recording()
     print()  # New line
     
-    if audio_file:
-        print(f"✅ Audio saved to: {audio_file}")
-        print(f"   File size: {os.path.getsize(audio_file)} bytes")
+    if audio is not None:
+        print(f"✅ Recorded {len(audio) / recorder.sample_rate:.2f}s ({audio.dtype})")
+        print(f"   Timings: {recorder.last_timings}")
     else:
         print("❌ No audio recorded")
     
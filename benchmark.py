@@ -0,0 +1,374 @@
+"""
+Benchmark Module
+End-to-end latency benchmark: key release to paste, stage by stage
+Replays fixture WAVs through AudioRecorder's capture path, VAD trimming,
+TranscriptionEngine, stats/history post-processing and TextInjector (on the
+fake injection backend, so nothing is typed), and
+writes a JSON report (per-stage wall time, RTF, peak RSS, cold vs warm start).
+A saved report can be used as a baseline to flag regressions.
+Runs headless (no microphone or PortAudio) with the fake or a CPU backend:
+  python benchmark.py --backend fake -o report.json
+  python benchmark.py --backend fake --compare baseline.json
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import soundfile as sf
+
+from audio_recorder import AudioRecorder
+from history_manager import HistoryManager
+from injection_backends import FakeInjectionBackend
+from stats_manager import StatsManager
+from text_injector import TextInjector
+from transcription_engine import TranscriptionEngine
+from voice_activity import VoiceActivityDetector
+
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 512  # Samples per simulated audio callback
+
+# Generated fixtures: (name, seconds of speech-like signal per sentence, sentences)
+FIXTURES = [
+    ("silence_5s", 0, 0),
+    ("short_2s", 2, 1),
+    ("medium_8s", 4, 2),
+    ("long_24s", 6, 4),
+    ("longform_75s", 7.5, 10),  # Above long_form_seconds: parallel segment decode
+]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes vs KB
+
+
+def _speech_like(seconds, rng):
+    """Syllable-rate bursts of a voiced harmonic signal with a little noise"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    return 0.25 * envelope * voiced + 0.01 * rng.standard_normal(len(t))
+
+
+def generate_fixtures(directory):
+    """Write the synthetic fixture WAVs (deterministic) if they are missing"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    rng = np.random.default_rng(1234)
+    for name, sentence_seconds, sentences in FIXTURES:
+        path = os.path.join(directory, f"{name}.wav")
+        if os.path.exists(path):
+            continue
+        if sentences == 0:
+            audio = 0.002 * rng.standard_normal(int(5 * SAMPLE_RATE))  # Room noise only
+        else:
+            parts = [np.zeros(int(0.3 * SAMPLE_RATE))]
+            for _ in range(sentences):
+                parts.append(_speech_like(sentence_seconds - 0.6, rng))
+                parts.append(0.002 * rng.standard_normal(int(0.6 * SAMPLE_RATE)))  # Pause
+            audio = np.concatenate(parts)
+        sf.write(path, audio.astype(np.float32), SAMPLE_RATE, subtype="PCM_16")
+
+
+class ReplayStream:
+    """InputStream stand-in: the benchmark pushes fixture audio into the callback"""
+    
+    def __init__(self, samplerate, channels, dtype, callback, **kwargs):
+        self.samplerate = samplerate
+        self.dtype = dtype
+        self.callback = callback
+        self.callback_seconds = 0.0
+        self.blocks = 0
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def feed(self, audio):
+        """Deliver audio in callback-sized blocks (as fast as possible)"""
+        if self.dtype == "int16":
+            audio = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+        else:
+            audio = audio.astype(np.float32)
+        for start in range(0, len(audio), BLOCK_SIZE):
+            block = audio[start:start + BLOCK_SIZE].reshape(-1, 1)
+            started = time.perf_counter()
+            self.callback(block, len(block), None, None)
+            self.callback_seconds += time.perf_counter() - started
+            self.blocks += 1
+
+
+class Benchmark:
+    """Runs fixtures through the dictation path and collects stage timings"""
+    
+    def __init__(self, backend="fake", model_name="fake", decode_workers=2,
+                 decode_profile="balanced", capture_dtype="float32"):
+        self.backend = backend
+        self.model_name = model_name
+        self.decode_workers = decode_workers
+        self.decode_profile = decode_profile
+        self.capture_dtype = capture_dtype
+        
+        # Post-processing writes go to a scratch directory, never ~/.oropo
+        self.data_dir = tempfile.mkdtemp(prefix="oropo-bench-")
+        self.stats = StatsManager(data_dir=self.data_dir)
+        self.history = HistoryManager(data_dir=self.data_dir)
+        self.injector = TextInjector(backend=FakeInjectionBackend())
+        self.vad = VoiceActivityDetector(SAMPLE_RATE)
+        self.recorder = AudioRecorder(
+            dtype=capture_dtype,
+            max_seconds=600,
+            stream_class=ReplayStream
+        )
+        self.engine = None
+    
+    def close(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    def _create_engine(self):
+        return TranscriptionEngine(
+            self.model_name,
+            decode_workers=self.decode_workers,
+            backend=self.backend,
+            decode_profile=self.decode_profile
+        )
+    
+    def run_dictation(self, audio):
+        """
+        One dictation: capture, release, VAD, transcribe, post-process, paste
+        
+        Returns:
+            dict of stage wall times (seconds) and results
+        """
+        self.recorder.start_recording()
+        stream = self.recorder.stream
+        stream.feed(audio)
+        
+        stages = {"callback_per_block": stream.callback_seconds / max(stream.blocks, 1)}
+        release = time.perf_counter()
+        recorded = self.recorder.stop_recording()
+        stages["stop_recording"] = time.perf_counter() - release
+        
+        started = time.perf_counter()
+        trimmed, vad_info = self.vad.trim(recorded)
+        stages["vad"] = time.perf_counter() - started
+        
+        text = ""
+        if vad_info["speech"]:
+            started = time.perf_counter()
+            text = self.engine.transcribe(trimmed, self.recorder.sample_rate)
+            stages["transcribe"] = time.perf_counter() - started
+            for key in ("prepare_audio", "decode"):
+                if key in self.engine.last_timings:
+                    stages[key] = self.engine.last_timings[key]
+        
+        if text:
+            started = time.perf_counter()
+            self.stats.record_transcription(text)
+            self.history.add_entry(text)
+            stages["post_process"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            self.injector.paste_text(text)
+            stages["paste"] = time.perf_counter() - started
+        
+        stages["release_to_paste"] = time.perf_counter() - release
+        return {
+            "stages": stages,
+            "speech": vad_info["speech"],
+            "trimmed_seconds": vad_info["trimmed_seconds"],
+            "words": len(text.split()),
+        }
+    
+    def run(self, fixtures, repeats=3):
+        """
+        Benchmark a cold start, then warm runs of every fixture
+        
+        Args:
+            fixtures: List of WAV paths
+            repeats: Warm runs per fixture (medians are reported)
+        """
+        audio_by_name = {}
+        for path in fixtures:
+            audio, rate = sf.read(path, dtype="float32")
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
+            if rate != SAMPLE_RATE:
+                from resampler import resample
+                audio = resample(audio, rate, SAMPLE_RATE)
+            audio_by_name[os.path.splitext(os.path.basename(path))[0]] = audio
+        
+        # Cold: engine creation, model load and warm-up, then the first dictation
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        self.engine = self._create_engine()
+        engine_init = time.perf_counter() - started
+        started = time.perf_counter()
+        self.engine._ensure_model()
+        ensure_model = time.perf_counter() - started
+        speech = [name for name, audio in audio_by_name.items() if self.vad.is_speech(audio)]
+        first_name = min(speech or audio_by_name, key=lambda name: len(audio_by_name[name]))
+        first = self.run_dictation(audio_by_name[first_name])
+        cold = {
+            "fixture": first_name,
+            "engine_init": engine_init,
+            "load": self.engine.load_seconds,
+            "warmup": self.engine.warmup_seconds,
+            "ensure_model": ensure_model,
+            "first_release_to_paste": first["stages"]["release_to_paste"],
+            "model_rss_mb": round(peak_rss_mb() - rss_before, 1),
+        }
+        
+        results = {}
+        for name, audio in audio_by_name.items():
+            duration = len(audio) / SAMPLE_RATE
+            runs = [self.run_dictation(audio) for _ in range(repeats)]
+            stage_names = sorted({stage for run in runs for stage in run["stages"]})
+            stages = {
+                stage: statistics.median(run["stages"][stage] for run in runs if stage in run["stages"])
+                for stage in stage_names
+            }
+            results[name] = {
+                "duration": round(duration, 3),
+                "speech": runs[0]["speech"],
+                "words": runs[0]["words"],
+                "trimmed_seconds": round(runs[0]["trimmed_seconds"], 3),
+                "stages": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+                "rtf": round(stages["transcribe"] / duration, 4) if "transcribe" in stages else None,
+                "release_to_paste_max": round(max(run["stages"]["release_to_paste"] for run in runs), 6),
+            }
+            print(f"{name:>16}: {duration:6.1f}s audio, release->paste "
+                  f"{stages['release_to_paste'] * 1000:8.1f}ms"
+                  + (f", RTF {results[name]['rtf']:.3f}" if results[name]["rtf"] is not None else ", skipped"),
+                  file=sys.stderr)
+        
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "backend": self.engine.backend.name,
+                "model": self.model_name,
+                "decode_profile": self.decode_profile,
+                "decode_workers": self.decode_workers,
+                "capture_dtype": self.capture_dtype,
+                "repeats": repeats,
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "python": platform.python_version(),
+            },
+            "cold": {key: round(value, 6) if isinstance(value, float) else value
+                     for key, value in cold.items()},
+            "fixtures": results,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+def compare_reports(report, baseline, threshold=0.2, min_delta=0.005):
+    """
+    Find stages that got slower than the baseline
+    
+    Args:
+        threshold: Allowed relative slowdown (0.2 = 20%)
+        min_delta: Ignore absolute slowdowns below this many seconds (noise)
+    
+    Returns:
+        List of (where, baseline_value, new_value) regressions
+    """
+    regressions = []
+    
+    def check(where, old, new, floor=min_delta):
+        if old is None or new is None:
+            return
+        if new > old * (1 + threshold) and new - old > floor:
+            regressions.append((where, old, new))
+    
+    for name, result in report["fixtures"].items():
+        base = baseline.get("fixtures", {}).get(name)
+        if not base:
+            continue
+        for stage, seconds in result["stages"].items():
+            check(f"{name}.{stage}", base["stages"].get(stage), seconds)
+        check(f"{name}.rtf", base.get("rtf"), result.get("rtf"), floor=0.0)
+    
+    for key in ("ensure_model", "first_release_to_paste"):
+        check(f"cold.{key}", baseline.get("cold", {}).get(key), report["cold"].get(key))
+    check("peak_rss_mb", baseline.get("peak_rss_mb"), report.get("peak_rss_mb"), floor=10.0)
+    return regressions
+
+
+def add_arguments(parser):
+    """Benchmark options (shared with `python -m oropo benchmark`)"""
+    parser.add_argument("--backend", default="fake", help="fake (default), faster-whisper, mlx or auto")
+    parser.add_argument("--model", default=None, help="model name (default: 'fake' or the small model)")
+    parser.add_argument("--fixtures", default=os.path.expanduser("~/.oropo/benchmark/fixtures"),
+                        help="directory of WAV fixtures (synthetic ones are generated there)")
+    parser.add_argument("--repeats", type=int, default=3, help="warm runs per fixture")
+    parser.add_argument("--decode-workers", type=int, default=2)
+    parser.add_argument("--decode-profile", default="balanced")
+    parser.add_argument("--capture-dtype", default="float32", choices=["float32", "int16"])
+    parser.add_argument("-o", "--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved report")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+
+
+def run(args):
+    """Run the benchmark from parsed arguments; exit code 1 on regressions"""
+    generate_fixtures(args.fixtures)
+    fixtures = sorted(glob.glob(os.path.join(args.fixtures, "*.wav")))
+    model = args.model or ("fake" if args.backend == "fake" else "mlx-community/whisper-small-mlx")
+    
+    # Progress (and the engine's own messages) go to stderr; stdout carries only the report
+    with redirect_stdout(sys.stderr):
+        bench = Benchmark(args.backend, model, args.decode_workers, args.decode_profile, args.capture_dtype)
+        try:
+            report = bench.run(fixtures, repeats=args.repeats)
+        finally:
+            bench.close()
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions against {args.compare} (threshold {args.threshold:.0%})", file=sys.stderr)
+            return 0
+        print(f"{len(regressions)} regression(s) against {args.compare}:", file=sys.stderr)
+        for where, old, new in regressions:
+            print(f"  {where}: {old:.4f} -> {new:.4f} ({(new / old - 1) if old else float('inf'):+.0%})",
+                  file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Oropo end-to-end latency benchmark")
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,173 @@
+"""
+Capture Buffer Module
+Preallocated sample store for microphone capture
+Grows in fixed-size chunks up to a hard cap, so the audio callback never
+allocates per block and memory cannot grow without limit
+Also provides a fixed-size ring buffer for pre-roll audio
+"""
+
+import numpy as np
+
+
+class CaptureBuffer:
+    """Contiguous, chunk-growable sample buffer with a maximum duration"""
+    
+    def __init__(self, sample_rate=16000, dtype="float32", chunk_seconds=30.0, max_seconds=300.0):
+        """
+        Initialize the buffer
+        
+        Args:
+            sample_rate: Samples per second (mono)
+            dtype: "float32" or "int16" (int16 halves memory)
+            chunk_seconds: Capacity added each time the buffer fills up
+            max_seconds: Hard cap; writes beyond it are dropped and `full` is set
+        """
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.chunk_samples = max(1, int(chunk_seconds * sample_rate))
+        self.max_samples = max(1, int(max_seconds * sample_rate))
+        
+        self._data = np.empty(0, dtype=self.dtype)
+        self._length = 0
+        self.full = False
+    
+    def reset(self):
+        """
+        Start a new recording with a fresh preallocated chunk
+        
+        Views returned for the previous recording stay valid, because the
+        old storage is released rather than overwritten.
+        """
+        capacity = min(self.chunk_samples, self.max_samples)
+        self._data = np.empty(capacity, dtype=self.dtype)
+        self._length = 0
+        self.full = False
+    
+    def _grow(self, needed):
+        """Extend capacity by whole chunks (never beyond max_samples)"""
+        capacity = len(self._data)
+        while capacity < needed and capacity < self.max_samples:
+            capacity = min(capacity + self.chunk_samples, self.max_samples)
+        if capacity == len(self._data):
+            return
+        
+        data = np.empty(capacity, dtype=self.dtype)
+        data[:self._length] = self._data[:self._length]
+        self._data = data
+    
+    def write(self, block):
+        """
+        Append a block of samples (frames x 1 or 1-D)
+        
+        Returns:
+            Number of samples stored; fewer than given once the cap is reached
+        """
+        samples = block.reshape(-1)
+        count = len(samples)
+        end = self._length + count
+        
+        if end > len(self._data):
+            self._grow(end)
+            if end > len(self._data):
+                count = len(self._data) - self._length
+                end = len(self._data)
+                self.full = True
+        
+        if count > 0:
+            self._data[self._length:end] = samples[:count]
+            self._length = end
+        return count
+    
+    def __len__(self):
+        return self._length
+    
+    @property
+    def duration(self):
+        """Recorded duration in seconds"""
+        return self._length / self.sample_rate
+    
+    @property
+    def nbytes(self):
+        """Currently allocated memory in bytes"""
+        return self._data.nbytes
+    
+    def view(self, start=0, end=None):
+        """Contiguous view over the recorded samples (no copy)"""
+        if end is None or end > self._length:
+            end = self._length
+        return self._data[start:end]
+    
+    def as_float32(self, start=0, end=None):
+        """Recorded samples as float32 in [-1, 1] (copies only for int16)"""
+        data = self.view(start, end)
+        if self.dtype == np.float32:
+            return data
+        return data.astype(np.float32) / 32768.0
+
+
+class RingBuffer:
+    """Fixed-capacity circular buffer keeping the most recent samples"""
+    
+    def __init__(self, capacity, dtype="float32"):
+        """
+        Initialize the ring buffer
+        
+        Args:
+            capacity: Number of samples kept
+            dtype: Sample format
+        """
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._pos = 0  # Next write position
+        self._count = 0
+    
+    def clear(self):
+        """Forget all samples"""
+        self._pos = 0
+        self._count = 0
+    
+    def write(self, block):
+        """Append samples, overwriting the oldest ones"""
+        samples = block.reshape(-1)
+        if len(samples) >= self.capacity:
+            self._data[:] = samples[-self.capacity:]
+            self._pos = 0
+            self._count = self.capacity
+            return
+        
+        end = self._pos + len(samples)
+        if end <= self.capacity:
+            self._data[self._pos:end] = samples
+        else:
+            split = self.capacity - self._pos
+            self._data[self._pos:] = samples[:split]
+            self._data[:end - self.capacity] = samples[split:]
+        self._pos = end % self.capacity
+        self._count = min(self.capacity, self._count + len(samples))
+    
+    def __len__(self):
+        return self._count
+    
+    def read(self):
+        """Return the stored samples, oldest first (a copy)"""
+        if self._count < self.capacity:
+            return self._data[self._pos - self._count:self._pos].copy()
+        return np.concatenate((self._data[self._pos:], self._data[:self._pos]))
+
+
+# Test
+if __name__ == "__main__":
+    buffer = CaptureBuffer(sample_rate=16000, dtype="int16", chunk_seconds=1, max_seconds=2.5)
+    buffer.reset()
+    
+    block = np.ones((512, 1), dtype=np.int16)
+    while not buffer.full:
+        buffer.write(block)
+    
+    print(f"Stored {buffer.duration:.2f}s in {buffer.nbytes} bytes (full={buffer.full})")
+    print(f"View shares memory: {np.shares_memory(buffer.view(), buffer._data)}")
+    
+    ring = RingBuffer(5, dtype="int16")
+    for i in range(4):
+        ring.write(np.array([2 * i, 2 * i + 1], dtype=np.int16))
+    print(f"Ring keeps the newest samples: {ring.read()}")
@@ -6,40 +6,50 @@ Supports custom hotkey combinations
 
 import os
 import json
-from pynput import keyboard
 
+try:
+    from pynput import keyboard
+except ImportError:
+    # Headless tools (python -m oropo) only read settings; hotkeys need pynput and a display
+    keyboard = None
 
-# Modifier key mappings
-MODIFIER_KEYS = {
-    keyboard.Key.cmd: "⌘ Command",
-    keyboard.Key.cmd_l: "⌘ Command",
-    keyboard.Key.cmd_r: "⌘ Command",
-    keyboard.Key.ctrl: "⌃ Control",
-    keyboard.Key.ctrl_l: "⌃ Control",
-    keyboard.Key.ctrl_r: "⌃ Control",
-    keyboard.Key.alt: "⌥ Option",
-    keyboard.Key.alt_l: "⌥ Option",
-    keyboard.Key.alt_r: "⌥ Option",
-    keyboard.Key.shift: "⇧ Shift",
-    keyboard.Key.shift_l: "⇧ Shift",
-    keyboard.Key.shift_r: "⇧ Shift",
-}
+from transcription_backends import detect_backend
 
-# Default hotkey presets
-HOTKEY_PRESETS = {
-    "right_command": {
-        "keys": [keyboard.Key.cmd_r],
-        "label": "Right Command ⌘"
-    },
-    "control_option": {
-        "keys": [keyboard.Key.ctrl, keyboard.Key.alt],
-        "label": "Control + Option"
-    },
-    "control_shift": {
-        "keys": [keyboard.Key.ctrl, keyboard.Key.shift],
-        "label": "Control + Shift"
-    },
-}
+
+MODIFIER_KEYS = {}
+HOTKEY_PRESETS = {}
+if keyboard is not None:
+    # Modifier key mappings
+    MODIFIER_KEYS = {
+        keyboard.Key.cmd: "⌘ Command",
+        keyboard.Key.cmd_l: "⌘ Command",
+        keyboard.Key.cmd_r: "⌘ Command",
+        keyboard.Key.ctrl: "⌃ Control",
+        keyboard.Key.ctrl_l: "⌃ Control",
+        keyboard.Key.ctrl_r: "⌃ Control",
+        keyboard.Key.alt: "⌥ Option",
+        keyboard.Key.alt_l: "⌥ Option",
+        keyboard.Key.alt_r: "⌥ Option",
+        keyboard.Key.shift: "⇧ Shift",
+        keyboard.Key.shift_l: "⇧ Shift",
+        keyboard.Key.shift_r: "⇧ Shift",
+    }
+    
+    # Default hotkey presets
+    HOTKEY_PRESETS = {
+        "right_command": {
+            "keys": [keyboard.Key.cmd_r],
+            "label": "Right Command ⌘"
+        },
+        "control_option": {
+            "keys": [keyboard.Key.ctrl, keyboard.Key.alt],
+            "label": "Control + Option"
+        },
+        "control_shift": {
+            "keys": [keyboard.Key.ctrl, keyboard.Key.shift],
+            "label": "Control + Shift"
+        },
+    }
 
 
 class ConfigManager:
@@ -65,7 +75,40 @@ class ConfigManager:
         default_config = {
             "hotkey_preset": "right_command",
             "custom_hotkey": None,  # List of key names for custom combo
-            "model": "mlx-community/whisper-small-mlx"
+            "model": "mlx-community/whisper-small-mlx",
+            "archive_recordings": False,  # Keep a WAV of every dictation (debug)
+            "capture_dtype": "float32",  # "int16" halves recording memory
+            "max_recording_seconds": 300,  # Auto-stop (e.g. stuck hotkey)
+            "streaming_transcription": True,  # Decode segments while recording
+            "vad_enabled": True,  # Trim silence, skip silent recordings
+            "vad_use_model": False,  # Also use the WebRTC VAD model (webrtcvad)
+            "warm_capture": False,  # Keep the mic stream open between dictations
+            "preroll_ms": 300,  # Audio kept from just before the key press
+            "warm_idle_seconds": 120,  # Release the mic after this long unused
+            "capture_rate": 16000,  # Or "native" to resample in-app from the device rate
+            "decode_workers": 2,  # Parallel segment decodes for recordings over 30s (capped by the backend; MLX decodes one at a time)
+            "backend": "auto",  # "mlx", "faster-whisper", "fake" or auto-detect
+            "decode_profile": "balanced",  # "fastest", "balanced" or "accurate" (see autotune)
+            "quantization": None,  # 8 or 4 to run quantized weights (cached in ~/.oropo/models)
+            "worker_process": False,  # Run the model in a separate process
+            "two_pass": False,  # Paste a fast draft, then refine with a larger model
+            "draft_model": "mlx-community/whisper-base-mlx",
+            "refine_model": "mlx-community/whisper-large-v3-turbo",
+            "adaptive_models": [],  # Candidates, most accurate first; chosen per dictation
+            "latency_budget_seconds": 1.5,  # Target decode time for adaptive_models
+            "cancel_key": "esc",  # Tap to abandon the current dictation ("" disables)
+            "transcription_deadline_seconds": 30,  # Give up on a decode after this plus the per-second allowance (0 = never)
+            "transcription_deadline_per_audio_second": 1.0,  # Extra deadline per second of audio (counted from model loaded)
+            "paste_partial_on_deadline": True,  # Paste what was decoded when the deadline hits
+            "model_idle_unload_seconds": 900,  # Free the model after this long unused (0 = keep loaded)
+            "model_memory_budget_mb": 0,  # Memory for warm adaptive_models, LRU unloaded (0 = no limit)
+            "history_retention_days": 0,  # Delete history older than this (0 = keep everything)
+            "injection_backend": "auto",  # "mac" (Quartz events), "pyautogui" or "fake"
+            "type_as_you_speak": False,  # Type the transcript live while dictating (needs streaming)
+            "partial_interval_seconds": 1.0,  # How often the live text is re-decoded
+            "typing_chars_per_second": 120,  # Live typing rate limit (keystrokes, incl. corrections)
+            "profiling": False,  # CPU profile + allocation diff per dictation in ~/.oropo/profiles
+            "debug_menu": False  # Show the profiling toggle in the menu
         }
         
         try:
@@ -86,6 +129,37 @@ class ConfigManager:
         except Exception:
             pass
     
+    def get(self, key, default=None):
+        """Get a config value"""
+        return self.config.get(key, default)
+    
+    def set(self, key, value):
+        """Set a config value and persist it"""
+        self.config[key] = value
+        self._save_config()
+    
+    def get_recordings_dir(self):
+        """Get the WAV archive directory, or None when archiving is off"""
+        if self.config.get("archive_recordings"):
+            return os.path.join(self.config_dir, "recordings")
+        return None
+    
+    def get_backend_name(self):
+        """Get the transcription backend, auto-detected from the hardware if unset"""
+        name = self.config.get("backend", "auto")
+        if name == "auto":
+            return detect_backend()
+        return name
+    
+    def get_cancel_key(self):
+        """Get the pynput key that cancels a dictation, or None"""
+        name = self.config.get("cancel_key")
+        if not name:
+            return None
+        if len(name) == 1:
+            return keyboard.KeyCode.from_char(name)
+        return getattr(keyboard.Key, name, None)
+    
     def get_hotkey_keys(self):
         """Get the list of keys for the current hotkey"""
         # Check for custom hotkey first
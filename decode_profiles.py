@@ -0,0 +1,159 @@
+"""
+Decode Profiles Module
+Named latency/accuracy presets for Whisper decoding, and an autotuner
+The autotuner runs a reference corpus (WAV files with matching .txt
+transcripts) through each profile and picks the fastest one whose word
+error rate stays under a threshold
+"""
+
+import os
+import re
+import glob
+import time
+
+
+# Options passed to backend.transcribe. Backends drop what they don't support
+# (mlx_whisper has no beam search, so beam_size only affects faster-whisper).
+PROFILES = {
+    "fastest": {
+        "temperature": 0.0,  # Greedy, no fallback re-decodes
+        "condition_on_previous_text": False,
+        "compression_ratio_threshold": None,
+        "logprob_threshold": None,
+        "no_speech_threshold": None,
+    },
+    "balanced": {
+        "temperature": (0.0, 0.4, 0.8),  # Fall back only for failed windows
+        "condition_on_previous_text": False,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+    },
+    "accurate": {
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "condition_on_previous_text": True,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+        "best_of": 5,
+        "beam_size": 5,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def profile_options(name):
+    """Decode options for a profile name (unknown names get the default)"""
+    if name not in PROFILES:
+        print(f"Unknown decode profile '{name}', using '{DEFAULT_PROFILE}'")
+        name = DEFAULT_PROFILE
+    return dict(PROFILES[name])
+
+
+def _words(text):
+    """Lowercase words without punctuation, for scoring"""
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_errors(reference, hypothesis):
+    """
+    Word-level edit distance
+    
+    Returns:
+        (errors, reference_word_count)
+    """
+    ref = _words(reference)
+    hyp = _words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,  # Deletion
+                current[j - 1] + 1,  # Insertion
+                previous[j - 1] + (ref_word != hyp_word),  # Substitution
+            )
+        previous = current
+    return previous[-1], len(ref)
+
+
+def word_error_rate(reference, hypothesis):
+    """Word error rate of a hypothesis against a reference transcript"""
+    errors, count = word_errors(reference, hypothesis)
+    return errors / max(count, 1)
+
+
+def load_corpus(directory):
+    """
+    Find reference clips: every audio file with a transcript next to it
+    
+    Returns:
+        List of (audio_path, reference_text), sorted by path
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        transcript = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(transcript):
+            with open(transcript, 'r') as f:
+                corpus.append((path, f.read().strip()))
+    return corpus
+
+
+def autotune(engine, corpus, max_wer=0.1, profiles=None):
+    """
+    Benchmark decode profiles on a corpus
+    
+    Args:
+        engine: TranscriptionEngine (its profile is restored afterwards)
+        corpus: List of (audio_path, reference_text)
+        max_wer: Highest acceptable corpus word error rate
+        profiles: Profile names to try (all by default)
+    
+    Returns:
+        (chosen_profile, results) where results maps profile name to
+        {"wer", "decode_seconds", "rtf"}. chosen_profile is the fastest one
+        within max_wer, or the most accurate one if none qualifies.
+    """
+    profiles = profiles or list(PROFILES)
+    original = engine.decode_profile
+    engine._ensure_model()
+    
+    results = {}
+    try:
+        for name in profiles:
+            engine.set_decode_profile(name)
+            errors = words = 0
+            decode_seconds = audio_seconds = 0.0
+            for path, reference in corpus:
+                started = time.perf_counter()
+                text = engine.transcribe(path)
+                decode_seconds += time.perf_counter() - started
+                audio_seconds += engine.last_timings.get("audio_seconds", 0.0)
+                clip_errors, clip_words = word_errors(reference, text)
+                errors += clip_errors
+                words += clip_words
+            
+            results[name] = {
+                "wer": round(errors / max(words, 1), 4),
+                "decode_seconds": round(decode_seconds, 3),
+                "rtf": round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+            }
+            print(f"{name:>9}: WER {results[name]['wer']:.1%}, {decode_seconds:.2f}s")
+    finally:
+        engine.set_decode_profile(original)
+    
+    passing = [name for name in results if results[name]["wer"] <= max_wer]
+    if passing:
+        chosen = min(passing, key=lambda name: results[name]["decode_seconds"])
+    else:
+        chosen = min(results, key=lambda name: results[name]["wer"])
+    return chosen, results
+
+
+# Test
+if __name__ == "__main__":
+    print(word_error_rate("the quick brown fox", "the quick brown fox"))
+    print(word_error_rate("the quick brown fox", "The quick, brown box!"))
+    print(word_error_rate("the quick brown fox", "quick brown fox jumps"))
+    for name in PROFILES:
+        print(name, profile_options(name))
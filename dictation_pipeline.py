@@ -0,0 +1,167 @@
+"""
+Dictation Pipeline Module
+FIFO queue between recording and transcription
+Finished recordings become jobs; a single worker transcribes and pastes them
+strictly in the order they were recorded, so the microphone is available
+again as soon as the hotkey is released. Each job carries a CancelToken for
+the cancel key and its deadline.
+"""
+
+import itertools
+import queue
+import threading
+import time
+
+from transcription_engine import CancelToken
+
+
+class DictationJob:
+    """One finished recording waiting for transcription"""
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, audio, release_time, session=None, full_audio=None, timings=None,
+                 incremental=None):
+        """
+        Initialize a job
+        
+        Args:
+            audio: Recorded samples (or archived WAV path)
+            release_time: perf_counter() when the hotkey was released
+            session: Streaming session that decoded part of the audio, if any
+            full_audio: Untrimmed recording for the streaming session's tail
+            timings: Capture-stage timings
+            incremental: IncrementalInjector already typing the session's
+                transcript (type-as-you-speak), if any
+        """
+        self.id = next(self._ids)
+        self.audio = audio
+        self.release_time = release_time
+        self.session = session
+        self.full_audio = full_audio
+        self.timings = dict(timings or {})
+        self.incremental = incremental
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.cancel = CancelToken()
+    
+    def wait_seconds(self, now=None):
+        """Time spent queued before the worker picked the job up"""
+        end = self.started_at or now or time.perf_counter()
+        return end - self.enqueued_at
+
+
+class DictationPipeline:
+    """Transcribes queued dictations one at a time, in recording order"""
+    
+    def __init__(self, process_job, on_change=None, deadline_seconds=None):
+        """
+        Initialize the pipeline
+        
+        Args:
+            process_job: Called with each DictationJob on the worker thread
+            on_change: Called (no arguments) when a job is queued, starts or ends
+            deadline_seconds: Processing time allowed per job before its
+                token cancels it (None for no limit)
+        """
+        self.process_job = process_job
+        self.on_change = on_change
+        self.deadline_seconds = deadline_seconds
+        
+        self._queue = queue.Queue()
+        self._waiting = []  # Jobs not started yet, oldest first (for display)
+        self._lock = threading.Lock()
+        self.active = None
+        self.completed = 0
+        self.last_wait_seconds = 0.0
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, job):
+        """Queue a finished recording"""
+        with self._lock:
+            self._waiting.append(job)
+        self._queue.put(job)
+        self._notify()
+    
+    def depth(self):
+        """Jobs queued or in progress"""
+        with self._lock:
+            return len(self._waiting) + (1 if self.active else 0)
+    
+    def oldest_wait(self):
+        """Seconds the oldest unfinished job has been in the pipeline"""
+        now = time.perf_counter()
+        with self._lock:
+            oldest = self.active or (self._waiting[0] if self._waiting else None)
+            return now - oldest.enqueued_at if oldest else 0.0
+    
+    def is_busy(self):
+        return self.depth() > 0
+    
+    def _run(self):
+        """Worker: take jobs in FIFO order and process them to completion"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            
+            with self._lock:
+                self._waiting.remove(job)
+                job.started_at = time.perf_counter()
+                job.cancel.start_deadline(self.deadline_seconds)
+                self.active = job
+            self.last_wait_seconds = job.wait_seconds()
+            self._notify()
+            
+            try:
+                self.process_job(job)
+            except Exception as e:
+                print(f"Dictation job {job.id} failed: {e}")
+            finally:
+                with self._lock:
+                    self.active = None
+                    self.completed += 1
+                self._notify()
+    
+    def cancel_all(self, reason="user"):
+        """Cancel the job in progress and everything queued behind it"""
+        with self._lock:
+            jobs = ([self.active] if self.active else []) + list(self._waiting)
+        for job in jobs:
+            job.cancel.cancel(reason)
+        return len(jobs)
+    
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception:
+                pass
+    
+    def close(self):
+        """Stop the worker after the jobs already queued"""
+        self._queue.put(None)
+
+
+# Test
+if __name__ == "__main__":
+    results = []
+    
+    def process(job):
+        if job.cancel.wait(0.2 if job.id == 1 else 0.05):  # First job is slowest
+            results.append(f"{job.id} {job.cancel.reason}")
+        else:
+            results.append(job.id)
+    
+    pipeline = DictationPipeline(process, on_change=lambda: None, deadline_seconds=0.15)
+    for i in range(4):
+        pipeline.submit(DictationJob(audio=None, release_time=time.perf_counter()))
+        print(f"Queued job, depth {pipeline.depth()}, oldest waited {pipeline.oldest_wait():.2f}s")
+        time.sleep(0.03)
+    
+    while pipeline.is_busy():
+        time.sleep(0.05)
+    print(f"Processed in order: {results}, last wait {pipeline.last_wait_seconds:.2f}s")
+    pipeline.close()
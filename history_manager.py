@@ -1,114 +1,283 @@
 """
 History Manager Module
 Saves and retrieves transcription history for Oropo voice typing app
+History lives in ~/.oropo/history.db (SQLite). Every dictation is kept
+unless age-based pruning is configured; appends are single inserts, the
+menu reads one page newest first, and an FTS5 index makes the full text
+searchable. An old history.json is imported once and renamed.
 """
 
 import os
 import json
-from datetime import datetime
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    word_count INTEGER NOT NULL,
+    display_time TEXT NOT NULL,
+    display_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+"""
+
+# External-content FTS5 index kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(text, content='entries', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF text ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+
+def _fts_query(query):
+    """Words of a search as an FTS5 query: all must match, the last one as a prefix"""
+    words = ['"' + word.replace('"', '""') + '"' for word in query.split()]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
 
 
 class HistoryManager:
     """Manages transcription history with persistent storage"""
     
-    MAX_ENTRIES = 10  # Keep last 10 transcriptions
+    MENU_ENTRIES = 10  # Newest transcriptions shown in the menu
     
-    def __init__(self):
-        self.history_dir = os.path.expanduser("~/.oropo")
-        self.history_file = os.path.join(self.history_dir, "history.json")
+    def __init__(self, data_dir=None, retention_days=0):
+        """
+        Initialize the history store
+        
+        Args:
+            data_dir: Where history.db lives (default ~/.oropo)
+            retention_days: Delete entries older than this (0 = keep everything)
+        """
+        self.history_dir = data_dir or os.path.expanduser("~/.oropo")
+        self.history_file = os.path.join(self.history_dir, "history.json")  # Pre-SQLite history
+        self.db_file = os.path.join(self.history_dir, "history.db")
+        self.retention_days = retention_days
         self._ensure_directory()
-        self.history = self._load_history()
+        
+        # The pipeline worker adds entries while the main thread builds the menu
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE
+            self.fts = False
+        
+        self._migrate_json()
+        self.prune()
     
     def _ensure_directory(self):
         """Create directory if it doesn't exist"""
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
     
-    def _load_history(self):
-        """Load history from file or return empty list"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-        except Exception:
-            pass
-        return []
-    
-    def _save_history(self):
-        """Save history to file"""
+    def _migrate_json(self):
+        """Import history.json once (renamed to history.json.migrated afterwards)"""
+        if not os.path.exists(self.history_file):
+            return
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.history, f, indent=2)
-        except Exception:
-            pass
+            with open(self.history_file, 'r') as f:
+                entries = json.load(f)
+            with self._lock, self.db:
+                for entry in reversed(entries):  # Stored newest first; ids grow with time
+                    self._insert(entry["text"], datetime.fromisoformat(entry["timestamp"]))
+            os.replace(self.history_file, self.history_file + ".migrated")
+            print(f"Migrated {len(entries)} history entries to {self.db_file}")
+        except Exception as e:
+            print(f"Could not migrate history.json: {e}")
+    
+    def _insert(self, text, timestamp):
+        self.db.execute(
+            "INSERT INTO entries (text, timestamp, word_count, display_time, display_date) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (text, timestamp.isoformat(), len(text.split()),
+             timestamp.strftime("%I:%M %p"), timestamp.strftime("%b %d"))
+        )
     
     def add_entry(self, text):
         """Add a transcription to history"""
         if not text or not text.strip():
             return
+        try:
+            with self._lock, self.db:
+                self._insert(text.strip(), datetime.now())
+        except sqlite3.Error as e:
+            print(f"Could not save history: {e}")
+    
+    def replace_text(self, old_text, new_text):
+        """Replace the text of the newest entry matching old_text"""
+        with self._lock, self.db:
+            row = self.db.execute(
+                "SELECT id FROM entries WHERE text = ? ORDER BY id DESC LIMIT 1", (old_text.strip(),)
+            ).fetchone()
+            if row is None:
+                return False
+            self.db.execute(
+                "UPDATE entries SET text = ?, word_count = ? WHERE id = ?",
+                (new_text.strip(), len(new_text.split()), row["id"])
+            )
+        return True
+    
+    def count(self):
+        """Number of stored entries"""
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    
+    def get_history(self, limit=None, offset=0):
+        """Get history entries, newest first (one page when limit is given)"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT id, text, timestamp, word_count FROM entries ORDER BY id DESC LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def get_formatted_history(self, limit=MENU_ENTRIES, offset=0):
+        """Get one page of history formatted for display"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT id, text, display_time, display_date FROM entries ORDER BY id DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [_format(row) for row in rows]
+    
+    def search(self, query, limit=20, offset=0):
+        """
+        Full-text search over all history
         
-        entry = {
-            "text": text.strip(),
-            "timestamp": datetime.now().isoformat(),
-            "word_count": len(text.split())
-        }
-        
-        # Add to beginning (newest first)
-        self.history.insert(0, entry)
+        Args:
+            query: Words to look for (the last one may be a prefix)
+            limit: Page size
+            offset: Entries to skip (for the next page)
         
-        # Keep only last MAX_ENTRIES
-        if len(self.history) > self.MAX_ENTRIES:
-            self.history = self.history[:self.MAX_ENTRIES]
+        Returns:
+            Matching entries formatted for display, best match first
+        """
+        if not query or not query.strip():
+            return []
+        with self._lock:
+            if self.fts:
+                rows = self.db.execute(
+                    "SELECT e.id, e.text, e.display_time, e.display_date FROM entries_fts "
+                    "JOIN entries e ON e.id = entries_fts.rowid WHERE entries_fts MATCH ? "
+                    "ORDER BY bm25(entries_fts), e.id DESC LIMIT ? OFFSET ?",
+                    (_fts_query(query), limit, offset)
+                ).fetchall()
+            else:
+                clauses = " AND ".join("text LIKE ?" for _ in query.split())
+                rows = self.db.execute(
+                    f"SELECT id, text, display_time, display_date FROM entries WHERE {clauses} "
+                    "ORDER BY id DESC LIMIT ? OFFSET ?",
+                    [f"%{word}%" for word in query.split()] + [limit, offset]
+                ).fetchall()
+        return [_format(row) for row in rows]
+    
+    def prune(self, retention_days=None):
+        """
+        Delete entries older than the retention period
         
-        self._save_history()
-    
-    def get_history(self):
-        """Get all history entries"""
-        return self.history
-    
-    def get_formatted_history(self):
-        """Get history formatted for display"""
-        formatted = []
-        for entry in self.history:
-            timestamp = datetime.fromisoformat(entry["timestamp"])
-            time_str = timestamp.strftime("%I:%M %p")
-            date_str = timestamp.strftime("%b %d")
-            
-            # Truncate long text for menu display
-            text = entry["text"]
-            if len(text) > 50:
-                text = text[:47] + "..."
-            
-            formatted.append({
-                "display": f"{time_str} - {text}",
-                "full_text": entry["text"],
-                "date": date_str,
-                "time": time_str
-            })
-        return formatted
+        Returns:
+            Number of entries deleted
+        """
+        days = self.retention_days if retention_days is None else retention_days
+        if not days:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        with self._lock, self.db:
+            deleted = self.db.execute("DELETE FROM entries WHERE timestamp < ?", (cutoff,)).rowcount
+        if deleted:
+            print(f"Pruned {deleted} history entries older than {days} days")
+        return deleted
     
     def clear_history(self):
         """Clear all history"""
-        self.history = []
-        self._save_history()
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM entries")
+            if self.fts:
+                self.db.execute("INSERT INTO entries_fts (entries_fts) VALUES ('delete-all')")
     
     def delete_entry(self, index):
-        """Delete a specific history entry by index"""
-        if 0 <= index < len(self.history):
-            del self.history[index]
-            self._save_history()
-            return True
-        return False
+        """Delete a specific history entry by index (0 = newest)"""
+        with self._lock, self.db:
+            row = self.db.execute(
+                "SELECT id FROM entries ORDER BY id DESC LIMIT 1 OFFSET ?", (index,)
+            ).fetchone() if index >= 0 else None
+            if row is None:
+                return False
+            self.db.execute("DELETE FROM entries WHERE id = ?", (row["id"],))
+        return True
+    
+    def delete_id(self, entry_id):
+        """Delete the entry with this id (ids are stable, unlike menu indexes)"""
+        with self._lock, self.db:
+            return self.db.execute("DELETE FROM entries WHERE id = ?", (entry_id,)).rowcount > 0
+    
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def _format(row):
+    """A database row as a menu entry"""
+    text = row["text"]
+    display = text if len(text) <= 50 else text[:47] + "..."  # Truncate long text for menu display
+    return {
+        "id": row["id"],
+        "display": f"{row['display_time']} - {display}",
+        "full_text": text,
+        "date": row["display_date"],
+        "time": row["display_time"],
+    }
 
 
 # Test
 if __name__ == "__main__":
-    history = HistoryManager()
+    import tempfile
     
-    # Add test entries
+    data_dir = tempfile.mkdtemp()
+    with open(os.path.join(data_dir, "history.json"), 'w') as f:
+        json.dump([{"text": "Migrated from the JSON file.", "timestamp": "2024-05-01T09:30:00",
+                    "word_count": 5}], f)
+    history = HistoryManager(data_dir=data_dir)
+    
+    started = time.perf_counter()
+    with history.db:
+        for i in range(5000):
+            history._insert(f"Dictation number {i} about the quarterly budget", datetime.now())
     history.add_entry("This is a test transcription.")
     history.add_entry("Another test entry here.")
+    print(f"{history.count()} entries ({time.perf_counter() - started:.2f}s to add)")
     
     print("History entries:")
-    for entry in history.get_formatted_history():
+    for entry in history.get_formatted_history(limit=3):
         print(f"  {entry['display']}")
+    
+    started = time.perf_counter()
+    results = history.search("migrated json")
+    print(f"Search: {[entry['full_text'] for entry in results]} "
+          f"({(time.perf_counter() - started) * 1000:.1f}ms), "
+          f"prefix 'quarter': {len(history.search('quarter', limit=100))} of a page of 100")
+    
+    history.replace_text("Another test entry here.", "Another refined entry.")
+    print(f"Replaced: {history.search('refined')[0]['full_text']}, pruned {history.prune(365)} old entries")
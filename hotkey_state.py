@@ -0,0 +1,123 @@
+"""
+Hotkey State Module
+Decides when the push-to-talk hotkey goes down and up from raw key events
+The global key listener also sees the keys Oropo types itself (pastes,
+type-as-you-speak). Only releasing one of the hotkey's own keys ends a
+dictation, and other keys are ignored while synthetic keys are in flight.
+"""
+
+
+def _base_name(key):
+    """cmd_r and cmd_l both match cmd"""
+    return key.name.replace('_l', '').replace('_r', '')
+
+
+def keys_match(pressed, target):
+    """True if a pressed key satisfies a hotkey key (either side of a modifier)"""
+    if pressed == target:
+        return True
+    return hasattr(pressed, 'name') and hasattr(target, 'name') and _base_name(pressed) == _base_name(target)
+
+
+class HotkeyState:
+    """Tracks held keys and reports hotkey press and release"""
+    
+    def __init__(self, target_keys, on_press, on_release, modifier_keys=(), on_modifiers=None,
+                 is_injecting=None):
+        """
+        Initialize the tracker
+        
+        Args:
+            target_keys: Keys that must all be held to start dictating
+            on_press: Called when the hotkey goes down
+            on_release: Called when one of its keys is released
+            modifier_keys: Keys that count as modifiers for on_modifiers
+            on_modifiers: Called with True/False as modifiers are held or not
+            is_injecting: Returns True while our own synthetic keys may arrive
+        """
+        self.target_keys = list(target_keys)
+        self.on_press = on_press
+        self.on_release = on_release
+        self.modifier_keys = modifier_keys
+        self.on_modifiers = on_modifiers
+        self.is_injecting = is_injecting
+        self.pressed_keys = set()
+        self.pressed = False
+    
+    def is_target(self, key):
+        return any(keys_match(key, target) for target in self.target_keys)
+    
+    def _ignore(self, key, injected):
+        """Synthetic events: reported by the listener, or any non-hotkey key while we type"""
+        if injected:
+            return True
+        return not self.is_target(key) and self.is_injecting is not None and self.is_injecting()
+    
+    def _modifiers_changed(self):
+        if self.on_modifiers:
+            self.on_modifiers(any(k in self.modifier_keys for k in self.pressed_keys))
+    
+    def press(self, key, injected=False):
+        if self._ignore(key, injected):
+            return
+        self.pressed_keys.add(key)
+        self._modifiers_changed()
+        
+        # Check if all target keys are pressed
+        all_pressed = all(any(keys_match(pk, tk) for pk in self.pressed_keys) for tk in self.target_keys)
+        if all_pressed and not self.pressed:
+            self.pressed = True
+            self.on_press()
+    
+    def release(self, key, injected=False):
+        if self._ignore(key, injected):
+            return
+        self.pressed_keys.discard(key)
+        self._modifiers_changed()
+        
+        # Releasing one of the hotkey's keys stops recording; other keys don't
+        if self.pressed and self.is_target(key):
+            self.pressed = False
+            self.on_release()
+    
+    def force_release(self):
+        """Treat the hotkey as released (e.g. the recording hit its time limit)"""
+        if self.pressed:
+            self.pressed = False
+            self.on_release()
+
+
+# Test: type-as-you-speak while the hotkey is held must not end the recording
+if __name__ == "__main__":
+    import time
+    from injection_backends import FakeInjectionBackend
+    from text_injector import IncrementalInjector
+    
+    recording = []
+    state = HotkeyState(["cmd_r"], on_press=lambda: recording.append("start"),
+                        on_release=lambda: recording.append("stop"))
+    
+    def listener(key, down):
+        # Worst case: a listener that can't tell synthetic events apart
+        (state.press if down else state.release)(key)
+    
+    fake = FakeInjectionBackend(on_key=listener)
+    state.is_injecting = fake.injected_recently
+    
+    state.press("cmd_r")
+    incremental = IncrementalInjector(fake, max_chars_per_second=400)
+    incremental.update("hello world", " and more")
+    time.sleep(0.2)
+    incremental.update("hello world and more", "")
+    time.sleep(0.2)
+    assert recording == ["start"] and state.pressed, recording
+    print(f"Typed {fake.target!r} while the hotkey was held: still recording")
+    
+    time.sleep(0.3)  # Past the injection window: unrelated real keys don't stop it either
+    state.press("a")
+    state.release("a")
+    assert recording == ["start"], recording
+    
+    state.release("cmd_r")
+    assert recording == ["start", "stop"], recording
+    print(f"Released the hotkey: {recording}")
@@ -0,0 +1,477 @@
+"""
+Injection Backends Module
+Clipboard and synthetic keyboard access for TextInjector
+The Mac backend reads modifier state and the pasteboard change count from
+Quartz/AppKit, posts Cmd+V as a single keyboard event with the Command flag
+and offers the text as promised pasteboard data, so it knows when the target
+app has read it. The pyautogui backend is the portable fallback; the fake
+backend simulates a keyboard, clipboard and target app for tests.
+"""
+
+import sys
+import time
+import threading
+import importlib.util
+
+try:
+    import objc
+    import AppKit
+    import Quartz
+    from Foundation import NSObject
+except ImportError:
+    objc = AppKit = Quartz = NSObject = None
+
+
+class InjectionBackend:
+    """Base class: clipboard, modifier state and synthetic keys"""
+    
+    name = "base"
+    confirms_consumption = False  # wait_consumed reports real reads of the clipboard
+    types_through_modifiers = False  # type_text is unaffected by held modifier keys
+    last_injected = 0.0  # perf_counter() of the last synthetic key event
+    
+    def _mark_injected(self):
+        self.last_injected = time.perf_counter()
+    
+    def injected_recently(self, window=0.25):
+        """
+        True while synthetic keys may still reach a key listener
+        
+        The hotkey listener sees our own key events (after a short delay);
+        it ignores keys outside the hotkey during this window.
+        """
+        return time.perf_counter() - self.last_injected < window
+    
+    def modifiers_down(self):
+        """True while any modifier key is physically held"""
+        return False
+    
+    def change_count(self):
+        """Counter that changes on every clipboard write"""
+        raise NotImplementedError
+    
+    def save_clipboard(self):
+        """Snapshot of the clipboard contents, for restore_clipboard"""
+        raise NotImplementedError
+    
+    def restore_clipboard(self, saved):
+        raise NotImplementedError
+    
+    def set_clipboard(self, text):
+        """Put text on the clipboard (and arm wait_consumed)"""
+        raise NotImplementedError
+    
+    def send_paste(self):
+        """Send the paste shortcut to the frontmost app"""
+        raise NotImplementedError
+    
+    def wait_consumed(self, timeout):
+        """
+        Wait until the target app has read the clipboard since send_paste
+        
+        Returns:
+            True once read, False on timeout, or None right away if the read
+            can't be observed for this paste (the caller restores after a delay)
+        """
+        raise NotImplementedError
+    
+    def select_backwards(self, count):
+        """Extend the selection count characters to the left (Shift+Left)"""
+        raise NotImplementedError
+    
+    def type_text(self, text):
+        """Type text at the cursor as key events (no clipboard)"""
+        raise NotImplementedError
+    
+    def backspace(self, count):
+        """Delete count characters before the cursor"""
+        raise NotImplementedError
+
+
+if NSObject is not None:
+    class _PasteProvider(NSObject, protocols=[objc.protocolNamed("NSPasteboardItemDataProvider")]):
+        """Promised pasteboard data: AppKit asks for it when an app reads the clipboard"""
+        
+        def initWithText_(self, text):
+            self = objc.super(_PasteProvider, self).init()
+            if self is None:
+                return None
+            self.text = text
+            self.paste_sent = False
+            self.provided_early = False
+            self.consumed = threading.Event()
+            return self
+        
+        def pasteboard_item_provideDataForType_(self, pasteboard, item, data_type):
+            item.setString_forType_(self.text, data_type)
+            # Reads before the paste keystroke are clipboard managers, not the target
+            if self.paste_sent:
+                self.consumed.set()
+            else:
+                # AppKit keeps the data now: the target's read won't call us again
+                self.provided_early = True
+        
+        def pasteboardFinishedWithDataProvider_(self, pasteboard):
+            pass
+
+
+class MacInjectionBackend(InjectionBackend):
+    """Quartz events and NSPasteboard (macOS)"""
+    
+    name = "mac"
+    confirms_consumption = True
+    types_through_modifiers = True
+    
+    V_KEY = 9  # kVK_ANSI_V (macOS maps Command shortcuts by this code)
+    LEFT_KEY = 123  # kVK_LeftArrow
+    DELETE_KEY = 51  # kVK_Delete (backspace)
+    UNICODE_CHUNK = 10  # Characters per key event (events carry at most 20 UTF-16 units)
+    INJECTED_MARKER = 0x6F726F70  # kCGEventSourceUserData of our events ("orop")
+    
+    def __init__(self):
+        if Quartz is None:
+            raise RuntimeError("pyobjc (Quartz, AppKit) is required for the mac injection backend")
+        self.pasteboard = AppKit.NSPasteboard.generalPasteboard()
+        self.source = Quartz.CGEventSourceCreate(Quartz.kCGEventSourceStateHIDSystemState)
+        self.modifier_mask = (Quartz.kCGEventFlagMaskCommand | Quartz.kCGEventFlagMaskShift
+                              | Quartz.kCGEventFlagMaskControl | Quartz.kCGEventFlagMaskAlternate)
+        self._provider = None
+    
+    def modifiers_down(self):
+        flags = Quartz.CGEventSourceFlagsState(Quartz.kCGEventSourceStateHIDSystemState)
+        return bool(flags & self.modifier_mask)
+    
+    def change_count(self):
+        return self.pasteboard.changeCount()
+    
+    def save_clipboard(self):
+        # Every type of every item, so images and rich text survive too
+        saved = []
+        for item in self.pasteboard.pasteboardItems() or []:
+            data = {}
+            for data_type in item.types():
+                value = item.dataForType_(data_type)
+                if value is not None:
+                    data[data_type] = value
+            saved.append(data)
+        return saved
+    
+    def restore_clipboard(self, saved):
+        self.pasteboard.clearContents()
+        items = []
+        for data in saved:
+            item = AppKit.NSPasteboardItem.alloc().init()
+            for data_type, value in data.items():
+                item.setData_forType_(value, data_type)
+            items.append(item)
+        if items:
+            self.pasteboard.writeObjects_(items)
+    
+    def set_clipboard(self, text):
+        self.pasteboard.clearContents()
+        item = AppKit.NSPasteboardItem.alloc().init()
+        self._provider = _PasteProvider.alloc().initWithText_(text)
+        item.setDataProvider_forTypes_(self._provider, [AppKit.NSPasteboardTypeString])
+        self.pasteboard.writeObjects_([item])
+    
+    def _post(self, event, flags):
+        # Tagged so event taps (the hotkey listener) can tell them from real keys
+        Quartz.CGEventSetIntegerValueField(event, Quartz.kCGEventSourceUserData, self.INJECTED_MARKER)
+        Quartz.CGEventSetFlags(event, flags)
+        self._mark_injected()
+        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+    
+    def _post_key(self, keycode, flags):
+        for key_down in (True, False):
+            self._post(Quartz.CGEventCreateKeyboardEvent(self.source, keycode, key_down), flags)
+    
+    def send_paste(self):
+        if self._provider is not None:
+            self._provider.paste_sent = True
+        # The Command flag rides on the V event: no separate Command key press
+        # (which the hotkey listener would see)
+        self._post_key(self.V_KEY, Quartz.kCGEventFlagMaskCommand)
+    
+    def wait_consumed(self, timeout):
+        provider = self._provider
+        if provider is None:
+            return False
+        if provider.provided_early and not provider.consumed.is_set():
+            return None  # A clipboard manager took the data first; the target's read is invisible
+        return provider.consumed.wait(timeout)
+    
+    def select_backwards(self, count):
+        for _ in range(count):
+            self._post_key(self.LEFT_KEY, Quartz.kCGEventFlagMaskShift)
+    
+    def type_text(self, text):
+        for i in range(0, len(text), self.UNICODE_CHUNK):
+            chunk = text[i:i + self.UNICODE_CHUNK]
+            units = len(chunk.encode("utf-16-le")) // 2
+            for key_down in (True, False):
+                event = Quartz.CGEventCreateKeyboardEvent(self.source, 0, key_down)
+                Quartz.CGEventKeyboardSetUnicodeString(event, units, chunk)
+                # No flags: typed as-is while the hotkey's modifiers are still held
+                self._post(event, 0)
+    
+    def backspace(self, count):
+        for _ in range(count):
+            self._post_key(self.DELETE_KEY, 0)
+
+
+class PyAutoGUIBackend(InjectionBackend):
+    """pyperclip + pyautogui (no modifier state or read confirmation)"""
+    
+    name = "pyautogui"
+    
+    def __init__(self):
+        import pyautogui
+        import pyperclip
+        self.pyautogui = pyautogui
+        self.pyperclip = pyperclip
+        pyautogui.PAUSE = 0.0  # Pacing comes from TextInjector, not fixed per-call delays
+        pyautogui.FAILSAFE = True
+        self._count = 0
+        self._last_text = None
+    
+    def change_count(self):
+        # Emulated: counts our writes, and notices when the contents change under us
+        try:
+            if self._last_text is not None and self.pyperclip.paste() != self._last_text:
+                self._last_text = None
+                self._count += 1
+        except Exception:
+            pass
+        return self._count
+    
+    def save_clipboard(self):
+        try:
+            return self.pyperclip.paste()
+        except Exception:
+            return ""
+    
+    def restore_clipboard(self, saved):
+        self.pyperclip.copy(saved)
+        self._last_text = None
+        self._count += 1
+    
+    def set_clipboard(self, text):
+        self.pyperclip.copy(text)
+        if self.pyperclip.paste() == text:
+            self._last_text = text
+            self._count += 1
+    
+    def send_paste(self):
+        self._mark_injected()
+        self.pyautogui.hotkey('command' if sys.platform == "darwin" else 'ctrl', 'v')
+    
+    def select_backwards(self, count):
+        self._mark_injected()
+        self.pyautogui.keyDown('shift')
+        try:
+            self.pyautogui.press('left', presses=count, interval=0.0)
+        finally:
+            self.pyautogui.keyUp('shift')
+    
+    def type_text(self, text):
+        self._mark_injected()
+        self.pyautogui.write(text)  # Keyboard characters only
+    
+    def backspace(self, count):
+        self._mark_injected()
+        self.pyautogui.press('backspace', presses=count, interval=0.0)
+
+
+class FakeInjectionBackend(InjectionBackend):
+    """Simulated keyboard, clipboard and target app (for tests and benchmarks)"""
+    
+    name = "fake"
+    confirms_consumption = True
+    types_through_modifiers = True
+    
+    def __init__(self, modifiers_held_for=0.0, clipboard_delay=0.0, consume_delay=0.01, on_key=None,
+                 clipboard_manager=False):
+        """
+        Initialize the fake
+        
+        Args:
+            modifiers_held_for: Seconds until the simulated modifiers are released
+            clipboard_delay: Seconds before a clipboard write becomes visible
+            consume_delay: Seconds the target takes to read a paste (None = never)
+            on_key: Called with (key name, down) for every synthetic key event,
+                like a global key listener would see it
+            clipboard_manager: A clipboard manager reads every copy before the
+                paste, so the target's read can't be observed
+        """
+        self.created = time.perf_counter()
+        self.modifiers_held_for = modifiers_held_for
+        self.clipboard_delay = clipboard_delay
+        self.consume_delay = consume_delay
+        self.on_key = on_key
+        self.clipboard_manager = clipboard_manager
+        self.clipboard = "original"
+        self.target = ""  # Text in the simulated target field
+        self.events = []  # (seconds since creation, event)
+        self._count = 0
+        self._pending = None  # (visible_at, text) of a write in flight
+        self._consumed = threading.Event()
+        self._lock = threading.Lock()
+    
+    def _event(self, name):
+        self.events.append((round(time.perf_counter() - self.created, 3), name))
+    
+    def _keys(self, *keys):
+        """Simulate key down/up events reaching a global listener"""
+        self._mark_injected()
+        if self.on_key:
+            for key in keys:
+                self.on_key(key, True)
+                self.on_key(key, False)
+    
+    def release_modifiers(self):
+        self.modifiers_held_for = 0.0
+    
+    def modifiers_down(self):
+        return time.perf_counter() - self.created < self.modifiers_held_for
+    
+    def _settle(self):
+        with self._lock:
+            if self._pending and time.perf_counter() >= self._pending[0]:
+                self.clipboard = self._pending[1]
+                self._pending = None
+                self._count += 1
+    
+    def change_count(self):
+        self._settle()
+        return self._count
+    
+    def save_clipboard(self):
+        self._settle()
+        return self.clipboard
+    
+    def restore_clipboard(self, saved):
+        with self._lock:
+            self._pending = None
+            self.clipboard = saved
+            self._count += 1
+        self._event("restore")
+    
+    def set_clipboard(self, text):
+        with self._lock:
+            self._pending = (time.perf_counter() + self.clipboard_delay, text)
+        self._consumed.clear()
+        self._event("copy")
+        self._settle()
+    
+    def send_paste(self):
+        self._settle()
+        self._event("paste")
+        self._keys("v")
+        if self.consume_delay is None:
+            return
+        
+        def consume(text):
+            self.target += text
+            self._event("consumed")
+            self._consumed.set()
+        
+        timer = threading.Timer(self.consume_delay, consume, args=(self.clipboard,))
+        timer.daemon = True
+        timer.start()
+    
+    def wait_consumed(self, timeout):
+        if self.clipboard_manager and not self._consumed.is_set():
+            return None
+        return self._consumed.wait(timeout)
+    
+    def select_backwards(self, count):
+        self._event(f"select {count}")
+        self._keys(*["left"] * count)
+    
+    def type_text(self, text):
+        self.target += text
+        self._event(f"type {text!r}")
+        self._keys(*text)
+    
+    def backspace(self, count):
+        self.target = self.target[:len(self.target) - count]
+        self._event(f"backspace {count}")
+        self._keys(*["backspace"] * count)
+
+
+BACKENDS = {
+    MacInjectionBackend.name: MacInjectionBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    FakeInjectionBackend.name: FakeInjectionBackend,
+}
+
+
+def detect_injection_backend():
+    """Quartz events on macOS when pyobjc is available, pyautogui otherwise"""
+    if sys.platform == "darwin" and Quartz is not None:
+        return MacInjectionBackend.name
+    if importlib.util.find_spec("pyautogui") is not None:
+        return PyAutoGUIBackend.name
+    raise RuntimeError("No text injection backend available: install pyobjc or pyautogui")
+
+
+def create_injection_backend(name="auto", **options):
+    """
+    Create an injection backend by name
+    
+    Args:
+        name: "auto", "mac", "pyautogui" or "fake"
+        **options: Backend-specific settings
+    """
+    if name == "auto":
+        name = detect_injection_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown injection backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
+
+
+# Test
+if __name__ == "__main__":
+    from text_injector import TextInjector
+    
+    # Modifiers come up 0.15s in; the clipboard write shows after 0.02s; the target reads 0.03s after Cmd+V
+    fake = FakeInjectionBackend(modifiers_held_for=0.15, clipboard_delay=0.02, consume_delay=0.03)
+    injector = TextInjector(backend=fake)
+    injector.set_modifiers_down(True)
+    threading.Timer(0.1, injector.set_modifiers_down, args=(False,)).start()  # Listener sees the release
+    
+    started = time.perf_counter()
+    injector.paste_text("hello world")
+    print(f"paste_text returned after {time.perf_counter() - started:.3f}s: {injector.last_timings}")
+    injector.paste_text(" again")  # Waits for the first paste to be read and restored
+    time.sleep(0.1)
+    print(f"Target: {fake.target!r}, clipboard: {fake.clipboard!r}")
+    print(f"Events: {fake.events}")
+    
+    # Type-as-you-speak: a wrong partial is corrected with backspaces, committed text stays
+    from text_injector import IncrementalInjector
+    fake = FakeInjectionBackend()
+    incremental = IncrementalInjector(fake, max_chars_per_second=400)
+    incremental.update("", "I scream")
+    time.sleep(0.1)
+    incremental.update("ice cream", " for")
+    time.sleep(0.1)
+    incremental.update("ice cream for dinner", "")
+    print(f"Finished: {incremental.finish('ice cream for dinner tonight')}, "
+          f"target {fake.target!r}, {incremental.keystrokes} keystrokes")
+    print(f"Edits: {[name for _, name in fake.events]}")
+    
+    # Modifiers that never come up: nothing is pasted
+    fake = FakeInjectionBackend(modifiers_held_for=10.0)
+    injector = TextInjector(backend=fake, modifier_timeout=0.1)
+    print(f"Held modifiers: pasted={injector.paste_text('not now')} ({injector.last_error}), "
+          f"events {[name for _, name in fake.events]}")
+    
+    # A clipboard manager read the copy first: restore after restore_delay, not restore_timeout
+    fake = FakeInjectionBackend(clipboard_manager=True)
+    injector = TextInjector(backend=fake, restore_delay=0.1)
+    injector.paste_text("first")
+    started = time.perf_counter()
+    injector.paste_text(" second")
+    print(f"Clipboard manager: second paste waited {time.perf_counter() - started:.2f}s "
+          f"(restore_timeout {injector.restore_timeout}s)")
@@ -0,0 +1,190 @@
+"""
+Latency Tracker Module
+Per-stage timing of every dictation, from hotkey release to paste
+Stages are timed with lightweight spans into the job's timings dict. Each
+finished dictation feeds a rolling in-memory window (for the p50/p95 shown
+in the menu) and is appended as one JSON line to ~/.oropo/metrics.jsonl
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+
+@contextmanager
+def span(timings, name):
+    """
+    Time a block into timings[name] (repeated spans of a name add up)
+    
+    Usage:
+        with span(timings, "vad"):
+            audio, info = vad.trim(audio)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - started)
+
+
+class LatencyTracker:
+    """Rolling latency histograms with an append-only metrics log"""
+    
+    def __init__(self, data_dir=None, window=200, max_log_bytes=5_000_000):
+        """
+        Initialize the tracker
+        
+        Args:
+            data_dir: Where metrics.jsonl lives (default ~/.oropo)
+            window: Dictations kept per metric for percentiles
+            max_log_bytes: Size at which the log is rotated to metrics.jsonl.1
+        """
+        self.data_dir = data_dir or os.path.expanduser("~/.oropo")
+        self.log_file = os.path.join(self.data_dir, "metrics.jsonl")
+        self.window = window
+        self.max_log_bytes = max_log_bytes
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._ensure_directory()
+        self._load_recent()
+    
+    def _ensure_directory(self):
+        """Create directory if it doesn't exist"""
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+    
+    def _load_recent(self):
+        """Seed the rolling window from the latest pasted dictations in the log (survives restarts)"""
+        try:
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r') as f:
+                    # Like record(), only pasted dictations count; cheap text match before parsing
+                    lines = deque((line for line in f if '"outcome": "pasted"' in line), maxlen=self.window)
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("outcome") == "pasted":
+                        self._add_samples(record)
+        except Exception:
+            pass
+    
+    def _add_samples(self, record):
+        """Add one dictation's stage timings and RTF to the rolling window"""
+        values = dict(record.get("stages", {}))
+        if record.get("rtf") is not None:
+            values["rtf"] = record["rtf"]
+        for name, value in values.items():
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.window)
+            self._samples[name].append(value)
+    
+    def record(self, timings, release_time, audio_seconds=None, outcome="pasted"):
+        """
+        Record a finished dictation
+        
+        Args:
+            timings: Stage name -> seconds (non-numeric entries are kept as info)
+            release_time: perf_counter() when the hotkey was released
+            audio_seconds: Recording length, for the real-time factor
+            outcome: "pasted", "no_speech", "cancelled", "failed", ...
+        
+        The real-time factor is decode time over the whole recording. Streaming
+        dictations only decode the tail after release here (earlier segments are
+        decoded while recording), so their RTF reads lower than a batch decode's.
+        
+        Returns:
+            The record appended to the metrics log
+        """
+        stages = {name: round(value, 4) for name, value in timings.items()
+                  if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        info = {name: value for name, value in timings.items() if name not in stages}
+        if outcome == "pasted":
+            stages["release_to_paste"] = round(time.perf_counter() - release_time, 4)
+        
+        # Decode time per second of audio; streaming dictations only decode the tail here
+        decode = timings.get("decode", timings.get("transcribe"))
+        rtf = round(decode / audio_seconds, 4) if decode and audio_seconds else None
+        
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "outcome": outcome,
+            "audio_seconds": round(audio_seconds, 3) if audio_seconds else None,
+            "rtf": rtf,
+            "stages": stages,
+        }
+        if info:
+            record["info"] = info
+        
+        with self._lock:
+            if outcome == "pasted":
+                self._add_samples(record)
+            self._append(record)
+        return record
+    
+    def _append(self, record):
+        """Append to the log, rotating it once it gets large"""
+        try:
+            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > self.max_log_bytes:
+                os.replace(self.log_file, self.log_file + ".1")
+            with open(self.log_file, 'a') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except Exception:
+            pass
+    
+    def percentile(self, name, q):
+        """q-th percentile (0-100) of a metric over the window, or None"""
+        with self._lock:
+            values = list(self._samples.get(name, ()))
+        if not values:
+            return None
+        return float(np.percentile(values, q))
+    
+    def mean(self, name):
+        """Average of a metric over the window, or None"""
+        with self._lock:
+            values = list(self._samples.get(name, ()))
+        return sum(values) / len(values) if values else None
+    
+    def summary(self):
+        """Count, p50, p95 and max of every metric in the window"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50": round(float(np.percentile(values, 50)), 4),
+                "p95": round(float(np.percentile(values, 95)), 4),
+                "max": round(max(values), 4),
+            }
+            for name, values in samples.items() if values
+        }
+
+
+# Test
+if __name__ == "__main__":
+    import tempfile
+    
+    data_dir = tempfile.mkdtemp()
+    tracker = LatencyTracker(data_dir=data_dir)
+    for i in range(20):
+        release = time.perf_counter()
+        timings = {"model": "fake"}
+        with span(timings, "transcribe"):
+            time.sleep(0.002 * (i % 5))
+        with span(timings, "paste"):
+            time.sleep(0.001)
+        tracker.record(timings, release, audio_seconds=2.0)
+    
+    print(f"release_to_paste p50 {tracker.percentile('release_to_paste', 50) * 1000:.1f}ms, "
+          f"p95 {tracker.percentile('release_to_paste', 95) * 1000:.1f}ms, "
+          f"avg RTF {tracker.mean('rtf'):.4f}")
+    print(json.dumps(tracker.summary(), indent=2))
+    print(f"Reloaded window: {LatencyTracker(data_dir=data_dir).summary()['release_to_paste']}")
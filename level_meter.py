@@ -0,0 +1,123 @@
+"""
+Level Meter Module
+Moves audio level metering out of the real-time audio callback
+The callback only pushes cheap per-block stats into a lock-free queue; a
+consumer thread publishes decimated peak/RMS levels at a fixed frame rate
+"""
+
+import collections
+import threading
+import numpy as np
+
+
+class LevelMeter:
+    """Decimated peak/RMS meter fed from the audio callback"""
+    
+    def __init__(self, frame_rate=30, max_pending=256):
+        """
+        Initialize the meter
+        
+        Args:
+            frame_rate: Level updates published per second
+            max_pending: Block stats kept if the consumer falls behind
+                (oldest are dropped, the audio thread never blocks)
+        """
+        self.frame_rate = frame_rate
+        # deque.append/popleft are atomic, so no lock is taken in the callback
+        self._pending = collections.deque(maxlen=max_pending)
+        self._subscribers = []
+        self._scratch = np.empty(4096, dtype=np.float32)  # int16 squares (grown only for larger blocks)
+        
+        self.peak = 0.0
+        self.rms = 0.0
+        
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def push(self, block):
+        """Record stats for one audio block (called from the audio callback, so nothing is allocated)"""
+        samples = block.reshape(-1)
+        if len(samples) == 0:
+            return
+        peak = max(float(samples.max()), -float(samples.min()))
+        if samples.dtype == np.int16:
+            # Square into the scratch buffer: an int16 dot product would overflow
+            if len(self._scratch) < len(samples):
+                self._scratch = np.empty(len(samples), dtype=np.float32)
+            squares = np.multiply(samples, samples, out=self._scratch[:len(samples)], dtype=np.float32)
+            peak /= 32768.0
+            sum_squares = float(squares.sum()) / (32768.0 * 32768.0)
+        else:
+            sum_squares = float(np.dot(samples, samples))
+        self._pending.append((peak, sum_squares, len(samples)))
+    
+    def subscribe(self, callback):
+        """Call callback(peak, rms) every frame while the meter runs"""
+        self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed callback"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def start(self):
+        """Start publishing levels"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._pending.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop publishing and reset levels to zero"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.peak = 0.0
+        self.rms = 0.0
+        self._publish()
+    
+    def _run(self):
+        """Aggregate pending block stats once per frame"""
+        interval = 1.0 / self.frame_rate
+        while not self._stop.wait(interval):
+            peak = 0.0
+            sum_squares = 0.0
+            count = 0
+            while self._pending:
+                block_peak, block_squares, block_count = self._pending.popleft()
+                peak = max(peak, block_peak)
+                sum_squares += block_squares
+                count += block_count
+            
+            if count == 0:
+                continue
+            self.peak = peak
+            self.rms = float(np.sqrt(sum_squares / count))
+            self._publish()
+    
+    def _publish(self):
+        """Send current levels to all subscribers"""
+        for callback in list(self._subscribers):
+            try:
+                callback(self.peak, self.rms)
+            except Exception:
+                pass
+
+
+# Test
+if __name__ == "__main__":
+    import time
+    
+    meter = LevelMeter(frame_rate=10)
+    meter.subscribe(lambda peak, rms: print(f"peak={peak:.2f} rms={rms:.3f}"))
+    meter.start()
+    
+    rng = np.random.default_rng(0)
+    for i in range(50):
+        meter.push((0.1 * (i % 10) * rng.standard_normal((512, 1))).astype(np.float32))
+        time.sleep(0.01)
+    
+    meter.stop()
@@ -0,0 +1,282 @@
+"""
+Model Cache Module
+Quantized (8-bit / 4-bit) MLX Whisper models, converted once and cached
+Uses a pre-quantized mlx-community repo when one exists; otherwise downloads
+the full-precision model, quantizes it locally and stores the result in
+~/.oropo/models with a manifest of source revisions, hashes and quantization settings
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+
+SUPPORTED_BITS = (4, 8)
+DEFAULT_GROUP_SIZE = 64
+
+
+def _sha256(path):
+    """Hash a (large) file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _weights_file(model_dir):
+    """The weights file of an MLX Whisper model directory"""
+    for name in ("weights.safetensors", "weights.npz"):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No weights in {model_dir}")
+
+
+def _snapshot_revision(model_dir):
+    """Commit hash of a HuggingFace cache snapshot (.../snapshots/<revision>), or None"""
+    parent, revision = os.path.split(os.path.normpath(model_dir))
+    return revision if os.path.basename(parent) == "snapshots" else None
+
+
+class ModelCache:
+    """Finds or builds quantized MLX Whisper models"""
+    
+    def __init__(self, cache_dir=None, group_size=DEFAULT_GROUP_SIZE, use_prequantized=True,
+                 revision_check_seconds=86400):
+        """
+        Initialize the cache
+        
+        Args:
+            cache_dir: Where converted models live (default ~/.oropo/models)
+            group_size: Quantization group size for local conversions
+            use_prequantized: Try mlx-community quantized repos before converting
+            revision_check_seconds: How often to ask the Hub whether a source
+                repo has a new revision (0 = never)
+        """
+        self.cache_dir = cache_dir or os.path.expanduser("~/.oropo/models")
+        self.manifest_file = os.path.join(self.cache_dir, "manifest.json")
+        self.group_size = group_size
+        self.use_prequantized = use_prequantized
+        self.revision_check_seconds = revision_check_seconds
+        self._lock = threading.Lock()
+        self._ensure_directory()
+        self.manifest = self._load_manifest()
+    
+    def _ensure_directory(self):
+        """Create directory if it doesn't exist"""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+    
+    def _load_manifest(self):
+        """Load manifest from file or return empty"""
+        try:
+            if os.path.exists(self.manifest_file):
+                with open(self.manifest_file, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return {}
+    
+    def _save_manifest(self):
+        """Save manifest to file"""
+        try:
+            with open(self.manifest_file, 'w') as f:
+                json.dump(self.manifest, f, indent=2)
+        except Exception:
+            pass
+    
+    @staticmethod
+    def key(model_name, bits):
+        return f"{model_name}@{bits}bit"
+    
+    def _directory_for(self, model_name, bits):
+        safe = re.sub(r"[^A-Za-z0-9._-]+", "--", model_name)
+        return os.path.join(self.cache_dir, f"{safe}-{bits}bit")
+    
+    def _download(self, repo):
+        """Local snapshot of a HuggingFace repo (or the path itself)"""
+        if os.path.isdir(repo):
+            return repo
+        from huggingface_hub import snapshot_download
+        return snapshot_download(repo_id=repo)
+    
+    def _prequantized(self, model_name, bits):
+        """Download an mlx-community quantized variant if one is published"""
+        if os.path.isdir(model_name):
+            return None
+        for repo in (f"{model_name}-{bits}bit", f"{model_name}-q{bits}"):
+            try:
+                return repo, self._download(repo)
+            except Exception:
+                continue
+        return None
+    
+    def _latest_revision(self, repo):
+        """Current commit hash of a Hub repo, or None when offline"""
+        try:
+            from huggingface_hub import HfApi
+            return HfApi().model_info(repo, timeout=5).sha
+        except Exception:
+            return None
+    
+    def _source_info(self, source_dir):
+        """Manifest fields identifying the weights a cached model came from"""
+        weights = _weights_file(source_dir)
+        stat = os.stat(weights)
+        return {
+            "revision": _snapshot_revision(source_dir),
+            "source_weights": weights,
+            "source_sha256": _sha256(weights),
+            "source_stat": [stat.st_size, int(stat.st_mtime)],
+            "checked": time.time(),
+        }
+    
+    def _is_valid(self, entry):
+        """A cached model is usable if its files exist and the source is unchanged (locally and upstream)"""
+        if not entry or not os.path.isdir(entry.get("path", "")):
+            return False
+        source = entry.get("source_weights")
+        if source and os.path.exists(source):
+            stat = os.stat(source)
+            if [stat.st_size, int(stat.st_mtime)] != entry.get("source_stat"):
+                if _sha256(source) != entry.get("source_sha256"):
+                    return False
+        
+        # A new upstream revision is picked up (re-downloaded or re-converted) at most once per check interval
+        revision = entry.get("revision")
+        if revision and self.revision_check_seconds and \
+                time.time() - entry.get("checked", 0) > self.revision_check_seconds:
+            latest = self._latest_revision(entry["source"])
+            if latest is not None:
+                entry["checked"] = time.time()
+                self._save_manifest()
+                if latest != revision:
+                    print(f"{entry['source']} has a new revision ({revision[:7]} -> {latest[:7]})")
+                    return False
+        return True
+    
+    def resolve(self, model_name, bits=None):
+        """
+        Path (or repo) to load for a model at a precision
+        
+        Args:
+            model_name: Full-precision MLX Whisper repo or directory
+            bits: None/16 for full precision, or 8 / 4
+        
+        Returns:
+            Something mlx_whisper.load_models.load_model accepts
+        """
+        if bits in (None, 16, 32):
+            return model_name
+        if bits not in SUPPORTED_BITS:
+            raise ValueError(f"Unsupported quantization: {bits} bits (use 4 or 8)")
+        
+        key = self.key(model_name, bits)
+        with self._lock:
+            entry = self.manifest.get(key)
+            if self._is_valid(entry):
+                return entry["path"]
+            
+            if self.use_prequantized:
+                found = self._prequantized(model_name, bits)
+                if found:
+                    repo, path = found
+                    self.manifest[key] = {
+                        "path": path,
+                        "source": repo,
+                        **self._source_info(path),
+                        "bits": bits,
+                        "prequantized": True,
+                        "created": time.time(),
+                    }
+                    self._save_manifest()
+                    return path
+            
+            return self._convert(model_name, bits)
+    
+    def _convert(self, model_name, bits):
+        """Quantize the full-precision model and cache it"""
+        import mlx.core as mx
+        import mlx.nn as nn
+        from mlx.utils import tree_flatten
+        from mlx_whisper.load_models import load_model
+        
+        started = time.perf_counter()
+        source_dir = self._download(model_name)
+        
+        model = load_model(source_dir, dtype=mx.float16)
+        group_size = self.group_size
+        nn.quantize(
+            model,
+            group_size=group_size,
+            bits=bits,
+            # Quantized matmuls need the input dimension to be a multiple of the group
+            class_predicate=lambda path, module: (
+                isinstance(module, (nn.Linear, nn.Embedding))
+                and module.weight.shape[-1] % group_size == 0
+            ),
+        )
+        
+        target = self._directory_for(model_name, bits)
+        partial = target + ".partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        mx.save_safetensors(os.path.join(partial, "weights.safetensors"),
+                            dict(tree_flatten(model.parameters())))
+        with open(os.path.join(source_dir, "config.json"), 'r') as f:
+            config = json.load(f)
+        config["quantization"] = {"group_size": group_size, "bits": bits}
+        with open(os.path.join(partial, "config.json"), 'w') as f:
+            json.dump(config, f, indent=2)
+        
+        # Swap in atomically so an interrupted conversion is never used
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(partial, target)
+        
+        self.manifest[self.key(model_name, bits)] = {
+            "path": target,
+            "source": model_name,
+            **self._source_info(source_dir),
+            "bits": bits,
+            "group_size": group_size,
+            "prequantized": False,
+            "created": time.time(),
+        }
+        self._save_manifest()
+        print(f"Quantized {model_name} to {bits}-bit in {time.perf_counter() - started:.1f}s")
+        return target
+    
+    def entries(self):
+        """Cached models with their on-disk size"""
+        result = {}
+        for key, entry in self.manifest.items():
+            size = 0
+            for root, _, files in os.walk(entry.get("path", "")):
+                size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+            result[key] = {**entry, "size_mb": round(size / 1e6, 1)}
+        return result
+    
+    def remove(self, model_name, bits):
+        """Delete a locally converted model"""
+        with self._lock:
+            entry = self.manifest.pop(self.key(model_name, bits), None)
+            if entry and not entry.get("prequantized"):
+                shutil.rmtree(entry["path"], ignore_errors=True)
+            self._save_manifest()
+
+
+# Test
+if __name__ == "__main__":
+    cache = ModelCache()
+    print(f"Cache: {cache.cache_dir}")
+    for key, entry in cache.entries().items():
+        print(f"  {key}: {entry['path']} ({entry['size_mb']} MB)")
+    try:
+        print(cache.resolve("mlx-community/whisper-tiny-mlx", bits=8))
+    except Exception as e:
+        print(f"Could not resolve a quantized model: {e}")
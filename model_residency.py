@@ -0,0 +1,213 @@
+"""
+Model Residency Module
+Keeps transcription models in memory only while they are worth it
+Models are unloaded after an idle period and start loading again the moment
+the hotkey is pressed, so the load overlaps with speaking. With several
+models (adaptive selection), the most recently used stay warm within a
+memory budget and the least recently used are unloaded first.
+"""
+
+import time
+import threading
+
+from transcription_backends import _model_size
+
+
+# Approximate resident size (MB) of float16 weights plus runtime buffers
+MODEL_SIZES_MB = {
+    "tiny": 150,
+    "base": 250,
+    "small": 700,
+    "medium": 1800,
+    "turbo": 1900,
+    "large-v3-turbo": 1900,
+    "large": 3500,
+    "large-v2": 3500,
+    "large-v3": 3500,
+}
+DEFAULT_SIZE_MB = 500
+
+
+def estimate_size_mb(model_name, bits=None):
+    """Rough memory footprint of a loaded model"""
+    size_mb = MODEL_SIZES_MB.get(_model_size(model_name).replace(".en", ""), DEFAULT_SIZE_MB)
+    if bits in (4, 8):
+        size_mb = size_mb * bits // 16
+    return size_mb
+
+
+class ModelResidency:
+    """Loads, prefetches and unloads an engine's models"""
+    
+    def __init__(self, engine, models=None, idle_unload_seconds=900, memory_budget_mb=0,
+                 check_interval=30.0):
+        """
+        Initialize residency management
+        
+        Args:
+            engine: TranscriptionEngine or TranscriptionWorker
+            models: Models to manage (default: the engine's model)
+            idle_unload_seconds: Unload a model unused for this long (0 = never)
+            memory_budget_mb: Most memory warm models may use (0 = no limit)
+            check_interval: Seconds between idle checks
+        """
+        self.engine = engine
+        self.models = list(models or [engine.model_name])
+        self.idle_unload_seconds = idle_unload_seconds
+        self.memory_budget_mb = memory_budget_mb
+        self.check_interval = check_interval
+        
+        now = time.monotonic()
+        self._last_used = {model: now for model in self.models}
+        self._lock = threading.Lock()
+        self._prefetching = set()
+        
+        self.last_cold_start = None  # {"model", "waited", "load"} of the last dictation that waited
+        self.cold_starts = 0
+        self.unloads = 0
+        
+        self._stop = threading.Event()
+        if idle_unload_seconds:
+            threading.Thread(target=self._idle_loop, daemon=True).start()
+    
+    def size_mb(self, model):
+        return estimate_size_mb(model, getattr(self.engine, "quantization", None))
+    
+    def touch(self, model=None):
+        """Mark a model as just used"""
+        model = model or self.engine.model_name
+        with self._lock:
+            self._last_used[model] = time.monotonic()
+    
+    def resident(self):
+        """Loaded models, most recently used first"""
+        with self._lock:
+            models = [model for model in self._last_used if self.engine.is_loaded(model)]
+            return sorted(models, key=lambda model: -self._last_used[model])
+    
+    def _next_model(self):
+        """The model the next dictation most likely needs (the last one used)"""
+        with self._lock:
+            used = [model for model in self.models if model in self._last_used]
+            return max(used, key=lambda model: self._last_used[model]) if used else self.engine.model_name
+    
+    def load(self, model=None):
+        """Load a model now, unloading least recently used ones to fit the budget"""
+        model = model or self.engine.model_name
+        self.touch(model)
+        if self.engine.is_loaded(model):
+            return
+        self._make_room(model)
+        self.engine._ensure_model(model)
+    
+    def prefetch(self, model=None):
+        """Start loading the next model in the background (call on hotkey press)"""
+        model = model or self._next_model()
+        self.touch(model)
+        if self.engine.is_loaded(model):
+            return
+        with self._lock:
+            if model in self._prefetching:
+                return
+            self._prefetching.add(model)
+        threading.Thread(target=self._prefetch, args=(model,), daemon=True).start()
+    
+    def _prefetch(self, model):
+        try:
+            self.load(model)
+        except Exception as e:
+            print(f"Model prefetch failed ({model}): {e}")
+        finally:
+            with self._lock:
+                self._prefetching.discard(model)
+    
+    def acquire(self, model=None):
+        """
+        Make sure a model is loaded before decoding (waits for a prefetch in progress)
+        
+        Returns:
+            Seconds waited for the model - the cold-start penalty (0.0 if warm)
+        """
+        model = model or self.engine.model_name
+        if self.engine.is_loaded(model):
+            self.touch(model)
+            return 0.0
+        
+        started = time.perf_counter()
+        self.load(model)
+        waited = time.perf_counter() - started
+        self.cold_starts += 1
+        self.last_cold_start = {
+            "model": model,
+            "waited": waited,
+            "load": (self.engine.load_seconds or 0.0) + (self.engine.warmup_seconds or 0.0),
+        }
+        print(f"Cold start: waited {waited:.2f}s for {model}")
+        return waited
+    
+    def _make_room(self, model):
+        """Unload least recently used models until the budget fits one more"""
+        if not self.memory_budget_mb:
+            return
+        needed = self.size_mb(model)
+        warm = [other for other in self.resident() if other != model]
+        used = sum(self.size_mb(other) for other in warm)
+        for other in reversed(warm):  # Least recently used first
+            if used + needed <= self.memory_budget_mb:
+                break
+            if self.engine.unload_model(other):
+                self.unloads += 1
+                used -= self.size_mb(other)
+    
+    def _idle_loop(self):
+        """Unload models that have not been used for idle_unload_seconds"""
+        while not self._stop.wait(self.check_interval):
+            now = time.monotonic()
+            for model in self.resident():
+                with self._lock:
+                    idle = now - self._last_used.get(model, now)
+                if idle >= self.idle_unload_seconds and self.engine.unload_model(model):
+                    self.unloads += 1
+    
+    def status(self):
+        """Menu text: what is resident, and the last cold-start penalty"""
+        resident = self.resident()
+        if resident:
+            models = ", ".join(f"{_model_size(model).split('/')[-1]} ({self.size_mb(model)} MB)"
+                               for model in resident)
+        else:
+            models = "none"
+        cold = self.last_cold_start
+        if cold:
+            penalty = f"{cold['waited']:.1f}s wait ({cold['load']:.1f}s load)"
+        else:
+            penalty = "none yet"
+        return f"Models: {models}", f"Cold start: {penalty}"
+    
+    def close(self):
+        self._stop.set()
+
+
+# Test
+if __name__ == "__main__":
+    import numpy as np
+    from transcription_backends import FakeBackend
+    from transcription_engine import TranscriptionEngine
+    
+    engine = TranscriptionEngine("small", backend=FakeBackend("small", load_seconds=0.3))
+    engine._backends["base"] = FakeBackend("base", load_seconds=0.3)
+    residency = ModelResidency(engine, models=["small", "base"], idle_unload_seconds=0.5,
+                               memory_budget_mb=800, check_interval=0.1)
+    
+    residency.load("base")
+    residency.load("small")  # 250 + 700 > 800: base is unloaded
+    print(residency.status())
+    
+    time.sleep(0.8)  # Idle unload
+    print(residency.status())
+    
+    residency.prefetch()  # Hotkey press: loads while "speaking"
+    time.sleep(0.2)
+    waited = residency.acquire("small")  # Release: waits only for the rest of the load
+    engine.transcribe(np.zeros(16000, dtype=np.float32), model_name="small")
+    print(f"Waited {waited:.2f}s after release", residency.status())
@@ -0,0 +1,194 @@
+"""
+Model Scheduler Module
+Picks a Whisper model per dictation from its measured speed on this machine
+Keeps a rolling latency fit (fixed overhead + real-time factor x duration) per
+model in ~/.oropo/model_rtf.json and chooses the most accurate model predicted
+to finish within the latency budget
+"""
+
+import os
+import re
+import json
+import threading
+
+
+# Starting guesses (real-time factor) until a model has been measured
+DEFAULT_RTF = {
+    "tiny": 0.02,
+    "base": 0.03,
+    "small": 0.06,
+    "turbo": 0.10,
+    "medium": 0.15,
+    "large": 0.30,
+}
+DEFAULT_OVERHEAD = 0.15  # Seconds per decode regardless of length
+
+
+def _default_rtf(model_name):
+    """Guess a model's real-time factor from its size name"""
+    for size, rtf in DEFAULT_RTF.items():
+        if re.search(rf"\b{size}", model_name):
+            return rtf
+    return DEFAULT_RTF["small"]
+
+
+class ModelScheduler:
+    """Chooses a model per request from rolling real-time-factor estimates"""
+    
+    def __init__(self, models, latency_budget=1.5, decay=0.1):
+        """
+        Initialize the scheduler
+        
+        Args:
+            models: Candidate models, most accurate first
+            latency_budget: Target decode time in seconds
+            decay: Weight of each new measurement (older ones fade out)
+        """
+        self.models = list(models)
+        self.latency_budget = latency_budget
+        self.decay = decay
+        
+        self.state_dir = os.path.expanduser("~/.oropo")
+        self.state_file = os.path.join(self.state_dir, "model_rtf.json")
+        self._lock = threading.Lock()
+        self._ensure_directory()
+        self.estimates = self._load_estimates()
+        self.last_decision = None
+    
+    def _ensure_directory(self):
+        """Create directory if it doesn't exist"""
+        if not os.path.exists(self.state_dir):
+            os.makedirs(self.state_dir)
+    
+    def _load_estimates(self):
+        """Load saved measurements or return empty"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return {}
+    
+    def _save_estimates(self):
+        """Save measurements to file"""
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump(self.estimates, f, indent=2)
+        except Exception:
+            pass
+    
+    def fit(self, model_name):
+        """
+        Current latency model for a model
+        
+        Returns:
+            (overhead_seconds, rtf, measured) where latency = overhead + rtf * duration
+        """
+        stats = self.estimates.get(model_name)
+        if not stats or stats["w"] <= 0:
+            return DEFAULT_OVERHEAD, _default_rtf(model_name), False
+        
+        # Weighted least squares on the decayed sums
+        w, sx, sy, sxx, sxy = stats["w"], stats["x"], stats["y"], stats["xx"], stats["xy"]
+        denominator = w * sxx - sx * sx
+        if denominator > 1e-9 * max(1.0, w * sxx):
+            rtf = (w * sxy - sx * sy) / denominator
+            overhead = (sy - rtf * sx) / w
+            if rtf > 0 and overhead >= 0:
+                return overhead, rtf, True
+        
+        # Too little spread in durations: fall back to a line through the origin
+        return 0.0, sy / sx if sx > 0 else _default_rtf(model_name), True
+    
+    def predict(self, model_name, duration):
+        """Predicted decode time in seconds for `duration` seconds of audio"""
+        overhead, rtf, _ = self.fit(model_name)
+        return overhead + rtf * duration
+    
+    def choose(self, duration):
+        """
+        Pick the model for a recording
+        
+        Returns:
+            Model name: the most accurate one predicted to meet the budget,
+            otherwise the one predicted to be fastest
+        """
+        return self.decide(duration)["model"]
+    
+    def decide(self, duration):
+        """
+        Pick the model for a recording and say why
+        
+        Returns:
+            The decision (also kept as last_decision); pass it to record()
+            when several dictations are decided concurrently
+        """
+        predictions = [(model, self.predict(model, duration)) for model in self.models]
+        chosen, predicted = min(predictions, key=lambda item: item[1])
+        reason = "fastest"
+        for model, seconds in predictions:
+            if seconds <= self.latency_budget:
+                chosen, predicted, reason = model, seconds, "within budget"
+                break
+        
+        decision = self.last_decision = {
+            "model": chosen,
+            "audio_seconds": round(duration, 2),
+            "predicted_seconds": round(predicted, 3),
+            "budget_seconds": self.latency_budget,
+            "reason": reason,
+        }
+        return decision
+    
+    def record(self, model_name, duration, decode_seconds, decision=None):
+        """Add a measured decode to the model's rolling estimate (and its decision)"""
+        if duration <= 0 or decode_seconds <= 0:
+            return
+        
+        with self._lock:
+            stats = self.estimates.setdefault(
+                model_name, {"w": 0.0, "x": 0.0, "y": 0.0, "xx": 0.0, "xy": 0.0, "count": 0}
+            )
+            keep = 1.0 - self.decay
+            for key in ("w", "x", "y", "xx", "xy"):
+                stats[key] *= keep
+            stats["w"] += 1.0
+            stats["x"] += duration
+            stats["y"] += decode_seconds
+            stats["xx"] += duration * duration
+            stats["xy"] += duration * decode_seconds
+            stats["count"] += 1
+            self._save_estimates()
+        
+        decision = decision or self.last_decision
+        if decision and decision["model"] == model_name:
+            decision["actual_seconds"] = round(decode_seconds, 3)
+    
+    def summary(self):
+        """Per-model estimates for display"""
+        result = {}
+        for model in self.models:
+            overhead, rtf, measured = self.fit(model)
+            result[model] = {
+                "rtf": round(rtf, 4),
+                "overhead_seconds": round(overhead, 3),
+                "measured": measured,
+                "samples": self.estimates.get(model, {}).get("count", 0),
+            }
+        return result
+
+
+# Test
+if __name__ == "__main__":
+    scheduler = ModelScheduler(
+        ["mlx-community/whisper-small-mlx", "mlx-community/whisper-tiny-mlx"],
+        latency_budget=1.0
+    )
+    scheduler.state_file = os.devnull
+    
+    for duration in (2, 5, 10, 30):
+        scheduler.record("mlx-community/whisper-small-mlx", duration, 0.2 + 0.08 * duration)
+    for duration in (3, 120):
+        print(f"{duration}s -> {scheduler.choose(duration)} {scheduler.last_decision}")
+    print(scheduler.summary())
@@ -0,0 +1,391 @@
+"""
+Oropo command line tools
+Usage: python -m oropo <command> [options]
+  autotune <corpus_dir>   Pick the fastest decode profile that is accurate enough
+  precision               Compare load time, memory and speed of full/8-bit/4-bit weights
+  batch <dir-or-glob>...  Transcribe existing recordings to JSONL
+  benchmark               End-to-end latency benchmark (see benchmark.py)
+  selftest                Batch crash recovery check with the fake backend
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import soundfile as sf
+
+import benchmark
+from benchmark import peak_rss_mb
+from config_manager import ConfigManager
+from decode_profiles import PROFILES, autotune, load_corpus
+from transcription_engine import TranscriptionEngine
+
+
+def cmd_autotune(args):
+    """Benchmark decode profiles on a reference corpus and save the winner"""
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"No reference clips in {args.corpus} (expected name.wav + name.txt pairs)")
+        return 1
+    
+    config = ConfigManager()
+    model = args.model or config.get("model")
+    backend = args.backend or config.get_backend_name()
+    print(f"Autotuning {model} ({backend}) on {len(corpus)} clips, max WER {args.max_wer:.0%}")
+    
+    engine = TranscriptionEngine(model, backend=backend, decode_profile=config.get("decode_profile"))
+    chosen, results = autotune(engine, corpus, max_wer=args.max_wer, profiles=args.profiles)
+    
+    if results[chosen]["wer"] > args.max_wer:
+        print(f"No profile meets WER {args.max_wer:.0%}; using the most accurate, '{chosen}'")
+    else:
+        print(f"Fastest profile within WER {args.max_wer:.0%}: '{chosen}'")
+    
+    if args.dry_run:
+        return 0
+    config.set("decode_profile", chosen)
+    print(f"Saved decode_profile = {chosen} to {config.config_file}")
+    return 0
+
+
+def _measure_precision(model, backend, bits, audio_path, seconds, repeats):
+    """Load one precision in a fresh process and time it (runs in the child)"""
+    baseline = peak_rss_mb()
+    engine = TranscriptionEngine(model, backend=backend, quantization=bits)
+    engine._ensure_model()  # Includes a one-off conversion on first use
+    
+    if audio_path:
+        audio = engine._load_audio(audio_path)
+    else:
+        # Speech-like test signal: noise-modulated tones in syllable-sized bursts
+        rng = np.random.default_rng(0)
+        t = np.arange(int(seconds * 16000)) / 16000
+        envelope = (np.sin(2 * np.pi * 3 * t) > -0.2).astype(np.float32)
+        audio = (0.2 * envelope * (np.sin(2 * np.pi * 220 * t) + 0.3 * rng.standard_normal(len(t)))).astype(np.float32)
+    
+    decode_seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        engine.transcribe(audio)
+        decode_seconds.append(time.perf_counter() - started)
+    
+    return {
+        "bits": bits or 16,
+        "load_seconds": round(engine.load_seconds or 0.0, 2),
+        "warmup_seconds": round(engine.warmup_seconds or 0.0, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "model_rss_mb": round(peak_rss_mb() - baseline, 1),
+        "rtf": round(min(decode_seconds) / (len(audio) / 16000), 4),
+    }
+
+
+def cmd_precision(args):
+    """Benchmark each weight precision in its own process (clean memory numbers)"""
+    config = ConfigManager()
+    model = args.model or config.get("model")
+    backend = args.backend or config.get_backend_name()
+    context = multiprocessing.get_context("spawn")
+    
+    print(f"{'bits':>5} {'load s':>8} {'warm s':>8} {'peak RSS MB':>12} {'model MB':>9} {'RTF':>8}")
+    for bits in args.bits:
+        with context.Pool(1) as pool:
+            try:
+                row = pool.apply(_measure_precision, (model, backend, None if bits == 16 else bits,
+                                                      args.audio, args.seconds, args.repeats))
+            except Exception as e:
+                print(f"{bits:>5} failed: {e}")
+                continue
+        print(f"{row['bits']:>5} {row['load_seconds']:>8.2f} {row['warmup_seconds']:>8.2f} "
+              f"{row['peak_rss_mb']:>12.1f} {row['model_rss_mb']:>9.1f} {row['rtf']:>8.4f}")
+    return 0
+
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".aiff", ".aif")
+
+# One engine (one model copy) per batch worker process
+_batch_engine = None
+
+
+def _batch_files(patterns):
+    """Expand directories (recursively) and glob patterns into sorted audio files"""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.update(os.path.join(root, name) for name in names
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in files)
+
+
+def _completed_files(output, retry_errors):
+    """Files already recorded in an existing output file (for resuming)"""
+    done = set()
+    if not output or not os.path.exists(output):
+        return done
+    with open(output, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if not (retry_errors and record.get("error")):
+                done.add(record.get("file"))
+    return done
+
+
+def _init_batch_worker(engine_options):
+    """Load the model once per worker process"""
+    global _batch_engine
+    sys.stdout = sys.stderr  # Keep stdout for JSONL records
+    _batch_engine = TranscriptionEngine(**engine_options)
+    _batch_engine._ensure_model()
+
+
+def _transcribe_file(path):
+    """Transcribe one file in a worker; inputs are only read, never modified"""
+    record = {"file": path, "text": "", "duration": None, "decode_seconds": None,
+              "rtf": None, "error": None}
+    try:
+        audio, sample_rate = sf.read(path, dtype='float32')
+    except Exception as e:
+        record["error"] = f"Could not read audio: {e}"
+        return record
+    
+    record["duration"] = round(len(audio) / sample_rate, 3)
+    started = time.perf_counter()
+    record["text"] = _batch_engine.transcribe(audio, sample_rate)
+    elapsed = time.perf_counter() - started
+    record["decode_seconds"] = round(elapsed, 3)
+    record["rtf"] = round(elapsed / record["duration"], 4) if record["duration"] else None
+    record["error"] = _batch_engine.last_error
+    return record
+
+
+def _batch_ready():
+    """Runs once in a new pool: succeeds only if a worker loaded its model"""
+    return True
+
+
+def _start_batch_pool(workers, engine_options):
+    """A worker pool whose workers are known to start (None if they can't)"""
+    pool = ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_batch_worker,
+                               initargs=(engine_options,))
+    try:
+        pool.submit(_batch_ready).result()
+    except BrokenProcessPool:
+        pool.shutdown(wait=True)
+        return None
+    return pool
+
+
+def _batch_error(path, error):
+    return {"file": path, "text": "", "duration": None, "decode_seconds": None, "rtf": None, "error": error}
+
+
+def _run_batch(pending, out, workers, engine_options):
+    """
+    Transcribe files with a pool of worker processes, writing one JSONL record per file
+    
+    A worker that dies (e.g. a native crash in the model) breaks the pool: it is
+    restarted and the files that were in flight are run again one at a time, so
+    only a file that crashes a worker on its own is recorded as an error.
+    
+    Returns:
+        (failures, unattempted): error records written, and files left without
+        a record because the workers could not start (they resume with --resume)
+    """
+    queue = iter(pending)
+    in_flight = {}
+    suspects = []  # In flight when a worker died
+    isolating = None  # The suspect running alone
+    failures = 0
+    written = 0
+    
+    def write(record):
+        nonlocal failures, written
+        failures += bool(record["error"])
+        written += 1
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    
+    pool = _start_batch_pool(workers, engine_options)
+    try:
+        while pool is not None:
+            broken = []
+            try:
+                if suspects:
+                    if not in_flight:
+                        path = suspects.pop(0)
+                        in_flight[pool.submit(_transcribe_file, path)] = path
+                        isolating = path
+                elif isolating is None:
+                    # Bounded submission: at most two queued files per worker
+                    while len(in_flight) < workers * 2:
+                        path = next(queue, None)
+                        if path is None:
+                            break
+                        in_flight[pool.submit(_transcribe_file, path)] = path
+            except BrokenProcessPool:
+                broken.append(path)
+            if not in_flight and not broken:
+                break
+            
+            if not broken:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = in_flight.pop(future)
+                    try:
+                        write(future.result())
+                    except BrokenProcessPool:
+                        broken.append(path)
+                    except Exception as e:
+                        write(_batch_error(path, f"Worker failed: {e}"))
+                    if path == isolating and path not in broken:
+                        isolating = None
+            
+            if broken:
+                # The other in-flight futures fail too; none of these files has a record
+                broken += in_flight.values()
+                in_flight.clear()
+                if isolating is not None and broken == [isolating]:
+                    print(f"Worker crashed on {isolating}", file=sys.stderr)
+                    write(_batch_error(isolating, "Worker process crashed on this file"))
+                else:
+                    print(f"A worker process died; rerunning {len(broken)} files one at a time",
+                          file=sys.stderr)
+                    suspects = broken + suspects
+                isolating = None
+                pool.shutdown(wait=True)
+                pool = _start_batch_pool(workers, engine_options)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    
+    return failures, len(pending) - written
+
+
+def cmd_batch(args):
+    """Transcribe recordings with a pool of worker processes, streaming JSONL"""
+    files = _batch_files(args.inputs)
+    done = _completed_files(args.output, args.retry_errors) if args.resume else set()
+    pending = [path for path in files if path not in done]
+    print(f"{len(files)} files, {len(files) - len(pending)} already done, {len(pending)} to transcribe",
+          file=sys.stderr)
+    if not pending:
+        return 0
+    
+    config = ConfigManager()
+    engine_options = {
+        "model_name": args.model or config.get("model"),
+        "backend": args.backend or config.get_backend_name(),
+        "decode_profile": config.get("decode_profile", "balanced"),
+        "quantization": config.get("quantization"),
+        "decode_workers": 1,  # Parallelism comes from the process pool
+    }
+    
+    out = open(args.output, 'a' if args.resume else 'w') if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        failures, unattempted = _run_batch(pending, out, args.workers, engine_options)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    
+    print(f"Transcribed {len(pending) - unattempted} files in {time.perf_counter() - started:.1f}s "
+          f"({failures} errors)", file=sys.stderr)
+    if unattempted:
+        print(f"Worker processes could not start; {unattempted} files were not attempted "
+              f"(rerun with --resume)", file=sys.stderr)
+    return 1 if failures or unattempted else 0
+
+
+def cmd_selftest(args):
+    """Batch crash recovery with the fake backend: one file kills its worker"""
+    import io
+    import tempfile
+    from transcription_backends import FakeBackend
+    
+    folder = tempfile.mkdtemp()
+    files = []
+    for i, seconds in enumerate([1.0, 1.5, 2.0, 2.5, 3.0, 3.5]):
+        path = os.path.join(folder, f"clip{i}.wav")
+        sf.write(path, np.zeros(int(seconds * 16000), dtype=np.float32), 16000)
+        files.append(path)
+    crashing = files[2]
+    
+    out = io.StringIO()
+    engine_options = {"model_name": "fake", "backend": FakeBackend("fake", crash_seconds=2.0),
+                      "decode_workers": 1}
+    failures, unattempted = _run_batch(files, out, 2, engine_options)
+    records = {record["file"]: record for record in map(json.loads, out.getvalue().splitlines())}
+    
+    assert set(records) == set(files) and unattempted == 0, (sorted(records), unattempted)
+    assert failures == 1 and records[crashing]["error"], records[crashing]
+    assert all(records[path]["text"] for path in files if path != crashing)
+    print(f"Batch survived a worker crash: {len(records)} records, error only for "
+          f"{os.path.basename(crashing)} ({records[crashing]['error']})")
+    
+    # Workers that can't even start leave every file unrecorded, for --resume
+    out = io.StringIO()
+    failures, unattempted = _run_batch(files, out, 2, {"model_name": "fake", "backend": "no-such-backend"})
+    assert out.getvalue() == "" and unattempted == len(files), out.getvalue()
+    print(f"Workers that fail to start: no records, {unattempted} files left to resume")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="oropo", description="Oropo command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    tune = commands.add_parser("autotune", help="choose a decode profile for this machine")
+    tune.add_argument("corpus", help="directory of reference clips (name.wav + name.txt)")
+    tune.add_argument("--max-wer", type=float, default=0.1, help="highest acceptable word error rate")
+    tune.add_argument("--model", help="model to tune (default: configured model)")
+    tune.add_argument("--backend", help="backend to use (default: configured backend)")
+    tune.add_argument("--profiles", nargs="+", choices=list(PROFILES), help="profiles to try")
+    tune.add_argument("--dry-run", action="store_true", help="report without saving to config")
+    tune.set_defaults(func=cmd_autotune)
+    
+    precision = commands.add_parser("precision", help="benchmark full, 8-bit and 4-bit weights")
+    precision.add_argument("--model", help="model to test (default: configured model)")
+    precision.add_argument("--backend", help="backend to use (default: configured backend)")
+    precision.add_argument("--bits", type=int, nargs="+", default=[16, 8, 4], choices=[16, 8, 4])
+    precision.add_argument("--audio", help="WAV file to decode (default: 10s synthetic signal)")
+    precision.add_argument("--seconds", type=float, default=10.0, help="synthetic signal length")
+    precision.add_argument("--repeats", type=int, default=3, help="decodes per precision (best is kept)")
+    precision.set_defaults(func=cmd_precision)
+    
+    batch = commands.add_parser("batch", help="transcribe existing recordings to JSONL")
+    batch.add_argument("inputs", nargs="+", help="directories or glob patterns (quote globs)")
+    batch.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    batch.add_argument("-j", "--workers", type=int, default=2, help="worker processes (one model each)")
+    batch.add_argument("--resume", action="store_true", help="append to --output, skipping files in it")
+    batch.add_argument("--retry-errors", action="store_true", help="with --resume, redo failed files")
+    batch.add_argument("--model", help="model to use (default: configured model)")
+    batch.add_argument("--backend", help="backend to use (default: configured backend)")
+    batch.set_defaults(func=cmd_batch)
+    
+    selftest = commands.add_parser("selftest", help="check batch crash recovery with the fake backend")
+    selftest.set_defaults(func=cmd_selftest)
+    
+    bench = commands.add_parser("benchmark", help="end-to-end latency benchmark (headless)")
+    benchmark.add_arguments(bench)
+    bench.set_defaults(func=benchmark.run)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
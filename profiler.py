@@ -0,0 +1,284 @@
+"""
+Profiler Module
+Opt-in CPU and allocation profiling of each dictation
+A sampling profiler (sys._current_frames on a background thread) records
+every thread's stack while a dictation is processed and writes it in
+speedscope's JSON format; tracemalloc snapshots before and after give the
+allocation diff. Files go to ~/.oropo/profiles, oldest removed first.
+Disabled, the profiler is a no-op context manager.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Set OROPO_PROFILE=1 to profile every dictation regardless of the config
+ENV_VAR = "OROPO_PROFILE"
+
+
+def env_enabled():
+    return os.environ.get(ENV_VAR, "").lower() not in ("", "0", "false", "no")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads at a fixed interval"""
+    
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._frames = []  # speedscope shared frames
+        self._frame_index = {}
+        self._threads = {}  # ident -> {"name", "samples", "weights"}
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.duration = 0.0
+    
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="oropo-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+    
+    def _index(self, code):
+        """Index of a function in the shared frame table"""
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self._frames)
+            self._frames.append({
+                "name": getattr(code, "co_qualname", code.co_name),
+                "file": code.co_filename,
+                "line": code.co_firstlineno,
+            })
+        return index
+    
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()  # speedscope wants root first
+                
+                thread = self._threads.get(ident)
+                if thread is None:
+                    thread = self._threads[ident] = {"name": names.get(ident, str(ident)),
+                                                     "samples": [], "weights": []}
+                thread["samples"].append(stack)
+                thread["weights"].append(weight)
+    
+    def speedscope(self, name):
+        """The samples as a speedscope file (one profile per thread)"""
+        profiles = []
+        for ident, thread in self._threads.items():
+            total = sum(thread["weights"])
+            profiles.append({
+                "type": "sampled",
+                "name": f"{thread['name']} ({ident})",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": thread["samples"],
+                "weights": thread["weights"],
+            })
+        # Busiest thread first (speedscope opens the first profile)
+        profiles.sort(key=lambda profile: -len(set(map(tuple, profile["samples"]))))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "oropo",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frames},
+            "profiles": profiles,
+        }
+
+
+class DictationProfiler:
+    """Profiles dictations on demand and watches memory across the session"""
+    
+    def __init__(self, profile_dir=None, enabled=False, interval=0.005, keep=20,
+                 growth_mb=50, on_growth=None):
+        """
+        Initialize the profiler
+        
+        Args:
+            profile_dir: Output directory (default ~/.oropo/profiles)
+            enabled: Profile dictations (OROPO_PROFILE=1 forces this on)
+            interval: Seconds between stack samples
+            keep: Dictations whose profiles are kept
+            growth_mb: Traced memory growth over the session that gets flagged
+            on_growth: Called with a message when growth is flagged
+        """
+        self.profile_dir = profile_dir or os.path.expanduser("~/.oropo/profiles")
+        self.interval = interval
+        self.keep = keep
+        self.growth_mb = growth_mb
+        self.on_growth = on_growth
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._baseline = None  # Snapshot and traced bytes after the first profiled dictation
+        self._session = []  # (label, traced MB) after each dictation
+        self._flagged = False
+        self.set_enabled(enabled or env_enabled())
+    
+    def _ensure_directory(self):
+        """Create directory if it doesn't exist"""
+        if not os.path.exists(self.profile_dir):
+            os.makedirs(self.profile_dir)
+    
+    def set_enabled(self, enabled):
+        """Turn profiling on or off (tracemalloc only runs while on)"""
+        with self._lock:
+            if enabled == self.enabled:
+                return
+            self.enabled = enabled
+            if enabled:
+                self._ensure_directory()
+                tracemalloc.start(10)
+                self._baseline = None
+                self._session = []
+                self._flagged = False
+                print(f"Profiling dictations to {self.profile_dir}")
+            else:
+                tracemalloc.stop()
+                self._baseline = None
+    
+    @contextmanager
+    def dictation(self, label):
+        """Profile the enclosed dictation (no-op when disabled)"""
+        if not self.enabled:
+            yield
+            return
+        
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{label}"
+        before = tracemalloc.take_snapshot()
+        sampler = SamplingProfiler(self.interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            try:
+                self._write(name, sampler, before)
+            except Exception as e:
+                print(f"Could not write profile: {e}")
+    
+    def _write(self, name, sampler, before):
+        """Save the CPU profile and allocation diff, then apply retention"""
+        if not tracemalloc.is_tracing():
+            return  # Disabled mid-dictation
+        after = tracemalloc.take_snapshot()
+        traced = tracemalloc.get_traced_memory()[0]
+        
+        base = os.path.join(self.profile_dir, name)
+        with open(base + ".speedscope.json", 'w') as f:
+            json.dump(sampler.speedscope(name), f)
+        
+        # One comparison: grouping large snapshots is the slow part
+        diff = after.compare_to(before, "lineno")
+        memory = {
+            "name": name,
+            "duration_seconds": round(sampler.duration, 4),
+            "traced_mb": round(traced / 1e6, 2),
+            "diff_mb": round(sum(stat.size_diff for stat in diff) / 1e6, 3),
+            "top_allocations": _top_stats(diff),
+        }
+        memory["growth"] = self._check_growth(name, traced, after)
+        with open(base + ".memory.json", 'w') as f:
+            json.dump(memory, f, indent=2)
+        
+        self._prune()
+        print(f"Profile written: {base}.speedscope.json ({memory['diff_mb']:+.2f} MB allocated)")
+    
+    def _check_growth(self, name, traced, snapshot, min_dictations=5):
+        """Flag traced memory that keeps growing over the session"""
+        with self._lock:
+            self._session.append((name, round(traced / 1e6, 2)))
+            if self._baseline is None:
+                # The first dictation loads models and caches; measure from after it
+                self._baseline = (snapshot, traced)
+                return None
+            baseline_snapshot, baseline_bytes = self._baseline
+            growth_mb = (traced - baseline_bytes) / 1e6
+            growth = {
+                "since_first_mb": round(growth_mb, 2),
+                "dictations": len(self._session),
+                "series_mb": [mb for _, mb in self._session[-50:]],
+            }
+            if growth_mb < self.growth_mb or len(self._session) < min_dictations or self._flagged:
+                return growth
+            self._flagged = True  # Once per session; the report lists the growth sites
+        
+        growth["top_growth"] = _top_stats(snapshot.compare_to(baseline_snapshot, "traceback"))
+        with open(os.path.join(self.profile_dir, f"{name}.growth.json"), 'w') as f:
+            json.dump(growth, f, indent=2)
+        message = f"Memory grew {growth_mb:.0f} MB over {len(self._session)} dictations"
+        print(f"{message} - see {self.profile_dir}")
+        if self.on_growth:
+            self.on_growth(message)
+        return growth
+    
+    def _prune(self):
+        """Keep the newest dictations' profiles (growth reports are kept)"""
+        suffixes = (".speedscope.json", ".memory.json")
+        names = sorted({entry[:-len(suffix)] for entry in os.listdir(self.profile_dir)
+                        for suffix in suffixes if entry.endswith(suffix)})
+        for name in names[:-self.keep] if self.keep else names:
+            for suffix in suffixes:
+                try:
+                    os.remove(os.path.join(self.profile_dir, name + suffix))
+                except OSError:
+                    pass
+
+
+def _top_stats(stats, limit=25):
+    """The largest allocation differences, JSON friendly"""
+    top = []
+    for stat in sorted(stats, key=lambda stat: -abs(stat.size_diff))[:limit]:
+        frame = stat.traceback[-1]  # Most recent frame
+        top.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback[-5:]],
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+        })
+    return top
+
+
+# Test
+if __name__ == "__main__":
+    import tempfile
+    
+    import numpy as np
+    
+    leak = []
+    profiler = DictationProfiler(profile_dir=tempfile.mkdtemp(), enabled=True, keep=3, growth_mb=2)
+    for i in range(5):
+        with profiler.dictation(f"test{i}"):
+            audio = np.random.default_rng(i).standard_normal(16000 * 10).astype(np.float32)
+            leak.append(audio.copy())  # 640 KB kept per dictation
+            sum(float(x) * x for x in audio[:50000])
+    
+    print(sorted(os.listdir(profiler.profile_dir)))
+    profiler.set_enabled(False)
+    with profiler.dictation("disabled"):
+        pass
+    print(f"Files after disabling: {len(os.listdir(profiler.profile_dir))}")
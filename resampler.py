@@ -0,0 +1,179 @@
+"""
+Resampler Module
+Polyphase windowed-sinc sample rate conversion in float32
+Filter kernels are cached per rate pair; works one-shot or on streaming chunks
+"""
+
+import functools
+from math import gcd
+import numpy as np
+
+
+@functools.lru_cache(maxsize=16)
+def _polyphase_filter(up, down, taps_per_phase, rolloff, beta):
+    """
+    Design the anti-aliasing filter for an up/down rate pair
+    
+    Returns:
+        (taps_per_phase, up) float32 array; row k holds tap k of every phase
+    """
+    length = taps_per_phase * up
+    cutoff = rolloff * 0.5 / max(up, down)  # Cycles per sample at the up-sampled rate
+    # Centered on tap length // 2 (the resampler's delay) rather than between two
+    # taps: with an even length, small `up` ratios (48k -> 16k) were off by half a sample
+    center = length // 2
+    t = np.arange(length) - center
+    h = 2.0 * cutoff * np.sinc(2.0 * cutoff * t) * np.kaiser(2 * center + 1, beta)[:length]
+    h *= up / h.sum()  # Unity DC gain after zero-stuffing
+    return np.ascontiguousarray(h.reshape(taps_per_phase, up), dtype=np.float32)
+
+
+class StreamingResampler:
+    """Resamples a stream chunk by chunk, keeping filter history between calls"""
+    
+    def __init__(self, src_rate, dst_rate=16000, taps_per_phase=32, rolloff=0.94,
+                 beta=8.6, block_size=8192):
+        """
+        Initialize the resampler
+        
+        Args:
+            src_rate: Input sample rate (e.g. 44100 or 48000)
+            dst_rate: Output sample rate
+            taps_per_phase: Filter length per phase (quality vs speed)
+            rolloff: Passband edge as a fraction of the output Nyquist frequency
+            beta: Kaiser window shape (stopband attenuation)
+            block_size: Output samples computed per vectorized step (bounds memory)
+        """
+        divisor = gcd(int(src_rate), int(dst_rate))
+        self.src_rate = int(src_rate)
+        self.dst_rate = int(dst_rate)
+        self.up = self.dst_rate // divisor
+        self.down = self.src_rate // divisor
+        self.taps = taps_per_phase
+        self.block_size = block_size
+        self.filter = _polyphase_filter(self.up, self.down, taps_per_phase, rolloff, beta)
+        # Group delay of the filter, in up-sampled samples
+        self.delay = (taps_per_phase * self.up) // 2
+        
+        self.reset()
+    
+    def reset(self):
+        """Forget all stream history"""
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._history_start = -(self.taps - 1)  # Input index of _history[0]
+        self._received = 0  # Input samples seen
+        self._produced = 0  # Output samples emitted
+    
+    def _output_count(self, available):
+        """How many outputs can be computed with `available` input samples"""
+        if self.up == self.down:
+            return available - self._produced
+        # Output n needs input index (n * down + delay) // up
+        last = ((available * self.up) - self.delay - 1) // self.down
+        return max(0, last + 1 - self._produced)
+    
+    def _compute(self, signal, signal_start, count):
+        """Compute `count` outputs from `signal` (whose first sample is index signal_start)"""
+        out = np.empty(count, dtype=np.float32)
+        taps = np.arange(self.taps)
+        for begin in range(0, count, self.block_size):
+            n = np.arange(self._produced + begin, self._produced + min(count, begin + self.block_size))
+            position = n * self.down + self.delay
+            base = position // self.up - signal_start
+            phase = position % self.up
+            # (outputs, taps) gather of input samples, newest first
+            windows = signal[base[:, None] - taps[None, :]]
+            out[begin:begin + len(n)] = np.einsum("ij,ji->i", windows, self.filter[:, phase])
+        self._produced += count
+        return out
+    
+    def process(self, chunk):
+        """
+        Resample the next chunk of input
+        
+        Returns:
+            float32 output samples that are final so far (may be empty)
+        """
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if self.up == self.down:
+            self._received += len(chunk)
+            self._produced += len(chunk)
+            return chunk
+        
+        signal = np.concatenate((self._history, chunk))
+        signal_start = self._history_start
+        self._received += len(chunk)
+        
+        count = self._output_count(self._received)
+        out = self._compute(signal, signal_start, count)
+        
+        # Keep only the input still needed by upcoming outputs
+        keep_from = (self._produced * self.down + self.delay) // self.up - (self.taps - 1)
+        keep_from = min(keep_from, self._received)
+        self._history = signal[keep_from - signal_start:]
+        self._history_start = keep_from
+        return out
+    
+    def flush(self):
+        """Emit the remaining outputs, treating the input after the end as silence"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        
+        total = -(-self._received * self.up // self.down)  # ceil
+        count = max(0, total - self._produced)
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+        
+        last_needed = ((total - 1) * self.down + self.delay) // self.up
+        padding = max(0, last_needed + 1 - self._received)
+        signal = np.concatenate((self._history, np.zeros(padding, dtype=np.float32)))
+        return self._compute(signal, self._history_start, count)
+
+
+def resample(audio, src_rate, dst_rate=16000, **options):
+    """
+    Resample a complete buffer
+    
+    Args:
+        audio: Mono samples
+        src_rate: Sample rate of `audio`
+        dst_rate: Desired sample rate
+        **options: Filter settings passed to StreamingResampler
+    
+    Returns:
+        float32 array of ceil(len(audio) * dst_rate / src_rate) samples
+    """
+    if int(src_rate) == int(dst_rate):
+        return np.asarray(audio, dtype=np.float32)
+    
+    resampler = StreamingResampler(src_rate, dst_rate, **options)
+    head = resampler.process(audio)
+    tail = resampler.flush()
+    return np.concatenate((head, tail))
+
+
+# Test
+if __name__ == "__main__":
+    import time
+    
+    for src_rate in (48000, 44100):
+        t = np.arange(src_rate * 5) / src_rate
+        # 1 kHz tone (kept) plus 12 kHz tone (must be filtered out at 16 kHz)
+        audio = (0.5 * np.sin(2 * np.pi * 1000 * t) + 0.3 * np.sin(2 * np.pi * 12000 * t)).astype(np.float32)
+        
+        started = time.perf_counter()
+        one_shot = resample(audio, src_rate)
+        elapsed = time.perf_counter() - started
+        
+        streamer = StreamingResampler(src_rate)
+        chunks = [streamer.process(audio[i:i + 1024]) for i in range(0, len(audio), 1024)]
+        streamed = np.concatenate(chunks + [streamer.flush()])
+        
+        spectrum = np.abs(np.fft.rfft(one_shot[16000:32000]))
+        alias = spectrum[4000] / spectrum[1000]  # 12 kHz aliases to 4 kHz at 16 kHz
+        # The kept tone must line up in time with the input (no group-delay bias)
+        expected = 0.5 * np.sin(2 * np.pi * 1000 * np.arange(len(one_shot)) / 16000)
+        error = np.max(np.abs(one_shot - expected)[16000:-16000])
+        print(f"{src_rate} Hz -> 16000 Hz: {len(one_shot)} samples in {elapsed * 1000:.1f}ms, "
+              f"alias {20 * np.log10(alias + 1e-12):.0f} dB, tone error {error:.0e}, "
+              f"streaming matches: {np.allclose(one_shot, streamed, atol=1e-5)}")
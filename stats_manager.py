@@ -11,8 +11,8 @@ from datetime import datetime, date
 class StatsManager:
     """Manages usage statistics with persistent storage"""
     
-    def __init__(self):
-        self.stats_dir = os.path.expanduser("~/.oropo")
+    def __init__(self, data_dir=None):
+        self.stats_dir = data_dir or os.path.expanduser("~/.oropo")
         self.stats_file = os.path.join(self.stats_dir, "stats.json")
         self._ensure_directory()
         self.stats = self._load_stats()
@@ -72,6 +72,48 @@ class StatsManager:
         
         self._save_stats()
     
+    def record_vad(self, trimmed_seconds, skipped=False):
+        """Record audio seconds removed by voice activity detection"""
+        self.stats["vad_seconds_trimmed"] = self.stats.get("vad_seconds_trimmed", 0.0) + trimmed_seconds
+        if skipped:
+            self.stats["vad_recordings_skipped"] = self.stats.get("vad_recordings_skipped", 0) + 1
+        self._save_stats()
+    
+    def get_vad_seconds_trimmed(self):
+        """Get total seconds of silence not sent to the model"""
+        return round(self.stats.get("vad_seconds_trimmed", 0.0), 1)
+    
+    def record_two_pass(self, draft_seconds, refine_seconds, replaced):
+        """Record release-to-draft and release-to-refined latencies"""
+        two_pass = self.stats.setdefault("two_pass", {
+            "count": 0, "draft_seconds": 0.0, "refine_seconds": 0.0, "replaced": 0
+        })
+        two_pass["count"] += 1
+        two_pass["draft_seconds"] += draft_seconds
+        two_pass["refine_seconds"] += refine_seconds
+        if replaced:
+            two_pass["replaced"] += 1
+        self._save_stats()
+    
+    def record_model_decision(self, decision):
+        """Record which model the scheduler picked for a dictation"""
+        counts = self.stats.setdefault("model_decisions", {})
+        counts[decision["model"]] = counts.get(decision["model"], 0) + 1
+        self.stats["last_model_decision"] = decision
+        self._save_stats()
+    
+    def get_model_decisions(self):
+        """Get how often each model was chosen, and the latest decision"""
+        return self.stats.get("model_decisions", {}), self.stats.get("last_model_decision")
+    
+    def get_two_pass_latency(self):
+        """Get average (draft, refined) latency in seconds, or None"""
+        two_pass = self.stats.get("two_pass")
+        if not two_pass or not two_pass["count"]:
+            return None
+        count = two_pass["count"]
+        return round(two_pass["draft_seconds"] / count, 2), round(two_pass["refine_seconds"] / count, 2)
+    
     def get_today_words(self):
         """Get word count for today"""
         today = date.today().isoformat()
@@ -1,20 +1,101 @@
 """
 Text Injector Module
 Pastes transcribed text at the current cursor position in any application
+Driven by signals instead of fixed delays: it pastes as soon as the
+modifiers are up and the clipboard write is confirmed, and restores the
+clipboard once the target app has read the paste.
 """
 
 import time
-import pyperclip
-import pyautogui
+import threading
+
+from injection_backends import create_injection_backend
+from latency_tracker import span
 
 
 class TextInjector:
     """Injects text at the cursor position using clipboard paste"""
     
-    def __init__(self):
-        # Configure pyautogui for macOS
-        pyautogui.PAUSE = 0.05  # Small delay between actions
-        pyautogui.FAILSAFE = True
+    def __init__(self, backend="auto", modifier_timeout=1.0, clipboard_timeout=0.5,
+                 restore_timeout=2.0, restore_delay=0.5):
+        """
+        Initialize the injector
+        
+        Args:
+            backend: Injection backend name ("auto", "mac", "pyautogui", "fake")
+                or an InjectionBackend instance
+            modifier_timeout: Longest wait for the hotkey's modifiers to come up
+                (after that nothing is sent and the paste fails)
+            clipboard_timeout: Longest wait for the clipboard write to show
+            restore_timeout: Restore the clipboard after this long if the
+                paste was not read
+            restore_delay: Restore delay when the backend can't tell when the
+                paste was read (e.g. a clipboard manager read it first)
+        """
+        if isinstance(backend, str):
+            backend = create_injection_backend(backend)
+        self.backend = backend
+        self.modifier_timeout = modifier_timeout
+        self.clipboard_timeout = clipboard_timeout
+        self.restore_timeout = restore_timeout
+        self.restore_delay = restore_delay
+        
+        # Set by the hotkey listener (set_modifiers_down); up until told otherwise
+        self.modifiers_up = threading.Event()
+        self.modifiers_up.set()
+        # Clear while a paste's clipboard is still to be restored
+        self._restored = threading.Event()
+        self._restored.set()
+        self.last_timings = {}  # Stage timings of the last paste_text call
+        self.last_error = None  # Why the last paste_text failed ("modifiers_held", ...)
+    
+    def set_modifiers_down(self, down):
+        """Hotkey listener hook: whether any modifier key is currently held"""
+        if down:
+            self.modifiers_up.clear()
+        else:
+            self.modifiers_up.set()
+    
+    def _wait_for_modifiers(self):
+        """
+        Wait until no modifier is held (else Cmd+Shift+V etc. reaches the app)
+        
+        The listener's event comes first; the backend's own modifier state
+        covers releases the listener missed.
+        """
+        deadline = time.perf_counter() + self.modifier_timeout
+        if not self.modifiers_up.wait(self.modifier_timeout):
+            return False
+        while self.backend.modifiers_down():
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+    
+    def _wait_for_clipboard(self, before):
+        """Wait until the clipboard change count moves past before"""
+        deadline = time.perf_counter() + self.clipboard_timeout
+        while self.backend.change_count() == before:
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.002)
+        return True
+    
+    def _restore_when_consumed(self, saved, change_count):
+        """Put the user's clipboard back once the target has read the paste"""
+        try:
+            consumed = None
+            if self.backend.confirms_consumption:
+                consumed = self.backend.wait_consumed(self.restore_timeout)
+            if consumed is None:
+                time.sleep(self.restore_delay)  # No read signal: give the target a moment
+            # Leave it alone if something else was copied in the meantime
+            if self.backend.change_count() == change_count:
+                self.backend.restore_clipboard(saved)
+        except Exception:
+            pass
+        finally:
+            self._restored.set()
     
     def paste_text(self, text):
         """
@@ -24,51 +105,305 @@ class TextInjector:
         
         Args:
             text: The text to paste
-            
+        
         Returns:
             True if successful, False otherwise
         """
+        self.last_error = None
         if not text or not text.strip():
             return False
         
+        timings = self.last_timings = {}
         try:
-            # Save current clipboard contents
-            try:
-                original_clipboard = pyperclip.paste()
-            except Exception:
-                original_clipboard = ""
-            
-            # Copy new text to clipboard
-            pyperclip.copy(text)
+            # The previous paste must be read and its clipboard restored first
+            with span(timings, "previous_restore"):
+                self._restored.wait(self.restore_timeout + 1.0)
             
-            # IMPORTANT: Wait for user to fully release their hotkey
-            # This prevents the "V" appearing when Command is still held
-            time.sleep(0.25)
+            # Cmd+V while the hotkey's modifiers are still held would type "V" or a different shortcut
+            with span(timings, "modifiers_wait"):
+                modifiers_up = self._wait_for_modifiers()
+            if not modifiers_up:
+                print("Text injection error: modifier keys still held, not pasting")
+                self.last_error = "modifiers_held"
+                return False
             
-            # Simulate Cmd+V to paste
-            pyautogui.hotkey('command', 'v')
+            # Save current clipboard contents
+            with span(timings, "clipboard_save"):
+                saved = self.backend.save_clipboard()
             
-            # Wait for paste to complete
-            time.sleep(0.1)
+            # Copy new text and confirm the clipboard really changed
+            with span(timings, "clipboard_copy"):
+                before = self.backend.change_count()
+                self.backend.set_clipboard(text)
+                if not self._wait_for_clipboard(before):
+                    print("Text injection error: clipboard did not change")
+                    self.last_error = "clipboard"
+                    return False
             
-            # Restore original clipboard after a short delay
-            # (in case user wants to paste again immediately)
-            def restore_clipboard():
-                time.sleep(0.5)
-                try:
-                    pyperclip.copy(original_clipboard)
-                except Exception:
-                    pass
+            # Simulate Cmd+V to paste
+            with span(timings, "keystroke"):
+                self._restored.clear()
+                change_count = self.backend.change_count()
+                self.backend.send_paste()
             
-            # Restore in background to not block
-            import threading
-            threading.Thread(target=restore_clipboard, daemon=True).start()
+            # Restore in background once the paste is consumed
+            threading.Thread(
+                target=self._restore_when_consumed,
+                args=(saved, change_count),
+                daemon=True
+            ).start()
             
             return True
-            
+        
         except Exception as e:
+            self._restored.set()
             print(f"Text injection error: {e}")
+            self.last_error = str(e)
+            return False
+    
+    def focus_snapshot(self):
+        """
+        Capture the current target (frontmost app) right after a paste
+        
+        Returns:
+            Snapshot passed to can_replace later, or None if unavailable
+        """
+        try:
+            from AppKit import NSWorkspace
+            app = NSWorkspace.sharedWorkspace().frontmostApplication()
+            return {"pid": app.processIdentifier(), "time": time.monotonic()}
+        except Exception:
+            return None
+    
+    def is_injecting(self):
+        """True while our own synthetic key events may still reach the hotkey listener"""
+        return self.backend.injected_recently()
+    
+    def same_app(self, snapshot):
+        """True if the app from the snapshot is still frontmost (or it can't be told)"""
+        if not snapshot:
+            return True
+        try:
+            from AppKit import NSWorkspace
+            return NSWorkspace.sharedWorkspace().frontmostApplication().processIdentifier() == snapshot["pid"]
+        except Exception:
+            return True
+    
+    def start_incremental(self, max_chars_per_second=120.0):
+        """
+        Start typing a transcript while it is dictated (type-as-you-speak)
+        
+        Returns:
+            An IncrementalInjector bound to the frontmost app
+        """
+        snapshot = self.focus_snapshot()
+        return IncrementalInjector(
+            self.backend,
+            max_chars_per_second=max_chars_per_second,
+            modifiers_up=self.modifiers_up,
+            focus_check=lambda: self.same_app(snapshot),
+        )
+    
+    def can_replace(self, snapshot):
+        """
+        True if the target field is untouched since the snapshot
+        
+        The same app must still be frontmost and there must have been no
+        keyboard or mouse input since (which could have moved the cursor).
+        """
+        if not snapshot:
             return False
+        try:
+            from AppKit import NSWorkspace
+            import Quartz
+            
+            app = NSWorkspace.sharedWorkspace().frontmostApplication()
+            if app.processIdentifier() != snapshot["pid"]:
+                return False
+            
+            idle = Quartz.CGEventSourceSecondsSinceLastEventType(
+                Quartz.kCGEventSourceStateCombinedSessionState,
+                Quartz.kCGAnyInputEventType
+            )
+            return idle >= time.monotonic() - snapshot["time"]
+        except Exception:
+            return False
+    
+    def replace_text(self, old_text, new_text, max_chars=500):
+        """
+        Replace text just pasted at the cursor
+        
+        Selects old_text backwards with Shift+Left and pastes new_text over it.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not old_text or not new_text or len(old_text) > max_chars:
+            return False
+        
+        try:
+            # Shift+Left with Command held would select to the start of the line
+            if not self._wait_for_modifiers():
+                print("Text replacement error: modifier keys still held")
+                return False
+            self.backend.select_backwards(len(old_text))
+            return self.paste_text(new_text)
+        
+        except Exception as e:
+            print(f"Text replacement error: {e}")
+            return False
+
+
+def text_edit(typed, desired, frozen=0):
+    """
+    Minimal backspace-and-type edit from typed to desired
+    
+    Args:
+        typed: Text currently in the target
+        desired: Text that should be there
+        frozen: Length of the prefix of typed that may not be changed
+    
+    Returns:
+        (backspaces, suffix): delete that many characters, then type suffix
+    """
+    common = 0
+    limit = min(len(typed), len(desired))
+    while common < limit and typed[common] == desired[common]:
+        common += 1
+    if common < frozen:
+        # The frozen text is on screen already; only the rest can follow the hypothesis
+        common = frozen
+        desired = typed[:frozen] + desired[frozen:]
+    return len(typed) - common, desired[common:]
+
+
+class IncrementalInjector:
+    """
+    Types a changing transcript into the target app while it is dictated
+    
+    Each hypothesis is applied as the minimal edit from what was already
+    typed: backspaces over the part that changed, then the new suffix.
+    Committed text is frozen once typed and never edited. Edits come from
+    one thread and are paced by a token bucket, so a burst of hypotheses
+    coalesces into the latest one instead of flooding the target.
+    """
+    
+    def __init__(self, backend, max_chars_per_second=120.0, burst_chars=20, modifiers_up=None,
+                 focus_check=None):
+        """
+        Initialize and start the typing thread
+        
+        Args:
+            backend: InjectionBackend that types and deletes
+            max_chars_per_second: Keystrokes (characters and backspaces) per second
+            burst_chars: Keystrokes that may be sent at once after a quiet spell
+            modifiers_up: threading.Event set while no modifier is held; waited
+                on by backends that can't type through held modifiers
+            focus_check: Returns False once the target app lost focus (typing stops)
+        """
+        self.backend = backend
+        self.max_chars_per_second = max_chars_per_second
+        self.burst_chars = burst_chars
+        self.modifiers_up = modifiers_up
+        self.focus_check = focus_check
+        
+        self.typed = ""  # What we have put in the target
+        self.frozen = 0  # Length of the committed prefix of typed
+        self.keystrokes = 0
+        self.active = True  # False once focus moved elsewhere
+        
+        self._desired = ""
+        self._committed = 0  # Length of the committed prefix of _desired
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def update(self, committed, partial=""):
+        """New hypothesis: committed text (only ever grows) plus a provisional tail"""
+        with self._condition:
+            self._desired = committed + partial
+            self._committed = len(committed)
+            self._condition.notify()
+    
+    def _run(self):
+        allowance = float(self.burst_chars)
+        last = time.perf_counter()
+        while True:
+            with self._condition:
+                while self.typed == self._desired and not self._closed:
+                    self._condition.wait()
+                if self._closed and (self.typed == self._desired or not self.active):
+                    self._condition.notify_all()
+                    return
+                desired, committed = self._desired, self._committed
+            
+            if not self.backend.types_through_modifiers and self.modifiers_up is not None:
+                self.modifiers_up.wait()  # Typing with the hotkey held would send shortcuts
+            if self.focus_check and not self.focus_check():
+                print("Type-as-you-speak stopped: the target app lost focus")
+                with self._condition:
+                    self.active = False
+                    self._condition.notify_all()
+                return
+            
+            # Token bucket: refill, then wait for at least one keystroke
+            now = time.perf_counter()
+            allowance = min(self.burst_chars, allowance + (now - last) * self.max_chars_per_second)
+            last = now
+            if allowance < 1:
+                time.sleep((1 - allowance) / self.max_chars_per_second)
+                continue
+            
+            backspaces, suffix = text_edit(self.typed, desired, self.frozen)
+            try:
+                if backspaces:
+                    # Corrections first: delete back to where the hypotheses agree
+                    sent = min(backspaces, int(allowance))
+                    self.backend.backspace(sent)
+                    self.typed = self.typed[:len(self.typed) - sent]
+                else:
+                    chunk = suffix[:int(allowance)]
+                    self.backend.type_text(chunk)
+                    self.typed += chunk
+                    sent = len(chunk)
+                    if self.typed[:committed] == desired[:committed]:
+                        self.frozen = max(self.frozen, min(committed, len(self.typed)))
+            except Exception as e:
+                print(f"Type-as-you-speak error: {e}")
+                with self._condition:
+                    self.active = False
+                    self._condition.notify_all()
+                return
+            allowance -= sent
+            self.keystrokes += sent
+    
+    def finish(self, text, timeout=None):
+        """
+        Type the final transcript and stop
+        
+        Args:
+            text: Final transcript (extends the committed text)
+            timeout: Seconds to wait for typing to catch up (default: from the rate)
+        
+        Returns:
+            True if the target now holds text
+        """
+        self.update(text)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if timeout is None:
+            timeout = 2.0 + 2 * len(text) / self.max_chars_per_second
+        self._thread.join(timeout)
+        return self.active and self.typed == text
+    
+    def cancel(self):
+        """Remove the provisional tail, keep committed text, and stop"""
+        with self._condition:
+            self._desired = self.typed[:self.frozen]
+            self._closed = True
+            self._condition.notify_all()
 
 
 # Test the text injector
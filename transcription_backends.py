@@ -0,0 +1,384 @@
+"""
+Transcription Backends Module
+Common interface over speech-to-text implementations used by TranscriptionEngine
+- mlx: MLX-Whisper on Apple Silicon
+- faster-whisper: CTranslate2 on the CPU (Linux/Intel; pip install faster-whisper)
+- fake: deterministic text with configurable latency, for tests and benchmarks
+Heavy libraries are imported lazily so every backend module loads anywhere
+"""
+
+import os
+import platform
+import re
+import sys
+import time
+import threading
+import importlib.util
+import numpy as np
+
+
+class TranscriptionBackend:
+    """Base class: load a model once, then transcribe float32 16kHz mono arrays"""
+    
+    name = "base"
+    
+    def __init__(self, model_name):
+        """
+        Initialize the backend
+        
+        Args:
+            model_name: Model identifier (HuggingFace repo or size name)
+        """
+        self.model_name = model_name
+        self.loaded = False
+    
+    def load(self):
+        """Load model weights (downloads on first use). Safe to call again."""
+        raise NotImplementedError
+    
+    def unload(self):
+        """Release model weights"""
+        self.loaded = False
+    
+    def transcribe(self, audio, initial_prompt=None, cancel=None, **options):
+        """
+        Transcribe one float32 16kHz mono array
+        
+        Args:
+            audio: Samples to decode
+            initial_prompt: Preceding text for context
+            cancel: CancelToken checked between decode steps where the
+                backend allows it (returns the text decoded so far)
+            **options: Backend decode options (ignored if unsupported)
+        
+        Returns:
+            Transcribed text (stripped)
+        """
+        raise NotImplementedError
+    
+    def transcribe_batch(self, segments, initial_prompt=None, cancel=None, **options):
+        """Transcribe several independent arrays, returning texts in order (None once cancelled)"""
+        texts = []
+        for segment in segments:
+            if cancel is not None and cancel.cancelled:
+                texts.append(None)
+            else:
+                texts.append(self.transcribe(segment, initial_prompt, cancel, **options))
+        return texts
+    
+    def capabilities(self):
+        """
+        Describe what the backend supports
+        
+        Returns:
+            dict with "device", "batch" (real batched decode) and
+            "max_concurrency" (concurrent transcribe calls that help)
+        """
+        return {"device": "cpu", "batch": False, "max_concurrency": 1}
+
+
+class MLXBackend(TranscriptionBackend):
+    """MLX-Whisper (Apple Silicon GPU)"""
+    
+    name = "mlx"
+    
+    # mlx_whisper.transcribe reads the model from the global ModelHolder, which
+    # holds one model. Each backend keeps its own weights and installs them for
+    # its decodes; decodes of the same model may overlap, different models may not.
+    _holder_condition = threading.Condition()
+    _holder_active = None
+    _holder_users = 0
+    
+    def __init__(self, model_name, bits=None):
+        """
+        Initialize the backend
+        
+        Args:
+            model_name: MLX Whisper repo or directory
+            bits: None for float16 weights, or 8 / 4 for a quantized copy
+                (converted once and cached by ModelCache)
+        """
+        super().__init__(model_name)
+        self.bits = bits
+        self._model = None
+    
+    def load(self):
+        if self._model is not None:
+            return
+        import mlx.core as mx
+        from mlx_whisper.load_models import load_model
+        from model_cache import ModelCache
+        
+        path = ModelCache().resolve(self.model_name, self.bits) if self.bits else self.model_name
+        self._model = load_model(path, dtype=mx.float16)
+        self.loaded = True
+    
+    def unload(self):
+        cls = MLXBackend
+        with cls._holder_condition:
+            if cls._holder_active is None:
+                # ModelHolder keeps the last decoded model alive otherwise
+                try:
+                    from mlx_whisper.transcribe import ModelHolder
+                    if ModelHolder.model is self._model:
+                        ModelHolder.model = None
+                        ModelHolder.model_path = None
+                except ImportError:
+                    pass
+        self._model = None
+        self.loaded = False
+        try:
+            import mlx.core as mx
+            # Return the freed buffers held by MLX's allocator cache to the system
+            clear_cache = getattr(mx, "clear_cache", None) or mx.metal.clear_cache
+            clear_cache()
+        except Exception:
+            pass
+    
+    def _acquire_holder(self):
+        """Install this backend's model in ModelHolder for the duration of a decode"""
+        from mlx_whisper.transcribe import ModelHolder
+        
+        cls = MLXBackend
+        with cls._holder_condition:
+            while cls._holder_active not in (None, self):
+                cls._holder_condition.wait()
+            cls._holder_active = self
+            cls._holder_users += 1
+            ModelHolder.model = self._model
+            ModelHolder.model_path = self.model_name
+    
+    def _release_holder(self):
+        cls = MLXBackend
+        with cls._holder_condition:
+            cls._holder_users -= 1
+            if cls._holder_users == 0:
+                cls._holder_active = None
+                cls._holder_condition.notify_all()
+    
+    def transcribe(self, audio, initial_prompt=None, cancel=None, **options):
+        # mlx_whisper has no hook between tokens or windows, so a cancel only
+        # takes effect between calls (the engine stops waiting for this one)
+        import mlx_whisper
+        
+        self.load()
+        # mlx_whisper has no beam search decoder yet
+        options.pop("beam_size", None)
+        options.pop("patience", None)
+        self._acquire_holder()
+        try:
+            result = mlx_whisper.transcribe(
+                audio,
+                path_or_hf_repo=self.model_name,
+                language=options.pop("language", "en"),
+                word_timestamps=False,
+                initial_prompt=initial_prompt,
+                **options
+            )
+        finally:
+            self._release_holder()
+        return result.get("text", "").strip()
+    
+    def capabilities(self):
+        # Threads decoding on one model share MLX's default stream and Metal queue,
+        # so they don't overlap (and MLX doesn't document multi-threaded eval as safe)
+        return {"device": "gpu", "batch": False, "max_concurrency": 1}
+
+
+def _model_size(model_name):
+    """Map a model repo (e.g. mlx-community/whisper-small-mlx) to a size name"""
+    match = re.search(r"whisper-((?:large-v\d(?:-turbo)?)|large|turbo|medium|small|base|tiny)(\.en)?",
+                      model_name)
+    if match:
+        return match.group(1) + (match.group(2) or "")
+    return model_name
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """CTranslate2 Whisper on the CPU (faster-whisper)"""
+    
+    name = "faster-whisper"
+    
+    def __init__(self, model_name, compute_type="int8", cpu_threads=0, num_workers=2, bits=None):
+        """
+        Initialize the backend
+        
+        Args:
+            model_name: Size name ("small") or repo; MLX repos map to their size
+            compute_type: CTranslate2 precision ("int8", "float32", ...)
+            cpu_threads: Threads per decode (0 = library default)
+            num_workers: Concurrent transcribe calls the model accepts
+            bits: Overrides compute_type: 8 -> int8, 16/32 -> float32
+                (CTranslate2 has no 4-bit weights; 4 falls back to int8)
+        """
+        super().__init__(model_name)
+        if bits is not None:
+            if bits not in (8, 16, 32):
+                print(f"faster-whisper does not support {bits}-bit weights, using int8")
+            compute_type = "int8" if bits in (4, 8) else "float32"
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self._model = None
+    
+    def load(self):
+        if self._model is not None:
+            return
+        from faster_whisper import WhisperModel
+        
+        self._model = WhisperModel(
+            _model_size(self.model_name),
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers,
+        )
+        self.loaded = True
+    
+    def unload(self):
+        self._model = None
+        self.loaded = False
+    
+    def transcribe(self, audio, initial_prompt=None, cancel=None, **options):
+        self.load()
+        if "logprob_threshold" in options:
+            options["log_prob_threshold"] = options.pop("logprob_threshold")
+        segments, _ = self._model.transcribe(
+            audio,
+            language=options.pop("language", "en"),
+            initial_prompt=initial_prompt,
+            **options
+        )
+        # Segments are decoded lazily, so stopping the iteration stops the decode
+        texts = []
+        for segment in segments:
+            texts.append(segment.text)
+            if cancel is not None and cancel.cancelled:
+                break
+        return "".join(texts).strip()
+    
+    def capabilities(self):
+        return {"device": "cpu", "batch": False, "max_concurrency": self.num_workers}
+
+
+class FakeBackend(TranscriptionBackend):
+    """Deterministic backend for tests and benchmarks (no model, no audio analysis)"""
+    
+    name = "fake"
+    
+    def __init__(self, model_name="fake", load_seconds=0.0, latency_seconds=0.05,
+                 rtf=0.05, text=None, bits=None, crash_seconds=None):
+        """
+        Initialize the backend
+        
+        Args:
+            load_seconds: Simulated model load time
+            latency_seconds: Fixed cost per decode call
+            rtf: Simulated real-time factor (decode time per audio second)
+            text: Fixed result text; by default one word per half second of audio
+            bits: Accepted for interface compatibility (no effect)
+            crash_seconds: Decoding audio this long kills the process, like a
+                native crash in a real backend (for crash-recovery tests)
+        """
+        super().__init__(model_name)
+        self.bits = bits
+        self.load_seconds = load_seconds
+        self.latency_seconds = latency_seconds
+        self.rtf = rtf
+        self.text = text
+        self.crash_seconds = crash_seconds
+        self.calls = 0
+    
+    def load(self):
+        if not self.loaded:
+            time.sleep(self.load_seconds)
+            self.loaded = True
+    
+    def _text_for(self, audio):
+        if self.text is not None:
+            return self.text
+        words = int(len(audio) / 16000 * 2)
+        return " ".join(f"word{i}" for i in range(words))
+    
+    def _sleep(self, seconds, cancel):
+        """Simulated decode time; True if cancelled part-way"""
+        if cancel is None:
+            time.sleep(seconds)
+            return False
+        return cancel.wait(seconds)
+    
+    def transcribe(self, audio, initial_prompt=None, cancel=None, **options):
+        self.calls += 1
+        if self.crash_seconds is not None and abs(len(audio) / 16000 - self.crash_seconds) < 0.01:
+            os._exit(70)
+        if self._sleep(self.latency_seconds + self.rtf * len(audio) / 16000, cancel):
+            return ""
+        return self._text_for(audio)
+    
+    def transcribe_batch(self, segments, initial_prompt=None, cancel=None, **options):
+        # One fixed overhead for the whole batch, like a real batched decode
+        self.calls += 1
+        total = sum(len(segment) for segment in segments) / 16000
+        if self._sleep(self.latency_seconds + self.rtf * total, cancel):
+            return [None] * len(segments)
+        return [self._text_for(segment) for segment in segments]
+    
+    def capabilities(self):
+        return {"device": "cpu", "batch": True, "max_concurrency": 1}
+
+
+BACKENDS = {
+    MLXBackend.name: MLXBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def _installed(module):
+    """True if a module can be imported"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def detect_backend():
+    """Pick the best backend for this machine"""
+    if sys.platform == "darwin" and platform.machine() == "arm64" and _installed("mlx_whisper"):
+        return MLXBackend.name
+    if _installed("faster_whisper"):
+        return FasterWhisperBackend.name
+    raise RuntimeError(
+        "No transcription backend available: install mlx-whisper (Apple Silicon) "
+        "or faster-whisper (CPU), or select the 'fake' backend"
+    )
+
+
+def create_backend(name, model_name, **options):
+    """
+    Create a backend by name
+    
+    Args:
+        name: "auto", "mlx", "faster-whisper" or "fake"
+        model_name: Model to load
+        **options: Backend-specific settings
+    """
+    if name == "auto":
+        name = detect_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name](model_name, **options)
+
+
+# Test
+if __name__ == "__main__":
+    try:
+        print(f"Detected backend: {detect_backend()}")
+    except RuntimeError as e:
+        print(e)
+    
+    backend = create_backend("fake", "fake", latency_seconds=0.01)
+    backend.load()
+    audio = np.zeros(16000 * 3, dtype=np.float32)
+    print(f"Fake transcription: {backend.transcribe(audio)}")
+    print(f"Capabilities: {backend.capabilities()}")
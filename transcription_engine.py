@@ -1,110 +1,691 @@
 """
 Transcription Engine Module
-Converts audio files to text using MLX-Whisper (Apple Silicon optimized)
+Converts audio buffers or files to text through a pluggable backend
+(MLX-Whisper on Apple Silicon, faster-whisper on the CPU, or a fake for tests)
+Supports streaming mode: finalized segments are decoded while the hotkey is held
+Long recordings are split at pauses and the segments decoded concurrently
 """
 
 import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 import soundfile as sf
-import mlx_whisper
+
+from decode_profiles import DEFAULT_PROFILE, profile_options
+from resampler import resample
+from transcription_backends import TranscriptionBackend, create_backend
+from voice_activity import VoiceActivityDetector
 
 
 class TranscriptionEngine:
-    """Transcribes audio files to text using Whisper"""
+    """Transcribes audio buffers or files to text using Whisper"""
     
-    def __init__(self, model_name="mlx-community/whisper-small-mlx"):
+    def __init__(self, model_name="mlx-community/whisper-small-mlx", decode_workers=2,
+                 long_form_seconds=30.0, backend="auto", decode_profile=DEFAULT_PROFILE,
+                 quantization=None):
         """
         Initialize the transcription engine
         
         Args:
             model_name: HuggingFace model path (downloads automatically on first use)
+            decode_workers: Concurrent decodes for long-form audio (1 = sequential),
+                capped by the backend's max_concurrency
+            long_form_seconds: Audio longer than this is split at pauses and
+                the segments batched (if the backend can) or decoded in parallel
+            backend: Backend name ("auto", "mlx", "faster-whisper", "fake")
+                or a TranscriptionBackend instance
+            decode_profile: "fastest", "balanced" or "accurate" decode options
+            quantization: None for full precision, or 8 / 4 bit weights
         """
+        self.quantization = quantization
+        if not isinstance(backend, TranscriptionBackend):
+            backend = create_backend(backend, model_name, bits=quantization)
+        self.backend = backend
         self.model_name = model_name
-        self._model_loaded = False
         
-    def _ensure_model(self):
-        """Ensure model is loaded (lazy loading)"""
-        if not self._model_loaded:
-            self._model_loaded = True
+        # Other models requested per call (e.g. by the model scheduler) share the backend type
+        self._backends = {model_name: backend}
+        self._loaded_models = set()
+        # Short lock for the maps; loads (possibly a long download) hold only their model's lock
+        self._backends_lock = threading.Lock()
+        self._model_locks = {}
+        self._active = {}  # Backend -> decodes in progress (never unloaded while > 0)
+        self._active_lock = threading.Lock()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.set_decode_profile(decode_profile)
+        self.decode_workers = max(1, decode_workers)
+        self.long_form_seconds = long_form_seconds
+        self.vad = VoiceActivityDetector(16000)
+        
+        # Bounds concurrent decodes (streaming and long-form run alongside the app thread);
+        # never more than the backend can overlap, so e.g. MLX decodes are serialized
+        concurrency = self.backend.capabilities().get("max_concurrency", 1)
+        self._decode_slots = threading.Semaphore(max(1, min(self.decode_workers, concurrency)))
+        
+        # Per-stage timings (seconds) and error of the last transcribe call
+        self.last_timings = {}
+        self.last_error = None
+        
+        # Cancelled decodes a backend couldn't stop (mlx) keep running, holding their
+        # decode slot and the model until they finish; they are tracked, not forgotten
+        self._orphans = set()
+        self._orphans_lock = threading.Lock()
+        self.orphaned_total = 0
+        self.last_orphan_seconds = None  # How long the last one ran on after being abandoned
+        
+    def set_decode_profile(self, name):
+        """Switch the decode options used by later transcriptions"""
+        self.decode_profile = name
+        self.decode_options = profile_options(name)
+    
+    def _get_backend(self, model_name=None):
+        """Get the backend for a model (the default model if None)"""
+        model_name = model_name or self.model_name
+        with self._backends_lock:
+            if model_name not in self._backends:
+                self._backends[model_name] = create_backend(self.backend.name, model_name,
+                                                              bits=self.quantization)
+            return self._backends[model_name]
+    
+    def _model_lock(self, model_name):
+        """Lock serializing load and unload of one model"""
+        with self._backends_lock:
+            return self._model_locks.setdefault(model_name, threading.Lock())
+    
+    def _ensure_model(self, model_name=None):
+        """
+        Load the model weights and warm up the decoder (once per model)
+        
+        Downloads the model on first run. Callers arriving while another
+        thread is loading the same model wait for it instead of starting a
+        second load; decodes with other, loaded models are not held up.
+        """
+        model_name = model_name or self.model_name
+        if model_name in self._loaded_models:
+            return
+        
+        backend = self._get_backend(model_name)
+        with self._model_lock(model_name):
+            if model_name in self._loaded_models:
+                return
+            
+            started = time.perf_counter()
+            backend.load()
+            self.load_seconds = time.perf_counter() - started
+            
+            # A short dummy decode compiles kernels and fills caches
+            started = time.perf_counter()
+            self._decode(np.zeros(16000, dtype=np.float32), backend=backend)
+            self.warmup_seconds = time.perf_counter() - started
+            
+            self._loaded_models.add(model_name)
+            print(f"Model {model_name} ({backend.name}) loaded in {self.load_seconds:.2f}s, "
+                  f"warmed up in {self.warmup_seconds:.2f}s")
+    
+    def is_loaded(self, model_name=None):
+        """True if a model's weights are in memory"""
+        return (model_name or self.model_name) in self._loaded_models
+    
+    def unload_model(self, model_name=None):
+        """
+        Release a model's weights (it is reloaded on next use)
+        
+        Returns:
+            True if unloaded, False if it is decoding or wasn't loaded
+        """
+        model_name = model_name or self.model_name
+        backend = self._get_backend(model_name)
+        with self._model_lock(model_name), self._active_lock:
+            if model_name not in self._loaded_models or self._active.get(backend):
+                return False
+            backend.unload()
+            self._loaded_models.discard(model_name)
+        print(f"Model {model_name} unloaded")
+        return True
     
     def _load_audio(self, audio_path):
         """Load audio file and convert to format expected by Whisper"""
         try:
             # Read audio file using soundfile (no ffmpeg needed!)
-            audio_data, sample_rate = sf.read(audio_path)
-            
-            # Convert to mono if stereo
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.mean(axis=1)
-            
-            # Resample to 16kHz if needed
-            if sample_rate != 16000:
-                # Simple resampling
-                duration = len(audio_data) / sample_rate
-                new_length = int(duration * 16000)
-                indices = np.linspace(0, len(audio_data) - 1, new_length)
-                audio_data = np.interp(indices, np.arange(len(audio_data)), audio_data)
-            
-            # Convert to float32 and normalize
-            audio_data = audio_data.astype(np.float32)
-            if audio_data.max() > 1.0:
-                audio_data = audio_data / 32768.0  # Normalize int16 to float
-                
-            return audio_data
+            audio_data, sample_rate = sf.read(audio_path, dtype='float32')
+            return self._prepare_audio(audio_data, sample_rate)
             
         except Exception as e:
             print(f"Error loading audio: {e}")
             return None
     
-    def transcribe(self, audio_path):
+    def _prepare_audio(self, audio_data, sample_rate=16000):
+        """Convert an in-memory buffer to float32 16kHz mono (no copy if it already is)"""
+        # Convert to mono if stereo
+        if audio_data.ndim > 1:
+            if audio_data.shape[1] == 1:
+                audio_data = audio_data.reshape(-1)
+            else:
+                audio_data = audio_data.mean(axis=1)
+        
+        # Normalize integer PCM to float
+        if np.issubdtype(audio_data.dtype, np.integer):
+            scale = float(np.iinfo(audio_data.dtype).max) + 1.0
+            audio_data = audio_data.astype(np.float32) / scale
+        
+        # Resample to 16kHz if needed (anti-aliased polyphase filter, float32)
+        if sample_rate != 16000:
+            audio_data = resample(audio_data, sample_rate, 16000)
+        
+        return np.ascontiguousarray(audio_data, dtype=np.float32)
+    
+    def transcribe(self, audio, sample_rate=16000, initial_prompt=None, model_name=None,
+                   cancel=None, timings=None):
         """
-        Transcribe an audio file to text
+        Transcribe audio to text
         
         Args:
-            audio_path: Path to the audio file (WAV format, 16kHz)
+            audio: numpy array of samples (preferred, no disk round-trip) or
+                path to an audio file. Files are left in place.
+            sample_rate: Sample rate of an in-memory array
+            initial_prompt: Preceding text, gives Whisper context across segments
+            model_name: Model for this call (defaults to the engine's model)
+            cancel: CancelToken; once it fires (user or deadline) this returns
+                within cancel.poll_interval with the segments finished so far
+                and last_timings["cancelled"] set to the reason. A decode the
+                backend can't stop runs on as an orphan (timings["orphaned"]);
+                later calls report how many are still running in
+                timings["orphaned_decodes"]
+            timings: Dict filled with this call's stage timings. last_timings
+                is shared by concurrent calls (streaming sessions, the
+                pipeline), so read per-call timings from here
             
         Returns:
             Transcribed text string, or empty string on failure
         """
-        if not audio_path or not os.path.exists(audio_path):
+        timings = {} if timings is None else timings
+        if cancel is None:
+            return self._transcribe(audio, sample_rate, initial_prompt, model_name, timings=timings)
+        
+        # Decoding runs beside a watcher: backends that can't stop mid-call (mlx)
+        # finish in the background as an orphaned decode and their result is dropped
+        progress = {"text": ""}
+        result = {}
+        state = {"done": False, "abandoned_at": None}
+        
+        def run():
+            try:
+                result["text"] = self._transcribe(audio, sample_rate, initial_prompt, model_name,
+                                                  cancel, progress, timings)
+            finally:
+                with self._orphans_lock:
+                    state["done"] = True
+                    if state["abandoned_at"] is not None:
+                        self._orphans.discard(thread)
+                        self.last_orphan_seconds = time.perf_counter() - state["abandoned_at"]
+                        print(f"Cancelled decode finished {self.last_orphan_seconds:.1f}s after it was abandoned")
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        while thread.is_alive() and not cancel.cancelled:
+            thread.join(cancel.poll_interval)
+        with self._orphans_lock:
+            if state["done"]:
+                return result.get("text", "")
+            state["abandoned_at"] = time.perf_counter()
+            self._orphans.add(thread)
+            self.orphaned_total += 1
+        
+        timings["cancelled"] = cancel.reason
+        timings["orphaned"] = True
+        return progress["text"]
+    
+    def orphaned_decodes(self):
+        """Cancelled decodes still running in the background (they hold a decode slot and their model)"""
+        with self._orphans_lock:
+            return len(self._orphans)
+    
+    def _transcribe(self, audio, sample_rate=16000, initial_prompt=None, model_name=None,
+                    cancel=None, progress=None, timings=None):
+        """Transcribe, stopping between segments once `cancel` fires"""
+        # Each call has its own dict: an abandoned (cancelled) call must not write into the next call's timings
+        timings = {} if timings is None else timings
+        self.last_timings = timings
+        self.last_error = None
+        orphans = self.orphaned_decodes()
+        if orphans:
+            # This decode may wait for them (slot, MLX model holder, GPU)
+            timings["orphaned_decodes"] = orphans
+        
+        if audio is None:
             return ""
         
         try:
-            self._ensure_model()
+            self._ensure_model(model_name)
+            backend = self._get_backend(model_name)
             
-            # Load audio using our own loader (no ffmpeg needed)
-            audio_data = self._load_audio(audio_path)
+            started = time.perf_counter()
+            if isinstance(audio, np.ndarray):
+                audio_data = self._prepare_audio(audio, sample_rate)
+                timings["prepare_audio"] = time.perf_counter() - started
+            else:
+                if not os.path.exists(audio):
+                    return ""
+                # Load audio using our own loader (no ffmpeg needed)
+                audio_data = self._load_audio(audio)
+                timings["read_wav"] = time.perf_counter() - started
             
-            if audio_data is None:
+            if audio_data is None or len(audio_data) == 0:
                 return ""
             
-            # Transcribe using MLX-Whisper with numpy array
-            result = mlx_whisper.transcribe(
-                audio_data,
-                path_or_hf_repo=self.model_name,
-                language="en",
-                word_timestamps=False,
-            )
-            
-            # Extract text from result
-            text = result.get("text", "").strip()
-            
-            # Clean up the audio file after transcription
-            try:
-                os.remove(audio_path)
-            except Exception:
-                pass
+            started = time.perf_counter()
+            # Split long audio when the segments can be batched or decoded concurrently
+            long_form = backend.capabilities().get("batch") or self.decode_workers > 1
+            if len(audio_data) > self.long_form_seconds * 16000 and long_form:
+                text = self._transcribe_long(audio_data, initial_prompt, backend, cancel, progress, timings)
+            else:
+                text = self._decode(audio_data, initial_prompt, backend, cancel) or ""
+            timings["decode"] = time.perf_counter() - started
+            timings["audio_seconds"] = len(audio_data) / 16000
+            if cancel is not None and cancel.cancelled:
+                timings["cancelled"] = cancel.reason
             
             return text
             
         except Exception as e:
             print(f"Transcription error: {e}")
-            # Try to clean up even on error
-            try:
-                os.remove(audio_path)
-            except Exception:
-                pass
+            self.last_error = str(e)
+            return ""
+    
+    @contextmanager
+    def _in_use(self, backend):
+        """Hold a backend for a decode: it is not unloaded meanwhile (and is reloaded if it just was)"""
+        with self._active_lock:
+            self._active[backend] = self._active.get(backend, 0) + 1
+        try:
+            if not backend.loaded:
+                # Unloaded between _ensure_model and here
+                with self._backends_lock:
+                    names = [name for name, other in self._backends.items() if other is backend]
+                for name in names:
+                    with self._model_lock(name):
+                        if not backend.loaded:
+                            backend.load()
+                        self._loaded_models.add(name)
+            yield backend
+        finally:
+            with self._active_lock:
+                self._active[backend] -= 1
+    
+    def _decode(self, audio_data, initial_prompt=None, backend=None, cancel=None):
+        """Decode float32 16kHz audio with the backend (None if cancelled before starting)"""
+        backend = backend or self.backend
+        with self._decode_slots:
+            if cancel is not None and cancel.cancelled:
+                return None
+            with self._in_use(backend):
+                return backend.transcribe(audio_data, initial_prompt=initial_prompt, cancel=cancel,
+                                          **self.decode_options)
+    
+    def _transcribe_long(self, audio_data, initial_prompt=None, backend=None, cancel=None,
+                         progress=None, timings=None):
+        """
+        Decode a long recording as independent pause-delimited segments
+        
+        Segments go through one batched decode if the backend supports it,
+        otherwise they are decoded concurrently by up to decode_workers threads.
+        Text is reassembled in order; hard (overlapping) cuts are de-duplicated.
+        On cancel, the text of the segments completed in order is returned.
+        """
+        timings = self.last_timings if timings is None else timings
+        segments = self.vad.split(audio_data, max_seconds=self.long_form_seconds)
+        timings["segments"] = len(segments)
+        if not segments:
             return ""
+        
+        backend = backend or self.backend
+        arrays = [audio_data[start:end] for start, end in segments]
+        capabilities = backend.capabilities()
+        if capabilities.get("batch"):
+            with self._decode_slots, self._in_use(backend):
+                texts = backend.transcribe_batch(arrays, initial_prompt=initial_prompt, cancel=cancel,
+                                                 **self.decode_options)
+            text = _join_segments(segments, texts)
+            if progress is not None:
+                progress["text"] = text  # One batch: all segments finish together
+            return text
+        
+        workers = min(self.decode_workers, capabilities.get("max_concurrency", 1))
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        texts = []
+        try:
+            futures = [pool.submit(self._decode, array, initial_prompt, backend, cancel) for array in arrays]
+            for future in futures:
+                segment_text = future.result()
+                if segment_text is None:
+                    break  # Cancelled: keep only the in-order prefix
+                texts.append(segment_text)
+                if progress is not None:
+                    progress["text"] = _join_segments(segments, texts)
+        finally:
+            # Don't wait for queued segments of a cancelled decode
+            pool.shutdown(wait=cancel is None or not cancel.cancelled, cancel_futures=True)
+        return _join_segments(segments, texts)
+    
+    def start_streaming(self, get_audio, sample_rate=16000, **options):
+        """
+        Start transcribing a recording while it is still being captured
+        
+        Args:
+            get_audio: Callable returning the samples recorded so far
+            sample_rate: Sample rate of the recorded samples
+            **options: Segmentation settings passed to StreamingSession
+            
+        Returns:
+            A running StreamingSession; call finish() on hotkey release
+        """
+        session = StreamingSession(self, get_audio, sample_rate, **options)
+        session.start()
+        return session
+
+
+def _join_segments(segments, texts):
+    """Concatenate segment texts in order, de-duplicating overlapping cuts"""
+    text = ""
+    previous_end = 0
+    for (start, end), segment_text in zip(segments, texts):
+        if segment_text is None:
+            break
+        if start < previous_end:
+            text = stitch_text(text, segment_text)
+        elif segment_text:
+            text = f"{text} {segment_text}".strip()
+        previous_end = end
+    return text
+
+
+class CancelToken:
+    """Cooperative cancellation for a transcription, by request or deadline"""
+    
+    def __init__(self, deadline_seconds=None, poll_interval=0.05):
+        """
+        Initialize the token
+        
+        Args:
+            deadline_seconds: Cancel automatically this long after start_deadline()
+                (or after creation if given here); None or 0 for no deadline
+            poll_interval: How often waiting code checks the token
+        """
+        self.poll_interval = poll_interval
+        self.reason = None
+        self.deadline = None
+        self._event = threading.Event()
+        if deadline_seconds:
+            self.start_deadline(deadline_seconds)
+    
+    def start_deadline(self, seconds):
+        """Start (or restart) the deadline clock"""
+        self.deadline = time.perf_counter() + seconds if seconds else None
+    
+    def cancel(self, reason="user"):
+        """Request cancellation (the first reason wins)"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+    
+    @property
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        return False
+    
+    def wait(self, timeout):
+        """Sleep up to timeout, waking early on cancel; True if cancelled"""
+        if self.deadline is not None:
+            timeout = min(timeout, max(0.0, self.deadline - time.perf_counter()))
+        self._event.wait(timeout)
+        return self.cancelled
+
+
+def _normalize_word(word):
+    """Lowercase a word and strip punctuation for overlap matching"""
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_text(committed, new, max_overlap_words=8):
+    """
+    Append new text to committed text, dropping words repeated at the seam
+    
+    Overlapping audio windows make Whisper transcribe the same words twice;
+    the longest suffix of `committed` that matches a prefix of `new` is removed.
+    """
+    new = new.strip()
+    if not committed:
+        return new
+    if not new:
+        return committed
+    
+    old_words = [_normalize_word(w) for w in committed.split()]
+    new_words = new.split()
+    new_norm = [_normalize_word(w) for w in new_words]
+    
+    limit = min(max_overlap_words, len(old_words), len(new_words))
+    for k in range(limit, 0, -1):
+        if old_words[-k:] == new_norm[:k]:
+            new_words = new_words[k:]
+            break
+    
+    if not new_words:
+        return committed
+    return f"{committed} {' '.join(new_words)}"
+
+
+class StreamingSession:
+    """Decodes finalized segments in the background while recording continues"""
+    
+    def __init__(self, engine, get_audio, sample_rate=16000, min_segment_seconds=4.0,
+                 window_seconds=10.0, overlap_seconds=1.0, pause_seconds=0.3,
+                 poll_interval=0.25, vad=None, on_update=None, partial_interval=None, scheduler=None):
+        """
+        Initialize a streaming session
+        
+        Segments are cut at the latest pause once at least min_segment_seconds
+        are pending; without a pause a fixed window_seconds cut is made and the
+        next segment starts overlap_seconds earlier (stitched by stitch_text).
+        Segments without speech are skipped instead of decoded.
+        
+        on_update(committed, partial) is called whenever the transcript
+        changes. committed only ever grows; partial is a provisional
+        hypothesis for the audio after it, decoded at most every
+        partial_interval seconds (None: committed segments only).
+        
+        With a ModelScheduler, each segment (and the tail) is decoded by the
+        model it picks for that segment's length, and the measured decode
+        feeds its estimates.
+        """
+        self.engine = engine
+        self.get_audio = get_audio
+        self.sample_rate = sample_rate
+        self.min_segment = int(min_segment_seconds * sample_rate)
+        self.window = int(window_seconds * sample_rate)
+        self.overlap = int(overlap_seconds * sample_rate)
+        self.pause_ms = int(pause_seconds * 1000)
+        self.poll_interval = poll_interval
+        self.vad = vad or VoiceActivityDetector(sample_rate)
+        self.on_update = on_update
+        self.partial_interval = partial_interval
+        self.scheduler = scheduler
+        self.last_model = None  # Model of the last segment decode (None = the engine's)
+        self.last_decision = None
+        
+        self.text = ""
+        self.partial = ""
+        self.segment_start = 0  # First sample of the next segment
+        self.segments_decoded = 0
+        self.partials_decoded = 0
+        self.last_timings = {}
+        self._last_partial = 0.0
+        
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the background segmentation thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        """Poll the recording and decode segments as they become final"""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                audio = self.get_audio()
+                cut = self._find_cut(audio)
+                if cut is None:
+                    self._decode_partial(audio[self.segment_start:])
+                    continue
+                
+                cut, next_start = cut
+                self._decode_segment(audio[self.segment_start:cut])
+                self.segment_start = next_start
+                
+            except Exception as e:
+                print(f"Streaming error: {e}")
+    
+    def _find_cut(self, audio):
+        """
+        Find where the next segment ends
+        
+        Returns:
+            (cut, next_segment_start) or None if no segment is final yet
+        """
+        # Keep a margin so a pause that is still growing is not cut too early
+        margin = int(self.pause_ms * self.sample_rate / 1000)
+        search_start = self.segment_start + self.min_segment
+        search_end = len(audio) - margin
+        if search_end <= search_start:
+            return None
+        
+        pause = self._find_last_pause(audio[search_start:search_end])
+        if pause is not None:
+            cut = search_start + pause
+            return cut, cut
+        
+        if len(audio) - self.segment_start >= self.window:
+            cut = self.segment_start + self.window
+            return cut, cut - self.overlap
+        
+        return None
+    
+    def _find_last_pause(self, audio):
+        """Return the sample offset of the middle of the last pause, or None"""
+        pauses = self.vad.find_pauses(audio, self.pause_ms)
+        if not pauses:
+            return None
+        start, end = pauses[-1]
+        return (start + end) // 2
+    
+    def _decode_segment(self, audio, cancel=None):
+        """Decode one segment and stitch it onto the committed text"""
+        started = time.perf_counter()
+        if not self.vad.is_speech(audio):
+            return 0.0
+        
+        decision = self.scheduler.decide(len(audio) / self.sample_rate) if self.scheduler else None
+        model_name = decision["model"] if decision else None
+        timings = {}
+        text = self.engine.transcribe(
+            audio,
+            self.sample_rate,
+            initial_prompt=self.text[-200:] or None,
+            model_name=model_name,
+            cancel=cancel,
+            timings=timings,
+        )
+        if decision and "decode" in timings and "cancelled" not in timings:
+            self.scheduler.record(model_name, timings["audio_seconds"], timings["decode"], decision)
+            self.last_decision = decision
+        self.last_model = model_name
+        self.text = stitch_text(self.text, text)
+        self.segments_decoded += 1
+        self.partial = ""
+        self._notify()
+        return time.perf_counter() - started
+    
+    def _decode_partial(self, audio):
+        """Decode the not yet final audio as a provisional hypothesis"""
+        if not (self.on_update and self.partial_interval):
+            return
+        if time.perf_counter() - self._last_partial < self.partial_interval:
+            return
+        if len(audio) < self.sample_rate or not self.vad.is_speech(audio):
+            return
+        
+        self._last_partial = time.perf_counter()
+        text = self.engine.transcribe(audio, self.sample_rate, initial_prompt=self.text[-200:] or None)
+        if self._stop.is_set():
+            return  # finish() decodes the tail for real
+        self.partial = stitch_text(self.text, text)[len(self.text):]
+        self.partials_decoded += 1
+        self._notify()
+    
+    def _notify(self):
+        if self.on_update:
+            try:
+                self.on_update(self.text, self.partial)
+            except Exception as e:
+                print(f"Streaming update error: {e}")
+    
+    def freeze(self, audio):
+        """
+        Fix the recording this session works on (the hotkey was released)
+        
+        Segments keep being decoded from `audio` until finish(), while the
+        recorder is free to start the next dictation in a new buffer.
+        """
+        self.get_audio = lambda: audio
+    
+    def finish(self, audio=None, cancel=None):
+        """
+        Stop streaming and decode the unfinished tail
+        
+        Args:
+            audio: Final recording (defaults to get_audio())
+            cancel: CancelToken; when it fires, the segments committed so far
+                are returned without waiting for the rest
+            
+        Returns:
+            The full stitched transcription
+        """
+        self._stop.set()
+        if self._thread:
+            # Waits for an in-flight segment decode to complete (or the cancel)
+            while self._thread.is_alive():
+                self._thread.join(cancel.poll_interval if cancel else None)
+                if cancel is not None and cancel.cancelled:
+                    break
+        
+        if audio is None:
+            audio = self.get_audio()
+        
+        tail = audio[self.segment_start:]
+        self.last_timings = {
+            "segments": self.segments_decoded,
+            "partials": self.partials_decoded,
+            "tail_seconds": len(tail) / self.sample_rate,
+        }
+        if len(tail) >= int(0.3 * self.sample_rate) and not (cancel and cancel.cancelled):
+            self.last_timings["tail_decode"] = self._decode_segment(tail, cancel)
+        if cancel is not None and cancel.cancelled:
+            self.last_timings["cancelled"] = cancel.reason
+        
+        return self.text
+    
+    def cancel(self):
+        """Stop streaming without decoding the tail"""
+        self._stop.set()
 
 
 # Test the transcription engine
@@ -115,20 +696,20 @@ if __name__ == "__main__":
     
     # Create a test: record and transcribe
     from audio_recorder import AudioRecorder
-    import time
     
     recorder = AudioRecorder()
     
     print("\n🎤 Recording for 3 seconds - say something!")
     recorder.start_recording()
     time.sleep(3)
-    audio_file = recorder.stop_recording()
+    audio = recorder.stop_recording()
     
-    if audio_file:
+    if audio is not None:
         print("🧠 Transcribing...")
-        text = engine.transcribe(audio_file)
+        text = engine.transcribe(audio)
         if text:
             print(f"✅ Transcription: {text}")
+            print(f"   Timings: {recorder.last_timings} {engine.last_timings}")
         else:
             print("❌ No speech detected")
     else:
@@ -0,0 +1,382 @@
+"""
+Transcription Worker Module
+Hosts TranscriptionEngine in a persistent child process
+Keeps model inference (and its GIL time and crashes) away from the menu bar UI
+and the hotkey listener. Audio is passed through multiprocessing.shared_memory
+rather than pickled; the worker is health-checked and restarted (with the model
+reloaded) if it dies or hangs.
+"""
+
+import itertools
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _attach_shared_memory(name):
+    """Attach to a block owned (and unlinked) by the app process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the spawned worker shares the app's resource tracker,
+        # so registering the block again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(conn, engine_options):
+    """Child process loop: load the model, then serve requests until stopped"""
+    from transcription_engine import TranscriptionEngine
+    
+    engine = TranscriptionEngine(**engine_options)
+    try:
+        engine._ensure_model()
+    except Exception as e:
+        conn.send({"type": "error", "error": f"Model load failed: {e}"})
+        return
+    conn.send({
+        "type": "ready",
+        "load_seconds": engine.load_seconds,
+        "warmup_seconds": engine.warmup_seconds,
+    })
+    
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        
+        kind = message.get("type")
+        if kind == "stop":
+            return
+        if kind == "ping":
+            conn.send({"type": "pong"})
+            continue
+        if kind != "transcribe":
+            continue
+        
+        started = time.perf_counter()
+        if message.get("path"):
+            text = engine.transcribe(message["path"], model_name=message.get("model_name"))
+        else:
+            shm = _attach_shared_memory(message["shm"])
+            try:
+                audio = np.ndarray((message["length"],), dtype=message["dtype"], buffer=shm.buf)
+                text = engine.transcribe(
+                    audio,
+                    message["sample_rate"],
+                    initial_prompt=message.get("initial_prompt"),
+                    model_name=message.get("model_name"),
+                )
+                del audio
+            finally:
+                shm.close()
+        
+        conn.send({
+            "type": "result",
+            "id": message["id"],
+            "text": text,
+            "timings": engine.last_timings,
+            "worker_seconds": time.perf_counter() - started,
+        })
+
+
+class TranscriptionWorker:
+    """Client for an engine running in a child process (same API as TranscriptionEngine)"""
+    
+    def __init__(self, model_name="mlx-community/whisper-small-mlx", decode_workers=2,
+                 backend="auto", health_interval=10.0, request_timeout=120.0,
+                 start_timeout=600.0, decode_profile="balanced", quantization=None):
+        """
+        Initialize the worker client (the process starts on first use)
+        
+        Args:
+            model_name, decode_workers, backend, decode_profile, quantization:
+                Passed to TranscriptionEngine
+            health_interval: Seconds between health-check pings (0 disables)
+            request_timeout: A request taking longer restarts the worker
+            start_timeout: Time allowed for start-up (includes model download)
+        """
+        self.model_name = model_name
+        self.engine_options = {
+            "model_name": model_name,
+            "decode_workers": decode_workers,
+            "backend": backend,
+            "decode_profile": decode_profile,
+            "quantization": quantization,
+        }
+        self.health_interval = health_interval
+        self.request_timeout = request_timeout
+        self.start_timeout = start_timeout
+        
+        self._context = multiprocessing.get_context("spawn")  # fork is unsafe with Metal
+        self._process = None
+        self._conn = None
+        self._lock = threading.RLock()  # One request in flight at a time
+        self._ids = itertools.count(1)
+        self._shm = None
+        self._closed = False
+        self._health_thread = None
+        
+        self.restarts = 0
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.last_timings = {}
+    
+    def _start(self):
+        """Spawn the worker and wait until its model is loaded"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.engine_options),
+            daemon=True,
+            name="oropo-transcription-worker",
+        )
+        process.start()
+        child_conn.close()
+        
+        if not parent_conn.poll(self.start_timeout):
+            process.kill()
+            raise RuntimeError("Transcription worker did not start in time")
+        ready = parent_conn.recv()
+        if ready.get("type") != "ready":
+            process.join(timeout=1.0)
+            raise RuntimeError(ready.get("error", "Transcription worker failed to start"))
+        
+        self._process = process
+        self._conn = parent_conn
+        self.load_seconds = ready.get("load_seconds")
+        self.warmup_seconds = ready.get("warmup_seconds")
+        print(f"Transcription worker {process.pid} ready")
+        
+        if self.health_interval and not self._health_thread:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+    
+    def _kill(self):
+        """Terminate the worker process"""
+        if self._process and self._process.is_alive():
+            self._process.kill()
+            self._process.join(timeout=2.0)
+        if self._conn:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+    
+    def restart(self):
+        """Kill the worker and start a fresh one (reloads the model)"""
+        with self._lock:
+            self._kill()
+            self.restarts += 1
+            print(f"Restarting transcription worker (restart #{self.restarts})")
+            self._start()
+    
+    def is_alive(self):
+        """True if the worker process is running"""
+        return self._process is not None and self._process.is_alive()
+    
+    def ping(self, timeout=2.0):
+        """Health check: True if the worker answers within timeout"""
+        if not self._lock.acquire(timeout=timeout):
+            return True  # Busy with a request, which has its own timeout
+        try:
+            if not self.is_alive():
+                return False
+            self._conn.send({"type": "ping"})
+            return self._conn.poll(timeout) and self._conn.recv().get("type") == "pong"
+        except (EOFError, OSError):
+            return False
+        finally:
+            self._lock.release()
+    
+    def _health_loop(self):
+        """Restart the worker whenever a health check fails"""
+        while not self._closed:
+            time.sleep(self.health_interval)
+            if self._closed or self._process is None:
+                continue
+            if not self.ping():
+                try:
+                    self.restart()
+                except Exception as e:
+                    print(f"Transcription worker restart failed: {e}")
+    
+    def is_loaded(self, model_name=None):
+        """True while the worker process (and so its model) is running"""
+        return self.is_alive()
+    
+    def unload_model(self, model_name=None):
+        """
+        Stop the worker to release its memory (started again on next use)
+        
+        Returns:
+            True if stopped, False if it is busy or wasn't running
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if not self.is_alive():
+                return False
+            self._kill()
+            print("Transcription worker stopped (model unloaded)")
+            return True
+        finally:
+            self._lock.release()
+    
+    def _ensure_model(self, model_name=None):
+        """Start the worker (which loads and warms up the model) if needed"""
+        with self._lock:
+            if not self.is_alive():
+                if self._process is not None:
+                    # Crashed since the last request
+                    self.restarts += 1
+                    print(f"Transcription worker died (exit code {self._process.exitcode}), restarting")
+                    self._kill()
+                self._start()
+    
+    def _restart_quietly(self):
+        """Bring a killed worker back so the next dictation doesn't wait for the model"""
+        try:
+            self._ensure_model()
+        except Exception as e:
+            print(f"Transcription worker restart failed: {e}")
+    
+    def _shared_buffer(self, nbytes):
+        """Reuse one shared memory block, growing it when needed"""
+        if self._shm is None or self._shm.size < nbytes:
+            self._release_shared_buffer()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 16000 * 4 * 30))
+        return self._shm
+    
+    def _release_shared_buffer(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+    
+    def _request(self, message, cancel=None):
+        """Send a request and wait for its result (restarts a hung worker)"""
+        self._conn.send(message)
+        give_up = time.perf_counter() + self.request_timeout
+        while True:
+            remaining = give_up - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"Transcription took longer than {self.request_timeout:.0f}s")
+            if self._conn.poll(min(remaining, cancel.poll_interval) if cancel else remaining):
+                break
+            if cancel is not None and cancel.cancelled:
+                return None
+        result = self._conn.recv()
+        if result.get("id") != message["id"]:
+            raise RuntimeError("Transcription worker answered out of order")
+        return result
+    
+    def orphaned_decodes(self):
+        """Always 0: a cancelled decode's process is killed, nothing runs on"""
+        return 0
+    
+    def transcribe(self, audio, sample_rate=16000, initial_prompt=None, model_name=None,
+                   cancel=None, timings=None):
+        """
+        Transcribe audio in the worker process
+        
+        Args:
+            audio: numpy array of samples or path to an audio file
+            sample_rate: Sample rate of an in-memory array
+            initial_prompt: Preceding text for context
+            model_name: Model for this call (loaded in the worker on first use)
+            cancel: CancelToken; when it fires the worker is killed (the only
+                way to stop a decode in progress) and restarted in the background
+            timings: Dict filled with this call's timings (see TranscriptionEngine)
+        
+        Returns:
+            Transcribed text string, or empty string on failure
+        """
+        timings = {} if timings is None else timings
+        self.last_timings = timings
+        if audio is None:
+            return ""
+        
+        with self._lock:
+            message = {"type": "transcribe", "id": next(self._ids), "model_name": model_name}
+            started = time.perf_counter()
+            if isinstance(audio, np.ndarray):
+                audio = np.ascontiguousarray(audio)
+                shm = self._shared_buffer(audio.nbytes)
+                np.ndarray(audio.shape, dtype=audio.dtype, buffer=shm.buf)[:] = audio
+                message.update({
+                    "shm": shm.name,
+                    "length": len(audio),
+                    "dtype": audio.dtype.str,
+                    "sample_rate": sample_rate,
+                    "initial_prompt": initial_prompt,
+                })
+            else:
+                message["path"] = audio
+            timings["shm_copy"] = time.perf_counter() - started
+            
+            for attempt in range(2):
+                try:
+                    self._ensure_model()
+                    started = time.perf_counter()
+                    result = self._request(message, cancel)
+                    break
+                except (EOFError, OSError, TimeoutError, RuntimeError) as e:
+                    print(f"Transcription worker failed: {e}")
+                    if self._process:
+                        # Leave the dead process object so _ensure_model restarts it
+                        self._process.kill()
+                        self._process.join(timeout=2.0)
+                    if attempt == 1 or isinstance(e, TimeoutError):
+                        # Don't retry a decode that hung; the next call restarts the worker
+                        return ""
+            
+            if result is None:
+                timings["cancelled"] = cancel.reason
+                self._kill()
+                self.restarts += 1
+                threading.Thread(target=self._restart_quietly, daemon=True).start()
+                return ""
+            
+            timings.update(result["timings"])
+            timings["ipc"] = (time.perf_counter() - started) - result["worker_seconds"]
+            return result["text"]
+    
+    def start_streaming(self, get_audio, sample_rate=16000, **options):
+        """Streaming mode, with each segment decoded in the worker"""
+        from transcription_engine import StreamingSession
+        
+        session = StreamingSession(self, get_audio, sample_rate, **options)
+        session.start()
+        return session
+    
+    def close(self):
+        """Stop the worker process and free shared memory"""
+        self._closed = True
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self._conn.send({"type": "stop"})
+                    self._process.join(timeout=2.0)
+                except Exception:
+                    pass
+            self._kill()
+            self._release_shared_buffer()
+
+
+# Test
+if __name__ == "__main__":
+    worker = TranscriptionWorker(model_name="fake", backend="fake")
+    worker._ensure_model()
+    print(f"Worker alive: {worker.is_alive()}, ping: {worker.ping()}")
+    
+    audio = np.zeros(16000 * 3, dtype=np.float32)
+    print(f"Transcription: {worker.transcribe(audio)}")
+    print(f"Timings: {worker.last_timings}")
+    
+    worker._process.kill()
+    worker._process.join()
+    print(f"After crash: {worker.transcribe(audio)} (restarts: {worker.restarts})")
+    worker.close()
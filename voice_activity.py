@@ -0,0 +1,239 @@
+"""
+Voice Activity Detection Module
+Finds speech in a recording with vectorized frame energy and zero-crossing features
+Used to trim silent edges, skip silent recordings and find pauses to cut at
+Optionally refines decisions with the WebRTC VAD model (pip install webrtcvad)
+"""
+
+import numpy as np
+
+from resampler import resample
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+
+# Sample rates the WebRTC VAD model accepts; other capture rates are resampled to 16 kHz for it
+MODEL_RATES = (8000, 16000, 32000, 48000)
+
+
+class VoiceActivityDetector:
+    """Energy + zero-crossing-rate voice activity detector"""
+    
+    def __init__(self, sample_rate=16000, frame_ms=30, min_level_db=-50.0,
+                 max_threshold_db=-35.0, margin_db=12.0, max_zcr=0.3,
+                 min_speech_ms=120, padding_ms=200, use_model=False,
+                 model_aggressiveness=2):
+        """
+        Initialize the detector
+        
+        Args:
+            sample_rate: Sample rate of the audio to analyse
+            frame_ms: Analysis frame length (10, 20 or 30 ms for the model)
+            min_level_db: Frames quieter than this (dBFS) are never speech
+            max_threshold_db: Upper bound of the adaptive threshold, so a
+                recording without any pause is not mistaken for noise
+            margin_db: Speech must be this much louder than the noise floor
+            max_zcr: Quiet-ish frames with a higher zero-crossing rate are noise
+            min_speech_ms: Shorter bursts (clicks, bumps) are ignored
+            padding_ms: Speech regions are widened by this much on both sides
+            use_model: Also require the WebRTC VAD model to agree (if installed);
+                capture rates it doesn't accept are resampled to 16 kHz for it
+            model_aggressiveness: WebRTC VAD mode, 0 (lenient) to 3 (strict)
+        """
+        self.sample_rate = sample_rate
+        self.frame = int(sample_rate * frame_ms / 1000)
+        self.min_level_db = min_level_db
+        self.max_threshold_db = max_threshold_db
+        self.margin_db = margin_db
+        self.max_zcr = max_zcr
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.padding_frames = int(padding_ms / frame_ms)
+        
+        self.frame_ms = frame_ms
+        self.model_rate = sample_rate if sample_rate in MODEL_RATES else 16000
+        
+        self.model = None
+        if use_model:
+            if webrtcvad is None:
+                print("webrtcvad not installed, using energy/ZCR VAD only")
+            else:
+                self.model = webrtcvad.Vad(model_aggressiveness)
+    
+    def _frames(self, audio):
+        """Reshape audio into (count, frame) float32 frames (drops the remainder)"""
+        count = len(audio) // self.frame
+        frames = audio[:count * self.frame].reshape(count, self.frame)
+        if np.issubdtype(frames.dtype, np.integer):
+            return frames.astype(np.float32) / 32768.0
+        return frames.astype(np.float32, copy=False)
+    
+    def frame_features(self, audio):
+        """
+        Compute per-frame features
+        
+        Returns:
+            (energy_db, zcr) arrays with one value per frame
+        """
+        frames = self._frames(audio)
+        energy = np.mean(frames * frames, axis=1)
+        energy_db = 10.0 * np.log10(energy + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame
+        return energy_db, zcr
+    
+    def speech_mask(self, audio, padded=True):
+        """Boolean speech decision per frame (widened by padding_ms if padded)"""
+        energy_db, zcr = self.frame_features(audio)
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        noise_floor = np.percentile(energy_db, 10)
+        threshold = min(self.max_threshold_db, max(self.min_level_db, noise_floor + self.margin_db))
+        loud = energy_db > threshold
+        # High zero-crossing rate near the threshold is hiss/fan noise, but loud
+        # fricatives ("s", "f") are kept
+        mask = loud & ((zcr < self.max_zcr) | (energy_db > threshold + self.margin_db))
+        
+        if self.model is not None:
+            mask &= self._model_mask(audio, len(mask))
+        
+        # Morphological opening drops short bursts, then pad the remaining regions
+        mask = _erode(mask, self.min_speech_frames)
+        mask = _dilate(mask, self.min_speech_frames)
+        if padded:
+            mask = _dilate(mask, 2 * self.padding_frames + 1)
+        return mask
+    
+    def _model_mask(self, audio, count):
+        """Per-frame decisions from the WebRTC VAD model"""
+        pcm = audio[:count * self.frame]
+        frame = self.frame
+        if self.model_rate != self.sample_rate:
+            if np.issubdtype(pcm.dtype, np.integer):
+                pcm = pcm.astype(np.float32) / 32768.0
+            # Same frame duration at the model's rate, so frames still line up
+            frame = int(self.model_rate * self.frame_ms / 1000)
+            pcm = resample(pcm, self.sample_rate, self.model_rate)[:count * frame]
+            pcm = np.pad(pcm, (0, count * frame - len(pcm)))
+        if not np.issubdtype(pcm.dtype, np.integer):
+            pcm = (np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16)
+        data = pcm.astype(np.int16, copy=False).tobytes()
+        step = frame * 2
+        return np.array([
+            self.model.is_speech(data[i * step:(i + 1) * step], self.model_rate)
+            for i in range(count)
+        ], dtype=bool)
+    
+    def trim(self, audio):
+        """
+        Trim non-speech from both ends of a recording
+        
+        Returns:
+            (trimmed_view, info) where info has "speech" (bool),
+            "speech_seconds" and "trimmed_seconds" (time saved)
+        """
+        total = len(audio) / self.sample_rate
+        mask = self.speech_mask(audio)
+        speech_frames = np.flatnonzero(mask)
+        
+        if len(speech_frames) == 0:
+            return audio[:0], {"speech": False, "speech_seconds": 0.0, "trimmed_seconds": total}
+        
+        start = speech_frames[0] * self.frame
+        end = min(len(audio), (speech_frames[-1] + 1) * self.frame)
+        trimmed = audio[start:end]
+        return trimmed, {
+            "speech": True,
+            "speech_seconds": len(speech_frames) * self.frame / self.sample_rate,
+            "trimmed_seconds": total - len(trimmed) / self.sample_rate,
+        }
+    
+    def is_speech(self, audio):
+        """True if the audio contains any speech"""
+        return bool(self.speech_mask(audio).any())
+    
+    def find_pauses(self, audio, min_pause_ms=300):
+        """
+        Find silent stretches long enough to cut at
+        
+        Returns:
+            List of (start, end) sample offsets of each pause
+        """
+        mask = self.speech_mask(audio, padded=False)
+        min_frames = max(1, int(min_pause_ms * self.sample_rate / 1000 / self.frame))
+        
+        # Run boundaries of the non-speech frames
+        quiet = np.concatenate(([False], ~mask, [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(quiet))
+        starts, ends = edges[0::2], edges[1::2]
+        long_enough = (ends - starts) >= min_frames
+        return [
+            (int(s) * self.frame, int(e) * self.frame)
+            for s, e in zip(starts[long_enough], ends[long_enough])
+        ]
+    
+    def split(self, audio, max_seconds=30.0, min_pause_ms=300, overlap_seconds=1.0):
+        """
+        Split a long recording into independent segments at speech pauses
+        
+        Segments are cut at the middle of the last pause that keeps them under
+        max_seconds; without a pause a hard cut is made and the next segment
+        starts overlap_seconds earlier. Segments without speech are dropped.
+        
+        Returns:
+            List of (start, end) sample offsets in order
+        """
+        max_len = int(max_seconds * self.sample_rate)
+        overlap = int(overlap_seconds * self.sample_rate)
+        cuts = [(start + end) // 2 for start, end in self.find_pauses(audio, min_pause_ms)]
+        
+        segments = []
+        start = 0
+        while len(audio) - start > max_len:
+            candidates = [c for c in cuts if start < c <= start + max_len]
+            if candidates:
+                cut = candidates[-1]
+                next_start = cut
+            else:
+                cut = start + max_len
+                next_start = cut - overlap
+            segments.append((start, cut))
+            start = next_start
+        segments.append((start, len(audio)))
+        
+        return [(s, e) for s, e in segments if self.is_speech(audio[s:e])]
+
+
+def _dilate(mask, width):
+    """Grow True regions by width // 2 frames on each side"""
+    if width <= 1 or len(mask) == 0:
+        return mask
+    return np.convolve(mask.astype(np.int32), np.ones(width, dtype=np.int32), mode="same") > 0
+
+
+def _erode(mask, width):
+    """Shrink True regions, removing runs shorter than width frames"""
+    if width <= 1 or len(mask) == 0:
+        return mask
+    counts = np.convolve(mask.astype(np.int32), np.ones(width, dtype=np.int32), mode="same")
+    return counts >= width
+
+
+# Test
+if __name__ == "__main__":
+    sample_rate = 16000
+    rng = np.random.default_rng(0)
+    t = np.arange(sample_rate) / sample_rate
+    voiced = (0.3 * np.sin(2 * np.pi * 180 * t) * (1 + np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    hiss = (0.002 * rng.standard_normal(sample_rate)).astype(np.float32)
+    audio = np.concatenate([hiss, voiced, hiss, voiced, hiss])
+    
+    vad = VoiceActivityDetector(sample_rate)
+    trimmed, info = vad.trim(audio)
+    print(f"Speech: {info['speech']}, kept {len(trimmed) / sample_rate:.2f}s, "
+          f"saved {info['trimmed_seconds']:.2f}s")
+    print(f"Pauses: {[(s / sample_rate, e / sample_rate) for s, e in vad.find_pauses(audio)]}")
+    print(f"Silence detected as speech: {vad.is_speech(hiss)}")